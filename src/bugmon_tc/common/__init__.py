@@ -6,15 +6,19 @@ import os
 import tarfile
 import tempfile
 from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import TypedDict, Dict, Any, cast, Iterator
+from typing import TYPE_CHECKING, TypedDict, Dict, Any, cast, Iterator
 
 import requests
-from bugmon import PernoscoCreds
 from requests import RequestException, Response
 from taskcluster import TaskclusterRestFailure, Queue
 from taskcluster.helper import TaskclusterConfig
 
+if TYPE_CHECKING:
+    # bugmon is slow to import and isn't installed in the reporter image
+    from bugmon import PernoscoCreds
+
 LOG = logging.getLogger(__name__)
 
 # Shared taskcluster configuration
@@ -38,6 +42,13 @@ def in_taskcluster() -> bool:
     return "TASK_ID" in os.environ and "TASKCLUSTER_ROOT_URL" in os.environ
 
 
+def parse_tc_datetime(value: str) -> datetime:
+    """Parse a Taskcluster ISO 8601 datetime string into a naive UTC datetime."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+
 def get_url(url: str) -> Response:
     """Retrieve URL contents
 
@@ -120,7 +131,7 @@ def get_bugzilla_auth() -> BugzillaCreds:
         raise BugmonTaskError("Cannot find Bugzilla credentials in env") from e
 
 
-def get_pernosco_auth() -> PernoscoCreds:
+def get_pernosco_auth() -> "PernoscoCreds":
     """Extract Bugzilla API keys from env"""
     try:
         return {
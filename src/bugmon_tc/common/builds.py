@@ -0,0 +1,28 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from typing import Optional
+
+from bugmon.bug import EnhancedBug
+
+# Name and mount point of the worker cache holding autobisect's build store
+BUILD_CACHE_NAME = "bugmon-builds"
+BUILD_CACHE_PATH = "/builds"
+
+
+def build_key(bug: EnhancedBug) -> Optional[str]:
+    """Identity of the builds fetched to process a bug
+
+    Bugs sharing a key fetch the same branch tip builds.
+
+    :param bug: Bug to inspect
+    :return: The identity, or None if the branch or build flags are unknown
+    """
+    branch = bug.branch
+    flags = bug.build_flags
+    if branch is None or flags is None:
+        return None
+
+    system = bug.platform.system
+    machine = bug.platform.machine
+    return f"{branch}/{system}-{machine}/{flags}"
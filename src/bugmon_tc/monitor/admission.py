@@ -0,0 +1,236 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from bugmon import EnhancedBug
+from taskcluster.exceptions import TaskclusterFailure
+
+from .batching import TaskBatcher
+from .config import MonitorConfig
+from .inflight import InflightTask, cancel_pending_tasks
+from .priority import required_action
+from .state import ScheduledTask
+from .tasks import ProcessorTask, TaskPair, _get_deadline
+from .throttle import PoolLimiter, group_key
+from ..common import parse_tc_datetime, queue
+
+LOG = logging.getLogger(__name__)
+
+# Expected processor runtime for each action before any runtime is observed
+DEFAULT_RUNTIMES = {
+    "bisect": timedelta(hours=3),
+    "pernosco": timedelta(minutes=90),
+    "confirm": timedelta(minutes=45),
+    "verify": timedelta(minutes=45),
+}
+
+# Relative slowdown of processors on each platform
+PLATFORM_FACTORS = {"Windows": 1.5}
+
+# Weight of the most recent observation in the runtime moving average
+RUNTIME_WEIGHT = 0.3
+
+# Headroom applied to every estimate to account for queueing and variance
+RUNTIME_MARGIN = 1.2
+
+
+def runtime_key(action: str, system: str) -> str:
+    """Key under which runtimes are recorded
+
+    :param action: Action performed by the processor
+    :param system: Platform the processor runs on
+    """
+    return f"{action}/{system}"
+
+
+def estimate_runtime(action: str, system: str, runtimes: Dict[str, float]) -> timedelta:
+    """Estimate how long a processor task will take, including headroom
+
+    :param action: Action performed by the processor
+    :param system: Platform the processor runs on
+    :param runtimes: Observed average runtimes in seconds, by runtime_key
+    """
+    key = runtime_key(action, system)
+    if key in runtimes:
+        seconds = runtimes[key]
+    else:
+        seconds = DEFAULT_RUNTIMES[action].total_seconds()
+        seconds *= PLATFORM_FACTORS.get(system, 1.0)
+
+    return timedelta(seconds=seconds * RUNTIME_MARGIN)
+
+
+def observe_runtime(runtimes: Dict[str, float], key: str, seconds: float) -> None:
+    """Fold an observed runtime into the moving average
+
+    :param runtimes: Observed average runtimes in seconds, by runtime_key
+    :param key: Runtime key
+    :param seconds: Observed runtime
+    """
+    if key in runtimes:
+        seconds = RUNTIME_WEIGHT * seconds + (1 - RUNTIME_WEIGHT) * runtimes[key]
+    runtimes[key] = seconds
+
+
+def collect_runtimes(
+    scheduled: Dict[int, ScheduledTask], runtimes: Dict[str, float]
+) -> Dict[int, ScheduledTask]:
+    """Record the runtime of processor tasks which completed since the last run
+
+    :param scheduled: Processor tasks submitted by earlier runs, by bug id
+    :param runtimes: Observed average runtimes in seconds, updated in place
+    :return: Tasks which have not resolved yet
+    """
+    unresolved: Dict[int, ScheduledTask] = {}
+    for bug_id, task in scheduled.items():
+        try:
+            status = queue.status(task["taskId"])["status"]
+        except TaskclusterFailure as e:
+            LOG.warning(f"Unable to fetch status of task {task['taskId']}: {e}")
+            continue
+
+        if status["state"] in ("unscheduled", "pending", "running"):
+            unresolved[bug_id] = task
+            continue
+
+        run = status["runs"][-1] if status["runs"] else None
+        if run is not None and run["state"] == "completed":
+            started = parse_tc_datetime(run["started"])
+            resolved = parse_tc_datetime(run["resolved"])
+            key = runtime_key(task["action"], task["system"])
+            observe_runtime(runtimes, key, (resolved - started).total_seconds())
+
+    LOG.info(f"Collected runtimes of {len(scheduled) - len(unresolved)} task(s)")
+    return unresolved
+
+
+class AdmissionControl:
+    """Admits actionable bugs within the task deadline and worker pool capacity"""
+
+    def __init__(
+        self,
+        config: MonitorConfig,
+        artifact_dir: Path,
+        batcher: TaskBatcher,
+        runtimes: Dict[str, float],
+        limiter: Optional[PoolLimiter] = None,
+        inflight: Optional[Dict[int, List[InflightTask]]] = None,
+    ) -> None:
+        """Instantiate a new AdmissionControl instance.
+
+        :param config: Monitor options
+        :param artifact_dir: Path to store artifacts
+        :param batcher: Batches the processors of admitted bugs
+        :param runtimes: Observed average runtimes in seconds, by runtime_key
+        :param limiter: Caps the processors submitted to each worker pool
+        :param inflight: Pending or running tasks from earlier runs, by bug id
+        """
+        self.config = config
+        self.artifact_dir = artifact_dir
+        self.batcher = batcher
+        self.runtimes = runtimes
+        self.limiter = limiter
+        self.inflight = inflight if inflight is not None else {}
+
+        # Actionable bugs left for a later run
+        self.deferred: List[int] = []
+        # Number of deferred bugs by fair-share group
+        self.deferred_groups: Counter[str] = Counter()
+
+    def admit(self, task_pairs: Iterable[TaskPair]) -> Iterator[TaskPair]:
+        """Filter ranked bugs down to those which can be handled by this run
+
+        Monitor artifacts are written for every admitted bug.
+
+        :param task_pairs: Processor and reporter of each bug, by priority
+        """
+        deadline = _get_deadline() if self.config.admission else None
+        limiter = self.limiter
+
+        # Bugs exceeding their group's fair share, admitted if capacity remains
+        overflow: List[TaskPair] = []
+
+        for processor, reporter in task_pairs:
+            bug = processor.bug
+            if deadline is not None:
+                action = required_action(bug)
+                estimate = estimate_runtime(action, bug.platform.system, self.runtimes)
+                if self.batcher.key(processor) is not None:
+                    # Batched bugs run one after another in the same task
+                    estimate *= self.config.batch_size
+                if datetime.utcnow() + estimate > deadline:
+                    # Actionable bugs are picked up again by the next run
+                    self.defer(bug, f"{action} needs ~{estimate}")
+                    continue
+
+            worker_type = processor.worker_type
+            if limiter is not None and not self.batcher.joins_batch(processor):
+                if not limiter.available(worker_type, processor.priority):
+                    # Bugs are ranked, so only lower priority bugs are held back
+                    self.defer(bug, f"{worker_type} is saturated")
+                    continue
+                if not limiter.within_quota(worker_type, self.group(bug)):
+                    overflow.append((processor, reporter))
+                    continue
+
+            self._admit(processor)
+            yield processor, reporter
+
+        # Capacity left unused by other groups is shared out by priority
+        for processor, reporter in overflow:
+            assert limiter is not None
+            if not self.batcher.joins_batch(processor) and not limiter.available(
+                processor.worker_type, processor.priority
+            ):
+                group = self.group(processor.bug)
+                self.defer(processor.bug, f"{group} exceeded its fair share")
+                continue
+            self._admit(processor)
+            yield processor, reporter
+
+    def _admit(self, processor: ProcessorTask) -> None:
+        """Cancel superseded tasks of an admitted bug and write its monitor artifact
+
+        Bugs which are still in flight were already skipped before hydration.
+
+        :param processor: Processor task of the bug
+        """
+        bug = processor.bug
+        tasks = self.inflight.get(bug.id, [])
+        # Running tasks are never cancelled, only pending ones
+        if self.config.cancel_superseded and not any(
+            task["state"] == "running" for task in tasks
+        ):
+            cancel_pending_tasks(bug.id, tasks)
+
+        # The limiter counts tasks, so bugs joining an open batch are free
+        if self.limiter is not None and not self.batcher.joins_batch(processor):
+            self.limiter.consume(processor.worker_type, self.group(bug))
+        self.batcher.reserve(processor)
+
+        # Write monitor artifact
+        with (self.artifact_dir / processor.monitor_path).open("w") as file:
+            json.dump(json.loads(bug.to_json()), file, indent=2)
+
+    def group(self, bug: EnhancedBug) -> str:
+        """Fair-share group of a bug
+
+        :param bug: Actionable bug
+        """
+        return group_key(bug, self.config.fair_share or "component")
+
+    def defer(self, bug: EnhancedBug, reason: str) -> None:
+        """Leave an actionable bug for a later run
+
+        :param bug: Actionable bug
+        :param reason: Why the bug was deferred
+        """
+        LOG.info(f"Deferring bug {bug.id} - {reason}")
+        self.deferred.append(bug.id)
+        self.deferred_groups[self.group(bug)] += 1
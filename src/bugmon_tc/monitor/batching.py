@@ -0,0 +1,189 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import MonitorConfig
+from .priority import required_action
+from .tasks import (
+    BatchProcessorTask,
+    BatchReporterTask,
+    ProcessorTask,
+    ReporterTask,
+    TaskPair,
+    TaskUnit,
+    derive_batch_id,
+)
+from ..common.builds import build_key
+
+LOG = logging.getLogger(__name__)
+
+# Actions short enough to run one after another in a single processor task
+BATCHED_ACTIONS = ("confirm", "verify")
+
+
+class TaskBatcher:
+    """Combines the tasks of several bugs into batch processors and reporters"""
+
+    def __init__(
+        self, config: MonitorConfig, artifact_dir: Path, parent_id: str
+    ) -> None:
+        """Instantiate a new TaskBatcher instance.
+
+        :param config: Monitor options
+        :param artifact_dir: Path to store artifacts
+        :param parent_id: ID of the monitor task
+        """
+        self.config = config
+        self.artifact_dir = artifact_dir
+        self.parent_id = parent_id
+
+        # Bugs which may still join the open batch of each worker type and build
+        self.slots: Counter[Tuple[str, str]] = Counter()
+
+    def key(self, processor: ProcessorTask) -> Optional[Tuple[str, str]]:
+        """Worker type and build identity grouping a processor into batches
+
+        Pernosco processors record one trace per task, and only short actions
+        are batched so that a batch fits in a single task's run time. Bugs whose
+        build identity is unknown are never batched.
+
+        :param processor: Processor task of a bug
+        :return: The key, or None if the processor is never batched
+        """
+        if (
+            self.config.batch_size == 1
+            or processor.trace_dest is not None
+            or required_action(processor.bug) not in BATCHED_ACTIONS
+        ):
+            return None
+
+        key = build_key(processor.bug)
+        if key is None:
+            return None
+        return processor.worker_type, key
+
+    def joins_batch(self, processor: ProcessorTask) -> bool:
+        """Determine if a processor joins an already open batch
+
+        :param processor: Processor task of a bug
+        """
+        key = self.key(processor)
+        return key is not None and self.slots[key] > 0
+
+    def reserve(self, processor: ProcessorTask) -> None:
+        """Account for an admitted processor in the open batch it belongs to
+
+        :param processor: Processor task of a bug
+        """
+        key = self.key(processor)
+        if key is not None:
+            self.slots[key] = (self.slots[key] or self.config.batch_size) - 1
+
+    def batch(self, task_pairs: Iterable[TaskPair]) -> Iterator[TaskUnit]:
+        """Bin-pack processors fetching the same builds into batches
+
+        Bugs are grouped by worker type and build identity (branch, platform and
+        build flags), so that each batch downloads its builds once.
+        Batches are emitted once full, so bugs are still submitted roughly in
+        priority order.
+
+        :param task_pairs: Processor and reporter of each bug
+        """
+        pending: Dict[Tuple[str, str], List[TaskPair]] = {}
+        for processor, reporter in task_pairs:
+            key = self.key(processor)
+            if key is None:
+                yield processor, [reporter]
+                continue
+
+            pending.setdefault(key, []).append((processor, reporter))
+            if len(pending[key]) == self.config.batch_size:
+                yield self._build_batch(pending.pop(key))
+
+        for pairs in pending.values():
+            yield self._build_batch(pairs)
+
+    def _build_batch(self, pairs: List[TaskPair]) -> TaskUnit:
+        """Combine the processors of several bugs into a single task
+
+        :param pairs: Processor and reporter of each bug
+        """
+        if len(pairs) == 1:
+            processor, reporter = pairs[0]
+            return processor, [reporter]
+
+        bugs = [processor.bug for processor, _ in pairs]
+        # Named after the batch, as a retried run may batch the same bug differently
+        batch_id = derive_batch_id(self.parent_id, bugs, BatchProcessorTask.__name__)
+        monitor_path = Path(f"monitor-batch-{batch_id}.json")
+        with (self.artifact_dir / monitor_path).open("w") as file:
+            json.dump([json.loads(bug.to_json()) for bug in bugs], file, indent=2)
+
+        batch = BatchProcessorTask(
+            self.parent_id,
+            bugs,
+            monitor_path,
+            force_confirm=self.config.force_confirm,
+            enable_debug=self.config.enable_debug,
+            # Bugs are ranked, so the first one has the highest priority
+            priority=pairs[0][0].priority,
+            build_cache=self.config.build_cache,
+        )
+        reporters = [reporter for _, reporter in pairs]
+        for reporter in reporters:
+            reporter.dependency = batch.id
+            # The batch fails if any of its bugs fails, the others are reported
+            reporter.requires = "all-resolved"
+
+        LOG.info(f"Batched bugs {[bug.id for bug in bugs]} into task {batch.id}")
+        return batch, reporters
+
+    @staticmethod
+    def fan_in(
+        units: Iterable[TaskUnit], fan_in: List[ReporterTask]
+    ) -> Iterator[TaskUnit]:
+        """Remove the reporters which the run's batch reporter replaces
+
+        Reporters uploading a pernosco trace keep their own task.
+
+        :param units: Processors and the reporters depending on them
+        :param fan_in: Receives the reporters which were removed
+        """
+        for processor, reporters in units:
+            fan_in.extend(r for r in reporters if r.trace_dest is None)
+            yield processor, [r for r in reporters if r.trace_dest is not None]
+
+    def build_fan_in(self, reports: List[ReporterTask]) -> BatchReporterTask:
+        """Build a single reporter depending on the processors of every bug
+
+        :param reports: Reporters replaced by the batch reporter
+        """
+        # Named after the reporter, as a retried run may report other bugs
+        bugs = [reporter.bug for reporter in reports]
+        kind = BatchReporterTask.__name__
+        reporter_id = derive_batch_id(self.parent_id, bugs, kind)
+        manifest_path = Path(f"report-manifest-{reporter_id}.json")
+        with (self.artifact_dir / manifest_path).open("w") as file:
+            manifest = [
+                {
+                    "bug_id": reporter.bug.id,
+                    "taskId": reporter.dependency,
+                    "path": str(reporter.process_path),
+                }
+                for reporter in reports
+            ]
+            json.dump(manifest, file, indent=2)
+
+        LOG.info(f"Reporting {len(reports)} bug(s) from a single task")
+        return BatchReporterTask(
+            self.parent_id,
+            reports,
+            manifest_path,
+            enable_debug=self.config.enable_debug,
+            lightweight=self.config.lightweight_reporter,
+        )
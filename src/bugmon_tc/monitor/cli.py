@@ -4,15 +4,48 @@
 import argparse
 import logging
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
-from .monitor import BugMonitorTask
+from .config import MonitorConfig
+from .monitor import BugMonitorTask, MonitorError
+from .queries import load_queries
+from .state import MonitorState, VerdictCache
+from .tasks import MAX_BATCH_SIZE
+from .throttle import DEFAULT_POOL_THROUGHPUT, GROUPINGS
 from ..common import get_bugzilla_auth
 from ..common.cli import base_parser
+from ..stats.history import RunHistory
 
 LOG = logging.getLogger(__name__)
 
 
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a shard specification of the form K/N"""
+    try:
+        index, total = (int(part) for part in value.split("/"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid shard: {value!r}") from e
+
+    if not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"shard must be between 1 and {total}")
+
+    return index, total
+
+
+def parse_throughput(value: str) -> Tuple[str, float]:
+    """Parse a worker pool throughput of the form WORKER_TYPE=N"""
+    worker_type, _, rate = value.partition("=")
+    try:
+        throughput = float(rate)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid throughput: {value!r}") from e
+
+    if not worker_type or throughput < 0:
+        raise argparse.ArgumentTypeError(f"invalid throughput: {value!r}")
+
+    return worker_type, throughput
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse arguments"""
     parser = base_parser("BugmonMonitor")
@@ -21,10 +54,153 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         action="store_true",
         help="Force bug confirmation regardless of state",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of bugs to analyze concurrently",
+    )
+    parser.add_argument(
+        "--submit-jobs",
+        type=int,
+        default=4,
+        help="Number of tasks to submit concurrently",
+    )
+    parser.add_argument(
+        "--skip-inflight",
+        action="store_true",
+        help="Skip bugs which have pending or running tasks from earlier runs",
+    )
+    parser.add_argument(
+        "--cancel-superseded",
+        action="store_true",
+        help="Cancel pending tasks from earlier runs when rescheduling a bug",
+    )
+    parser.add_argument(
+        "--admission-control",
+        action="store_true",
+        help="Defer bugs whose processor is not expected to finish before the "
+        "task deadline",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="Only submit as many processors as each worker pool can complete "
+        "before the task deadline, given its pending tasks",
+    )
+    parser.add_argument(
+        "--pool-throughput",
+        type=parse_throughput,
+        action="append",
+        default=[],
+        metavar="WORKER_TYPE=N",
+        help="Processors completed per hour by a worker pool (implies --rate-limit)",
+    )
+    parser.add_argument(
+        "--fair-share",
+        choices=GROUPINGS,
+        help="Share each worker pool's capacity between components or platforms "
+        "(implies --rate-limit)",
+    )
+    parser.add_argument(
+        "--fair-share-quota",
+        type=float,
+        default=0.25,
+        help="Largest share of a worker pool a single group may use while others "
+        "are waiting",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Confirm or verify up to N bugs sharing builds in a single processor "
+        "task",
+    )
+    parser.add_argument(
+        "--fan-in-report",
+        action="store_true",
+        help="Report every bug from a single reporter task once all processors "
+        "have resolved",
+    )
+    parser.add_argument(
+        "--build-cache",
+        action="store_true",
+        help="Keep autobisect's build store in a worker cache shared by "
+        "processors fetching the same builds",
+    )
+    parser.add_argument(
+        "--lightweight-reporter",
+        action="store_true",
+        help="Run reporters without a pernosco trace on the slim, unprivileged "
+        "bugmon-reporter worker type",
+    )
+    parser.add_argument(
+        "--direct-updates",
+        action="store_true",
+        help="Close out unsupported bugs from the monitor instead of scheduling "
+        "tasks (respects --dry-run)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="K/N",
+        help="Only monitor bugs in shard K of N (partitioned by bug id)",
+    )
+    parser.add_argument(
+        "--window-months",
+        type=int,
+        default=0,
+        help="Split the query into concurrent creation-date windows of N months",
+    )
+    parser.add_argument(
+        "--queries",
+        type=Path,
+        help="Path to a JSON query set to run instead of the default bugmon query",
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help="Path to persisted monitor state (enables incremental monitoring)",
+    )
+    parser.add_argument(
+        "--verdict-cache",
+        type=Path,
+        help="Path to a persisted cache of verdicts for unchanged bugs",
+    )
+    parser.add_argument(
+        "--verdict-cache-size",
+        type=int,
+        default=20000,
+        help="Maximum number of verdicts kept in the verdict cache",
+    )
+    parser.add_argument(
+        "--history",
+        type=Path,
+        help="Path to a run history database recording every scheduled task",
+    )
     parser.add_argument("output", type=Path, help="Path to store artifacts")
 
     args = parser.parse_args(args=argv)
 
+    if args.jobs < 1:
+        parser.error("--jobs must be a positive integer")
+
+    if args.submit_jobs < 1:
+        parser.error("--submit-jobs must be a positive integer")
+
+    if not 0 < args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f"--batch-size must be between 1 and {MAX_BATCH_SIZE}")
+
+    if args.window_months < 0:
+        parser.error("--window-months must not be negative")
+
+    if not 0 < args.fair_share_quota <= 1:
+        parser.error("--fair-share-quota must be between 0 and 1")
+
+    if args.verdict_cache_size < 1:
+        parser.error("--verdict-cache-size must be a positive integer")
+
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
     else:
@@ -38,10 +214,70 @@ def main(argv: Optional[List[str]] = None) -> None:
     args = parse_args(argv)
     bz_creds = get_bugzilla_auth()
 
+    state = None
+    if args.state is not None:
+        state = MonitorState.load(args.state)
+
+    verdict_cache = None
+    if args.verdict_cache is not None:
+        verdict_cache = VerdictCache.load(args.verdict_cache, args.verdict_cache_size)
+
+    queries = None
+    if args.queries is not None:
+        queries = load_queries(args.queries)
+
+    history = None
+    if args.history is not None:
+        history = RunHistory(args.history)
+
+    pool_throughput: Optional[Dict[str, float]] = None
+    if args.rate_limit or args.pool_throughput or args.fair_share:
+        pool_throughput = {**DEFAULT_POOL_THROUGHPUT, **dict(args.pool_throughput)}
+
+    config = MonitorConfig(
+        force_confirm=args.force_confirm,
+        enable_debug=args.debug,
+        jobs=args.jobs,
+        submit_jobs=args.submit_jobs,
+        skip_inflight=args.skip_inflight,
+        cancel_superseded=args.cancel_superseded,
+        shard=args.shard,
+        window_months=args.window_months,
+        queries=queries,
+        admission=args.admission_control,
+        pool_throughput=pool_throughput,
+        fair_share=args.fair_share,
+        fair_share_quota=args.fair_share_quota,
+        batch_size=args.batch_size,
+        fan_in_report=args.fan_in_report,
+        direct_updates=args.direct_updates,
+        dry_run=args.dry_run,
+        build_cache=args.build_cache,
+        lightweight_reporter=args.lightweight_reporter,
+    )
     monitor = BugMonitorTask(
         bz_creds["KEY"],
         bz_creds["URL"],
-        force_confirm=args.force_confirm,
-        enable_debug=args.debug,
+        config,
+        state=state,
+        verdict_cache=verdict_cache,
+        history=history,
     )
-    monitor.create_tasks(args.output)
+    failure = None
+    try:
+        monitor.create_tasks(args.output)
+    except MonitorError as e:
+        # Only raised once every bug was triaged, so the state is still complete
+        failure = e
+
+    if state is not None:
+        state.save(args.state)
+
+    if verdict_cache is not None:
+        verdict_cache.save(args.verdict_cache)
+
+    if history is not None:
+        history.close()
+
+    if failure is not None:
+        raise failure
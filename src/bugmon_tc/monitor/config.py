@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .priority import PriorityFunction, bug_priority
+from .queries import MonitorQuery
+
+
+@dataclass(frozen=True)
+class MonitorConfig:
+    """Options controlling how the monitor triages bugs and schedules their tasks
+
+    :param force_confirm: Confirm bugs regardless of whiteboard
+    :param enable_debug: Enable debug logging in child tasks
+    :param jobs: Number of bugs to analyze concurrently
+    :param submit_jobs: Number of concurrent task submissions
+    :param skip_inflight: Skip bugs with pending or running tasks
+    :param cancel_superseded: Cancel pending tasks of bugs being rescheduled
+    :param shard: Only handle bugs in this shard (1-based index, total)
+    :param window_months: Split the query into creation-date windows of this
+        many months which are fetched concurrently (0 disables)
+    :param queries: Named bug searches to merge (defaults to the bugmon query)
+    :param priority: Function ranking actionable bugs for scheduling
+    :param admission: Defer bugs whose processor is not expected to finish
+        before the task deadline
+    :param pool_throughput: Processors completed per hour by each worker pool,
+        used to cap submissions by the pool's backlog (None disables)
+    :param fair_share: Share each pool's capacity between groups of bugs,
+        either by "component" or by "platform" (requires pool_throughput)
+    :param fair_share_quota: Largest share of a pool's capacity that a single
+        group may use while other groups are waiting
+    :param batch_size: Largest number of bugs handled by one processor task
+    :param fan_in_report: Report every bug from a single reporter task which
+        depends on all processors (pernosco traces keep their own reporter)
+    :param direct_updates: Close out unsupported bugs from the monitor instead
+        of scheduling tasks for them
+    :param dry_run: Compute direct updates without applying them
+    :param build_cache: Keep autobisect's build store in a worker cache so that
+        later processors fetching the same builds reuse them
+    :param lightweight_reporter: Run reporters without a trace on the slim,
+        unprivileged bugmon-reporter worker type and image
+    """
+
+    force_confirm: bool = False
+    enable_debug: bool = False
+    jobs: int = 1
+    submit_jobs: int = 4
+    skip_inflight: bool = False
+    cancel_superseded: bool = False
+    shard: Optional[Tuple[int, int]] = None
+    window_months: int = 0
+    queries: Optional[List[MonitorQuery]] = None
+    priority: PriorityFunction = bug_priority
+    admission: bool = False
+    pool_throughput: Optional[Dict[str, float]] = None
+    fair_share: Optional[str] = None
+    fair_share_quota: float = 0.25
+    batch_size: int = 1
+    fan_in_report: bool = False
+    direct_updates: bool = False
+    dry_run: bool = False
+    build_cache: bool = False
+    lightweight_reporter: bool = False
@@ -0,0 +1,123 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import logging
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypedDict
+
+from taskcluster.exceptions import TaskclusterFailure
+
+from .tasks import derive_task_id
+from ..common import queue
+
+LOG = logging.getLogger(__name__)
+
+TASK_QUEUES = [
+    "proj-fuzzing/bugmon-monitor",
+    "proj-fuzzing/bugmon-pernosco",
+    "proj-fuzzing/bugmon-processor",
+    "proj-fuzzing/bugmon-processor-windows",
+    "proj-fuzzing/bugmon-reporter",
+]
+
+# Matches the metadata.name assigned by BaseTask, batches list several bugs
+TASK_NAME = re.compile(
+    r"^(?P<kind>ProcessorTask|ReporterTask) \((?P<bug_ids>\d+(?:, \d+)*)\)$"
+)
+
+
+class InflightTask(TypedDict):
+    """Interface representing a pending or running bugmon task"""
+
+    taskId: str
+    taskGroupId: str
+    kind: str
+    state: str
+    bug_ids: List[int]
+
+
+def _list_tasks(
+    method: Callable[..., Dict[str, Any]], task_queue: str
+) -> Iterator[Dict[str, Any]]:
+    """Iterate over all pages of a queue listing
+
+    :param method: Queue listing method
+    :param task_queue: Task queue id
+    """
+    query: Dict[str, str] = {}
+    while True:
+        response = method(task_queue, query=query)
+        yield from response["tasks"]
+        if not response.get("continuationToken"):
+            break
+        query = {"continuationToken": response["continuationToken"]}
+
+
+def fetch_inflight_tasks(
+    exclude_group: Optional[str] = None,
+) -> Dict[int, List[InflightTask]]:
+    """Index pending and running bugmon tasks by bug id
+
+    :param exclude_group: Task group to ignore (i.e. the current monitor run)
+    """
+    listings = {
+        "pending": queue.listPendingTasks,
+        "running": queue.listClaimedTasks,
+    }
+
+    index: Dict[int, List[InflightTask]] = {}
+    for task_queue in TASK_QUEUES:
+        for state, method in listings.items():
+            for entry in _list_tasks(method, task_queue):
+                task = entry["task"]
+                match = TASK_NAME.match(task["metadata"]["name"])
+                if match is None or task["taskGroupId"] == exclude_group:
+                    continue
+
+                bug_ids = [int(bug_id) for bug_id in match.group("bug_ids").split(", ")]
+                for bug_id in bug_ids:
+                    index.setdefault(bug_id, []).append(
+                        {
+                            "taskId": entry["taskId"],
+                            "taskGroupId": task["taskGroupId"],
+                            "kind": match.group("kind"),
+                            "state": state,
+                            "bug_ids": bug_ids,
+                        }
+                    )
+
+    LOG.info(f"Found in-flight tasks for {len(index)} bug(s)")
+    return index
+
+
+def cancel_pending_tasks(bug_id: int, tasks: List[InflightTask]) -> List[InflightTask]:
+    """Cancel pending tasks that have been superseded by a newer run
+
+    Reporters of pending processors have not been scheduled yet, so they are
+    resolved using the reporter id derived from the processor's id.
+    Batches also processing other bugs are never cancelled.
+
+    :param bug_id: Bug id
+    :param tasks: In-flight tasks for the bug
+    :return: Pending batches left in flight
+    """
+    task_ids = []
+    batches = []
+    for task in tasks:
+        if task["state"] != "pending":
+            continue
+        if len(task["bug_ids"]) > 1:
+            batches.append(task)
+            continue
+        task_ids.append(task["taskId"])
+        if task["kind"] == "ProcessorTask":
+            task_ids.append(derive_task_id(task["taskId"], bug_id, "ReporterTask"))
+
+    for task_id in task_ids:
+        try:
+            queue.cancelTask(task_id)
+            LOG.info(f"Cancelled superseded task {task_id} (bug {bug_id})")
+        except TaskclusterFailure as e:
+            LOG.warning(f"Unable to cancel task {task_id} (bug {bug_id}): {e}")
+
+    return batches
@@ -1,31 +1,88 @@
 # This Source Code Form is subject to the terms of the Mozilla Public License,
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
+import itertools
 import json
 import logging
 import os
 import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Iterator, cast
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from bugsy import Bugsy
+from requests.adapters import HTTPAdapter
 from bugmon import BugMonitor, BugmonException
 from bugmon.bug import EnhancedBug
 from taskcluster import slugId
+from taskcluster.exceptions import TaskclusterFailure, TaskclusterRestFailure
 
-from .tasks import ProcessorTask, ReporterTask
+from .admission import AdmissionControl, collect_runtimes
+from .batching import TaskBatcher
+from .config import MonitorConfig
+from .inflight import InflightTask, fetch_inflight_tasks
+from .priority import required_action, task_priority
+from .queries import (
+    DEFAULT_QUERIES,
+    QUERY,
+    after_bug,
+    date_windows,
+    merge_bugs,
+    parse_search_date,
+)
+from .state import (
+    FAILURES_ARTIFACT,
+    STATE_ARTIFACT,
+    UNSUPPORTED,
+    VERDICTS_ARTIFACT,
+    MonitorState,
+    Verdict,
+    VerdictCache,
+)
+from .tasks import (
+    BaseTask,
+    BatchProcessorTask,
+    ProcessorTask,
+    ReporterTask,
+    TaskPair,
+    TaskUnit,
+    _get_created,
+    _get_deadline,
+)
+from .throttle import PoolLimiter, fetch_pending_counts
+from .updates import UPDATES_ARTIFACT, BugUpdate, apply_updates, compute_update
 from ..common import queue, in_taskcluster
+from ..stats.history import HISTORY_ARTIFACT, RunHistory
 
 LOG = logging.getLogger(__name__)
 
-QUERY = {
-    "query_format": "advanced",
-    "keywords": "bugmon",
-    "keywords_type": "anywords",
-    "chfield": "[Bug creation]",
-    "chfieldfrom": "2020-03-01",
-    "include_fields": "_default",
-}
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Artifact recording the queries which produced each scheduled bug
+QUERIES_ARTIFACT = Path("monitor-queries.json")
+
+# Number of bugs requested per page
+PAGE_SIZE = 500
+
+# Number of actionable bugs whose full payload is fetched per request
+HYDRATE_BATCH = 50
 
 CONFIRMABLE = [
     "ASSIGNED",
@@ -34,11 +91,49 @@ CONFIRMABLE = [
     "REOPENED",
 ]
 
+CLOSED = ["RESOLVED", "VERIFIED"]
+
 
 class MonitorError(Exception):
     """Exception for monitor issues"""
 
 
+def in_shard(bug_id: int, shard: Tuple[int, int]) -> bool:
+    """Determine if a bug belongs to a shard
+
+    :param bug_id: Bug id
+    :param shard: Shard number (1-based) and total number of shards
+    """
+    index, total = shard
+    return bug_id % total == index - 1
+
+
+def prefilter(bug: EnhancedBug) -> Optional[bool]:
+    """Rule out bugs which BugMonitor would reject without side effects
+
+    BugMonitor closes out unsupported bugs by removing their bugmon keyword, so
+    bugs carrying it are always analyzed.  Bugs without it are only ruled out
+    once closed, with nothing left to verify and no bisection or recording
+    requested.  Every other bug may be actionable and is analyzed by BugMonitor.
+
+    :param bug: Bug to classify
+    :return: False, or None if a full analysis is required
+    """
+    if "bugmon" in bug.keywords or bug.status not in CLOSED:
+        return None
+
+    requested = (
+        "pernosco" in bug.commands
+        or "pernosco-wanted" in bug.keywords
+        or ("bisect" in bug.commands and "bisected" not in bug.commands)
+    )
+    verifiable = bug.resolution == "FIXED" and "verified" not in bug.commands
+    if requested or verifiable:
+        return None
+
+    return False
+
+
 def needs_force_confirmed(force_confirm: bool, bug: EnhancedBug) -> bool:
     """Determine if bug is eligible for forced confirmation"""
     return force_confirm and bug.status in [
@@ -49,6 +144,75 @@ def needs_force_confirmed(force_confirm: bool, bug: EnhancedBug) -> bool:
     ]
 
 
+def imap_ordered(
+    func: Callable[[T], R], items: Iterable[T], jobs: int
+) -> Iterator[Tuple[T, R]]:
+    """Apply func to items on a thread pool, yielding (item, result) in input order
+
+    Items are consumed lazily and at most 2 * jobs are in flight at any time, so
+    memory use stays bounded regardless of the length of the input.
+
+    :param func: Function to apply
+    :param items: Input items
+    :param jobs: Number of worker threads
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending: Deque[Tuple[T, Future[R]]] = deque()
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= jobs * 2:
+                head, future = pending.popleft()
+                yield head, future.result()
+
+        while pending:
+            head, future = pending.popleft()
+            yield head, future.result()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split items into lists of at most size elements
+
+    :param items: Input items
+    :param size: Maximum batch size
+    """
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def is_same_task(existing: Dict[str, Any], definition: Dict[str, Any]) -> bool:
+    """Determine if an existing task matches a definition, ignoring timestamps
+
+    :param existing: Task definition as returned by the queue
+    :param definition: Task definition that was submitted
+    """
+    return all(
+        existing.get(key) == value
+        for key, value in definition.items()
+        if key not in ("created", "deadline", "expires")
+    )
+
+
+def submit_task(task_id: str, definition: Dict[str, Any]) -> None:
+    """Submit a task to the queue
+
+    Connection errors and server errors are already retried with backoff by the
+    taskcluster client, anything else it raises is permanent.  Task ids are
+    deterministic, so a task which already exists with the same definition
+    (e.g. from a retried monitor run) is treated as submitted.
+
+    :param task_id: Task id
+    :param definition: Task definition
+    """
+    try:
+        queue.createTask(task_id, definition)
+    except TaskclusterRestFailure as e:
+        if e.status_code == 409 and is_same_task(queue.task(task_id), definition):
+            LOG.info(f"Task {task_id} already exists")
+            return
+        raise
+
+
 class BugMonitorTask:
     """Class for generating bugmon taskgraph"""
 
@@ -56,30 +220,395 @@ class BugMonitorTask:
         self,
         api_key: str,
         api_root: str,
-        force_confirm: bool = False,
-        enable_debug: bool = False,
+        config: Optional[MonitorConfig] = None,
+        state: Optional[MonitorState] = None,
+        verdict_cache: Optional[VerdictCache] = None,
+        history: Optional[RunHistory] = None,
     ) -> None:
         """
 
         :param api_key: BZ_API_KEY
         :param api_root: BZ_API_ROOT
-        :param force_confirm: Boolean indicating if bugs should be confirmed regardless of whiteboard
+        :param config: Monitor options
+        :param state: Previous monitor state, enables incremental monitoring
+        :param verdict_cache: Cache of verdicts for bugs which haven't changed
+        :param history: Run history database recording every scheduled task
         """
+        self.config = config if config is not None else MonitorConfig()
         self.bugsy = Bugsy(api_key=api_key, bugzilla_url=api_root)
-        self.force_confirm = force_confirm
-        self.enable_debug = enable_debug
+
+        # Analysis, hydration and page prefetching share the Bugzilla session, so
+        # size its pool to allow every worker to reuse a connection
+        adapter = HTTPAdapter(pool_maxsize=max(10, self.config.jobs * 2 + 1))
+        self.bugsy.session.mount("http://", adapter)
+        self.bugsy.session.mount("https://", adapter)
+        self.state = state
+        if state is not None and state.force_confirm != self.config.force_confirm:
+            # Forced confirmations change verdicts, so none of them can be reused
+            LOG.info("Monitor state was recorded with other flags - full scan")
+            state.reset(self.config.force_confirm)
+        # Pending or running tasks from earlier runs, by bug id
+        self.inflight: Dict[int, List[InflightTask]] = {}
+        self.queries = (
+            self.config.queries if self.config.queries is not None else DEFAULT_QUERIES
+        )
+
+        self.verdict_cache = verdict_cache
+        self.history = history
+
+        # Priority score of each actionable bug
+        self.priorities: Dict[int, float] = {}
+
+        # Actionable bugs left for a later run
+        self.deferred: List[int] = []
+
+        # Unsupported bugs and the updates closing them out
+        self.unsupported: Set[int] = set()
+        self.updates: List[BugUpdate] = []
+
+        # Names of the queries which returned each bug
+        self.bug_sources: Dict[int, Set[str]] = {}
+
+        # Errors raised while analyzing bugs during this run
+        self.errors: Dict[int, str] = {}
+        self.started = datetime.utcnow()
+
+        # Number of verdicts produced by each analysis stage
+        self.stage_hits: Counter[str] = Counter()
+        self._stage_lock = threading.Lock()
 
     def fetch_bugs(self) -> Iterator[EnhancedBug]:
         """
-        Generate EnhancedBug instances for all actionable bugs
+        Generate EnhancedBug instances for all actionable bugs, highest priority first
 
         :return: list of EnhancedBug
         """
-        response = self.bugsy.request("bug", params=QUERY)
-        bugs = [EnhancedBug(self.bugsy, **bug) for bug in response["bugs"]]
-        for bug in sorted(bugs, key=lambda bug: bug.id):
-            if self.is_actionable(bug):
-                yield EnhancedBug.cache_bug(bug)
+        ranked = self._rank(self._triage())
+        yield from self._hydrate(bug for bug in ranked if not self._in_flight(bug.id))
+
+    def _rank(self, bugs: Iterable[EnhancedBug]) -> List[EnhancedBug]:
+        """Order triaged bugs by descending priority, then by bug id
+
+        Bugs are ranked as of the tasks' creation time, which is reused when the
+        monitor task is retried, so that retries derive identical task priorities.
+
+        :param bugs: Actionable bugs carrying only the triage fields
+        """
+        ranked = list(bugs)
+        created = _get_created()
+        for bug in ranked:
+            self.priorities[bug.id] = self.config.priority(bug, created)
+        # Sorting is stable, so bugs with equal scores remain in bug id order
+        ranked.sort(key=lambda bug: -self.priorities[bug.id])
+        return ranked
+
+    def _in_flight(self, bug_id: int) -> bool:
+        """Determine if a triaged bug is still handled by tasks of an earlier run
+
+        Pending tasks are cancelled once the bug is admitted when superseded tasks
+        are cancelled, unless they are batches which also handle other bugs.
+
+        :param bug_id: Bug id
+        """
+        tasks = self.inflight.get(bug_id, [])
+        if self.config.cancel_superseded and not any(
+            task["state"] == "running" for task in tasks
+        ):
+            batches = [
+                task["taskId"]
+                for task in tasks
+                if task["state"] == "pending" and len(task["bug_ids"]) > 1
+            ]
+            if batches:
+                LOG.info(f"Skipping bug {bug_id} - pending in batch: {batches}")
+                return True
+            return False
+
+        if self.config.skip_inflight and tasks:
+            task_ids = [task["taskId"] for task in tasks]
+            LOG.info(f"Skipping bug {bug_id} - tasks in flight: {task_ids}")
+            return True
+        return False
+
+    def _triage(self) -> Iterator[EnhancedBug]:
+        """Query bugs using the slim triage fields and yield the actionable ones"""
+        if self.state is not None and self.state.last_change_time is not None:
+            LOG.info(f"Querying bugs changed since {self.state.last_change_time}")
+        if self.config.shard is not None:
+            LOG.info(f"Monitoring shard {self.config.shard[0]}/{self.config.shard[1]}")
+
+        # All queries are started before merging so that they run concurrently
+        streams: List[Iterator[Dict[str, Any]]] = []
+        for query in self.queries:
+            params = dict(query["params"])
+            if self.state is not None and self.state.last_change_time is not None:
+                params["last_change_time"] = self.state.last_change_time
+            streams.append(self._select(query["name"], self._search(params)))
+        if self.state is not None:
+            streams.append(iter(self._fetch_unchanged()))
+
+        raw_bugs = merge_bugs(*streams)
+
+        candidates = (
+            (EnhancedBug(self.bugsy, **raw), raw.get("last_change_time"))
+            for raw in raw_bugs
+        )
+
+        # Each analysis runs in its own temporary directory and is dominated by
+        # network I/O, so threads are sufficient.  Results are produced in input
+        # order, so bugs are still yielded by ascending bug id.
+        for (bug, last_change_time), (actionable, stage) in imap_ordered(
+            lambda candidate: self._analyze(*candidate), candidates, self.config.jobs
+        ):
+            # Bugs backing off keep their failure until they are retried
+            if stage != "backoff":
+                self._record(bug, last_change_time, actionable)
+            if actionable:
+                yield bug
+            else:
+                self.bug_sources.pop(bug.id, None)
+
+        if self.state is not None:
+            self.state.advance(self.started)
+
+        total = sum(self.stage_hits.values())
+        for stage, hits in self.stage_hits.most_common():
+            LOG.info(f"Stage '{stage}' decided {hits}/{total} bugs")
+
+    def _record(
+        self, bug: EnhancedBug, last_change_time: Optional[str], actionable: bool
+    ) -> None:
+        """Record the verdict or analysis failure of a bug in the state
+
+        :param bug: Analyzed bug
+        :param last_change_time: The bug's current last_change_time
+        :param actionable: Whether the bug is actionable
+        """
+        if self.state is None or last_change_time is None:
+            return
+
+        sources = sorted(self.bug_sources.get(bug.id, ()))
+        if bug.id in self.errors:
+            self.state.record_failure(
+                bug.id, last_change_time, self.errors[bug.id], self.started, sources
+            )
+        elif bug.id in self.unsupported:
+            self.state.record(bug.id, last_change_time, UNSUPPORTED, sources)
+        else:
+            self.state.record(bug.id, last_change_time, actionable, sources)
+
+    def _select(
+        self, name: str, raw_bugs: Iterable[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Filter a query's results to the current shard and record their source
+
+        :param name: Query name
+        :param raw_bugs: Query results
+        """
+        for raw in raw_bugs:
+            if self.config.shard is None or in_shard(raw["id"], self.config.shard):
+                self.bug_sources.setdefault(raw["id"], set()).add(name)
+                yield raw
+
+    def _hydrate(self, bugs: Iterable[EnhancedBug]) -> Iterator[EnhancedBug]:
+        """Fetch the full payload of triaged bugs, preserving order
+
+        Default fields are fetched in batches, after which the remaining bug data
+        is cached concurrently so that fetches for the following bugs overlap
+        with the consumer's handling of the current one.
+
+        :param bugs: Bugs carrying only the triage fields
+        """
+
+        def full_bugs() -> Iterator[EnhancedBug]:
+            for batch in batched(bugs, HYDRATE_BATCH):
+                params = {
+                    "id": ",".join(str(bug.id) for bug in batch),
+                    "include_fields": "_default",
+                }
+                response = self.bugsy.request("bug", params=params)
+                full = {raw["id"]: raw for raw in response["bugs"]}
+                for bug in batch:
+                    if bug.id not in full:
+                        LOG.warning(f"Unable to fetch bug {bug.id} - skipping")
+                        continue
+                    yield EnhancedBug(self.bugsy, **full[bug.id])
+
+        for _, bug in imap_ordered(
+            EnhancedBug.cache_bug, full_bugs(), self.config.jobs
+        ):
+            yield bug
+
+    def _search(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Run a bug search, optionally split into concurrent creation-date windows
+
+        :param params: Search parameters
+        """
+        if not self.config.window_months or "chfieldfrom" not in params:
+            return self._query(params)
+
+        today = datetime.utcnow().date()
+        start = parse_search_date(params["chfieldfrom"], today)
+        if start is None:
+            LOG.warning(f"Not windowing search from {params['chfieldfrom']}")
+            return self._query(params)
+
+        # The first window keeps the original start, as the parsed one is rounded
+        windows = date_windows(start, today, self.config.window_months)
+        windows[0] = (params["chfieldfrom"], windows[0][1])
+        LOG.info(f"Splitting query into {len(windows)} creation-date windows")
+        return merge_bugs(
+            *(
+                self._query(dict(params, chfieldfrom=start, chfieldto=end))
+                for start, end in windows
+            )
+        )
+
+    def _query(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Page through a bug search, ordered by bug id
+
+        Pages start after the last bug id seen rather than at an offset, as bugs
+        leave the results while paging (e.g. reporters removing the keyword).
+        The first page is requested immediately and each following page is
+        requested in the background while the current one is being consumed.
+
+        :param params: Search parameters
+        """
+
+        def fetch_page(last_id: int) -> List[Dict[str, Any]]:
+            page_params = dict(
+                after_bug(params, last_id), limit=PAGE_SIZE, order="bug_id"
+            )
+            response = self.bugsy.request("bug", params=page_params)
+            return cast(List[Dict[str, Any]], response["bugs"])
+
+        def pages(
+            executor: ThreadPoolExecutor, pending: Future[List[Dict[str, Any]]]
+        ) -> Iterator[Dict[str, Any]]:
+            with executor:
+                total = 0
+                while True:
+                    page = pending.result()
+                    total += len(page)
+                    LOG.debug(f"Fetched {len(page)} bugs (total: {total})")
+                    if len(page) == PAGE_SIZE:
+                        pending = executor.submit(fetch_page, page[-1]["id"])
+
+                    yield from page
+
+                    if len(page) < PAGE_SIZE:
+                        break
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        return pages(executor, executor.submit(fetch_page, 0))
+
+    def _fetch_unchanged(self) -> List[Dict[str, Any]]:
+        """Fetch bugs that were actionable during a previous run and haven't changed
+
+        These are absent from the incremental query but must still be scheduled.
+        Unchanged bugs whose analysis failed are also retried once their backoff
+        period has elapsed.
+        """
+        assert self.state is not None
+        retry_ids = set(self.state.retry_due(self.started))
+        bug_ids = set(self.state.actionable_bugs()) | retry_ids
+        if not bug_ids:
+            return []
+
+        raw_bugs: List[Dict[str, Any]] = []
+        for batch in batched(sorted(bug_ids), HYDRATE_BATCH):
+            params = {
+                "id": ",".join(str(bug_id) for bug_id in batch),
+                "include_fields": QUERY["include_fields"],
+            }
+            raw_bugs.extend(self.bugsy.request("bug", params=params)["bugs"])
+
+        unchanged: List[Dict[str, Any]] = []
+        for raw in raw_bugs:
+            bug_ids.discard(raw["id"])
+            last_change_time = raw.get("last_change_time")
+            if self.state.get_verdict(raw["id"], last_change_time):
+                unchanged.append(raw)
+            elif raw["id"] in retry_ids and (
+                self.state.failures[raw["id"]]["last_change_time"] == last_change_time
+            ):
+                unchanged.append(raw)
+            else:
+                # Changed bugs are re-analyzed if they still match the query
+                self.state.forget(raw["id"])
+                continue
+
+            # Unchanged bugs keep the sources of the run which first returned them
+            sources = self.state.sources.get(raw["id"], [])
+            self.bug_sources.setdefault(raw["id"], set()).update(sources)
+
+        # Anything not returned is no longer visible to us
+        for bug_id in bug_ids:
+            self.state.forget(bug_id)
+
+        return sorted(unchanged, key=lambda raw: cast(int, raw["id"]))
+
+    def _analyze(
+        self, bug: EnhancedBug, last_change_time: Optional[str]
+    ) -> Tuple[bool, str]:
+        """Determine if a bug is actionable, trying the cheapest stages first
+
+        :param bug: Bug to analyse
+        :param last_change_time: The bug's current last_change_time
+        :return: The verdict and the stage which produced it
+        """
+        stage = "state"
+        verdict: Optional[Verdict] = None
+        if self.state is not None:
+            verdict = self.state.get_verdict(bug.id, last_change_time)
+            if verdict is not None:
+                LOG.info(f"Bug {bug.id} unchanged (actionable: {verdict})")
+
+        if (
+            verdict is None
+            and self.state is not None
+            and self.state.in_backoff(bug.id, last_change_time, self.started)
+        ):
+            stage = "backoff"
+            verdict = False
+            LOG.info(f"Bug {bug.id} failed previously - skipping until backoff expires")
+
+        if verdict is None:
+            stage = "prefilter"
+            verdict = prefilter(bug)
+            if verdict is not None:
+                LOG.info(f"Bug {bug.id} cannot be actionable (prefilter)")
+
+        # Verdicts forced by --force-confirm depend on the run, not only the bug
+        if (
+            verdict is None
+            and self.verdict_cache is not None
+            and not self.config.force_confirm
+        ):
+            stage = "cache"
+            verdict = self.verdict_cache.get(bug.id, last_change_time)
+            if verdict is not None:
+                LOG.info(f"Bug {bug.id} has a cached verdict (actionable: {verdict})")
+
+        if verdict is None:
+            stage = "analysis"
+            verdict = self.is_actionable(bug)
+            if bug.id in self.unsupported:
+                verdict = UNSUPPORTED
+            cacheable = (
+                bug.id not in self.errors
+                and last_change_time is not None
+                and not self.config.force_confirm
+            )
+            if self.verdict_cache is not None and cacheable:
+                self.verdict_cache.put(bug.id, cast(str, last_change_time), verdict)
+        elif verdict == UNSUPPORTED:
+            self.unsupported.add(bug.id)
+
+        with self._stage_lock:
+            self.stage_hits[stage] += 1
+
+        return bool(verdict), stage
 
     def is_actionable(self, bug: EnhancedBug) -> bool:
         """
@@ -96,6 +625,7 @@ class BugMonitorTask:
                 # If the bug is not supported, we still want to close it out
                 if not bugmon.is_supported():
                     LOG.info(f"Bug {bug.id} not supported - queuing for removal")
+                    self.unsupported.add(bug.id)
                     return True
 
                 if any(
@@ -104,7 +634,7 @@ class BugMonitorTask:
                         bugmon.needs_confirm(),
                         bugmon.needs_bisect(),
                         bugmon.needs_pernosco(),
-                        self.force_confirm and bug.status in CONFIRMABLE,
+                        self.config.force_confirm and bug.status in CONFIRMABLE,
                     ]
                 ):
                     LOG.info(f"Queuing bug {bug.id} for processing")
@@ -112,57 +642,341 @@ class BugMonitorTask:
 
             except BugmonException as e:
                 LOG.error(f"Error processing bug {bug.id}: {e}")
+                self.errors[bug.id] = str(e)
 
         return False
 
     def create_tasks(self, artifact_dir: Path) -> None:
         """Fetch all bugs and generate artifacts representing the tasks that need to be
         performed on those bugs"""
+        parent_id = cast(str, os.getenv("TASK_ID") if in_taskcluster() else slugId())
 
-        for bug in self.fetch_bugs():
-            parent_id = cast(
-                str, os.getenv("TASK_ID") if in_taskcluster() else slugId()
-            )
-            monitor_path = Path(f"monitor-{bug.id}-{parent_id}.json")
+        if not artifact_dir.exists():
+            artifact_dir.mkdir(parents=True)
 
-            if not artifact_dir.exists():
-                artifact_dir.mkdir(parents=True)
+        if (
+            self.config.skip_inflight or self.config.cancel_superseded
+        ) and in_taskcluster():
+            self.inflight = fetch_inflight_tasks(exclude_group=parent_id)
 
-            # Write monitor artifact
-            with (artifact_dir / monitor_path).open("w") as file:
-                bug_data = bug.to_json()
-                json.dump(json.loads(bug_data), file, indent=2)
+        runtimes: Dict[str, float] = {}
+        if self.state is not None:
+            runtimes = self.state.runtimes
+            if self.config.admission and in_taskcluster():
+                self.state.scheduled = collect_runtimes(self.state.scheduled, runtimes)
 
-            use_pernosco = (
-                ("pernosco" in bug.commands or "pernosco-wanted" in bug.keywords)
-                and "pernosco-failed" not in bug.commands
-                and bug.platform.system == "Linux"
-                and bug.platform.machine == "x86_64"
-            )
-            processor = ProcessorTask(
-                parent_id,
-                bug,
-                monitor_path,
-                use_pernosco=use_pernosco,
-                force_confirm=self.force_confirm,
-                enable_debug=self.enable_debug,
-            )
-            reporter = ReporterTask(
-                parent_id,
-                bug,
-                processor.dest,
-                dep=processor.id,
-                trace_path=processor.trace_dest,
-                enable_debug=self.enable_debug,
-            )
+        batcher = TaskBatcher(self.config, artifact_dir, parent_id)
+        admission = AdmissionControl(
+            self.config,
+            artifact_dir,
+            batcher,
+            runtimes,
+            self._limiter(),
+            self.inflight,
+        )
+        self.deferred = admission.deferred
+        units = batcher.batch(admission.admit(self._generate_tasks(parent_id)))
+
+        # Reporters replaced by the run's batch reporter
+        fan_in: List[ReporterTask] = []
+        if self.config.fan_in_report:
+            units = batcher.fan_in(units, fan_in)
+
+        failures: List[str] = []
+        if in_taskcluster():
+            failed_bugs = self._submit_tasks(units, fan_in, batcher, failures)
+        else:
+            failed_bugs = 0
+            self._write_tasks(units, fan_in, batcher)
+
+        failed_bugs += self._apply_updates(artifact_dir, failures)
+        self._write_artifacts(artifact_dir)
 
-            if in_taskcluster():
-                queue.createTask(processor.id, processor.task)
-                queue.createTask(reporter.id, reporter.task)
+        if self.deferred:
+            LOG.info(f"Deferred {len(self.deferred)} bug(s) to a later run")
+            for group, count in admission.deferred_groups.most_common():
+                LOG.info(f"Deferred {count} bug(s) of {group}")
+
+        if failures:
+            for error in failures:
+                LOG.error(error)
+            raise MonitorError(f"Failed to handle {failed_bugs} bug(s)")
+
+    def _limiter(self) -> Optional[PoolLimiter]:
+        """Cap the processors submitted to each worker pool, if throughput is known"""
+        throughput = self.config.pool_throughput
+        if throughput is None or not in_taskcluster():
+            return None
+
+        return PoolLimiter(
+            throughput,
+            fetch_pending_counts(throughput),
+            _get_deadline(),
+            datetime.utcnow(),
+            self.config.fair_share_quota if self.config.fair_share else None,
+        )
+
+    def _submit_tasks(
+        self,
+        units: Iterable[TaskUnit],
+        fan_in: List[ReporterTask],
+        batcher: TaskBatcher,
+        failures: List[str],
+    ) -> int:
+        """Submit the tasks of every admitted bug, then the run's batch reporter
+
+        :param units: Processors and the reporters depending on them
+        :param fan_in: Reporters replaced by the run's batch reporter
+        :param batcher: Builds the batch reporter
+        :param failures: Receives a description of each submission failure
+        :return: Number of bugs whose tasks could not be submitted
+        """
+        failed_bugs = 0
+        submitted: Set[str] = set()
+        for (processor, reporters), error in imap_ordered(
+            self._submit, units, self.config.submit_jobs
+        ):
+            if error is not None:
+                bug_ids = [bug.id for bug in processor.bugs]
+                LOG.error(f"Failed to submit tasks for bug(s) {bug_ids}")
+                failures.append(error)
+                failed_bugs += len(bug_ids)
+                continue
+
+            submitted.add(processor.id)
+            self._record_submitted(batcher.parent_id, processor, reporters)
+
+        # Bugs whose processor couldn't be submitted have nothing to report
+        reports = [r for r in fan_in if r.dependency in submitted]
+        if reports:
+            batch = batcher.build_fan_in(reports)
+            try:
+                submit_task(batch.id, batch.task)
+            except TaskclusterFailure as e:
+                LOG.error(f"Failed to submit reporter for {len(reports)} bug(s)")
+                failures.append(f"Unable to submit {batch.name} {batch.id}: {e}")
+                failed_bugs += len(reports)
             else:
-                processor_task_path = f"processor-task-{bug.id}-{parent_id}.json"
-                reporter_task_path = f"reporter-task-{bug.id}-{parent_id}.json"
-                with (artifact_dir / processor_task_path).open("w") as file:
-                    json.dump(processor.task, file, indent=2)
+                if self.history is not None:
+                    self._record_history(batcher.parent_id, [batch])
+
+        return failed_bugs
+
+    def _record_submitted(
+        self, parent_id: str, processor: ProcessorTask, reporters: List[ReporterTask]
+    ) -> None:
+        """Record submitted tasks in the state and in the run history
+
+        :param parent_id: ID of the monitor task
+        :param processor: Submitted processor task
+        :param reporters: Submitted reporter tasks depending on the processor
+        """
+        # Batches handle several bugs, so their runtime is not one bug's action
+        if (
+            self.config.admission
+            and self.state is not None
+            and not isinstance(processor, BatchProcessorTask)
+        ):
+            self.state.scheduled[processor.bug.id] = {
+                "taskId": processor.id,
+                "action": required_action(processor.bug),
+                "system": processor.bug.platform.system,
+            }
+        if self.history is not None:
+            self._record_history(parent_id, [processor, *reporters])
+
+    @staticmethod
+    def _write_tasks(
+        units: Iterable[TaskUnit], fan_in: List[ReporterTask], batcher: TaskBatcher
+    ) -> None:
+        """Write the task definitions of every admitted bug instead of submitting
+
+        :param units: Processors and the reporters depending on them
+        :param fan_in: Reporters replaced by the run's batch reporter
+        :param batcher: Builds the batch reporter
+        """
+        artifact_dir, parent_id = batcher.artifact_dir, batcher.parent_id
+        for processor, reporters in units:
+            bug_id = processor.bug.id
+            processor_task_path = f"processor-task-{bug_id}-{parent_id}.json"
+            with (artifact_dir / processor_task_path).open("w") as file:
+                json.dump(processor.task, file, indent=2)
+            for reporter in reporters:
+                bug_id = reporter.bug.id
+                reporter_task_path = f"reporter-task-{bug_id}-{parent_id}.json"
                 with (artifact_dir / reporter_task_path).open("w") as file:
                     json.dump(reporter.task, file, indent=2)
+        if fan_in:
+            batch = batcher.build_fan_in(fan_in)
+            reporter_task_path = f"reporter-task-batch-{parent_id}.json"
+            with (artifact_dir / reporter_task_path).open("w") as file:
+                json.dump(batch.task, file, indent=2)
+
+    def _apply_updates(self, artifact_dir: Path, failures: List[str]) -> int:
+        """Apply the updates closing out unsupported bugs directly
+
+        :param artifact_dir: Path to store artifacts
+        :param failures: Receives a description of the bugs which weren't updated
+        :return: Number of bugs which could not be updated
+        """
+        if not self.updates:
+            return 0
+
+        with (artifact_dir / UPDATES_ARTIFACT).open("w") as file:
+            json.dump(self.updates, file, indent=2)
+
+        if self.config.dry_run:
+            LOG.info(f"Dry run - skipping updates of {len(self.updates)} bug(s)")
+            return 0
+
+        failed = apply_updates(self.bugsy, self.updates)
+        if failed:
+            failures.append(f"Unable to update bug(s) {failed}")
+        return len(failed)
+
+    def _write_artifacts(self, artifact_dir: Path) -> None:
+        """Save the run's state, caches and summaries
+
+        :param artifact_dir: Path to store artifacts
+        """
+        if self.state is not None:
+            self.state.save(artifact_dir / STATE_ARTIFACT)
+
+        if self.verdict_cache is not None:
+            self.verdict_cache.save(artifact_dir / VERDICTS_ARTIFACT)
+
+        if self.history is not None:
+            self.history.save(artifact_dir / HISTORY_ARTIFACT)
+
+        with (artifact_dir / FAILURES_ARTIFACT).open("w") as file:
+            json.dump(self.failure_summary(), file, indent=2)
+
+        with (artifact_dir / QUERIES_ARTIFACT).open("w") as file:
+            sources = {
+                str(bug_id): sorted(names)
+                for bug_id, names in sorted(self.bug_sources.items())
+            }
+            json.dump(sources, file, indent=2)
+
+    def failure_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Summarize bugs whose analysis is failing, keyed by bug id"""
+        if self.state is not None:
+            return {
+                str(bug_id): dict(failure)
+                for bug_id, failure in sorted(self.state.failures.items())
+            }
+        return {
+            str(bug_id): {"error": error}
+            for bug_id, error in sorted(self.errors.items())
+        }
+
+    def _generate_tasks(self, parent_id: str) -> Iterator[TaskPair]:
+        """Build the tasks of each actionable bug, highest priority first
+
+        Unsupported bugs are closed out without any tasks when updating directly.
+
+        :param parent_id: ID of the monitor task
+        """
+        for bug in self.fetch_bugs():
+            if (
+                self.config.direct_updates
+                and bug.id in self.unsupported
+                and self._update_directly(bug)
+            ):
+                continue
+
+            yield self._build_tasks(bug, parent_id)
+
+    def _update_directly(self, bug: EnhancedBug) -> bool:
+        """Compute the update closing out an unsupported bug
+
+        Bugs whose update cannot be computed fall back to processor tasks.
+
+        :param bug: Unsupported bug
+        :return: True if the bug needs no tasks
+        """
+        try:
+            update = compute_update(self.bugsy, bug, self.config.force_confirm)
+        except BugmonException as e:
+            LOG.warning(f"Unable to update bug {bug.id} directly: {e}")
+            return False
+
+        LOG.info(f"Bug {bug.id} will be updated directly")
+        self.updates.append(update)
+        return True
+
+    def _build_tasks(self, bug: EnhancedBug, parent_id: str) -> TaskPair:
+        """Build the processor and reporter tasks of a bug
+
+        :param bug: Actionable bug
+        :param parent_id: ID of the monitor task
+        """
+        monitor_path = Path(f"monitor-{bug.id}-{parent_id}.json")
+        use_pernosco = (
+            ("pernosco" in bug.commands or "pernosco-wanted" in bug.keywords)
+            and "pernosco-failed" not in bug.commands
+            and bug.platform.system == "Linux"
+            and bug.platform.machine == "x86_64"
+        )
+        priority = task_priority(self.priorities[bug.id])
+        processor = ProcessorTask(
+            parent_id,
+            bug,
+            monitor_path,
+            use_pernosco=use_pernosco,
+            force_confirm=self.config.force_confirm,
+            enable_debug=self.config.enable_debug,
+            priority=priority,
+            build_cache=self.config.build_cache,
+        )
+        reporter = ReporterTask(
+            parent_id,
+            bug,
+            processor.dest,
+            dep=processor.id,
+            trace_path=processor.trace_dest,
+            enable_debug=self.config.enable_debug,
+            priority=priority,
+            lightweight=self.config.lightweight_reporter,
+        )
+        return processor, reporter
+
+    def _record_history(self, parent_id: str, tasks: List[BaseTask]) -> None:
+        """Record submitted tasks in the run history
+
+        :param parent_id: ID of the monitor task
+        :param tasks: Submitted tasks
+        """
+        assert self.history is not None
+        scheduled = datetime.utcnow()
+        for task in tasks:
+            self.history.record_task(
+                task.id,
+                parent_id,
+                task.bug.id,
+                type(task).__name__,
+                required_action(task.bug),
+                task.bug.platform.system,
+                task.worker_type,
+                scheduled,
+                [bug.id for bug in task.bugs],
+            )
+
+    @staticmethod
+    def _submit(unit: TaskUnit) -> Optional[str]:
+        """Submit a processor and its reporters
+
+        Reporters are only submitted once their processor dependency exists.
+
+        :param unit: Processor and reporter tasks
+        :return: An error description if submission failed
+        """
+        processor, reporters = unit
+        tasks: List[BaseTask] = [processor, *reporters]
+        for task in tasks:
+            try:
+                submit_task(task.id, task.task)
+            except TaskclusterFailure as e:
+                return f"Unable to submit {type(task).__name__} {task.id}: {e}"
+
+        return None
@@ -0,0 +1,100 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from bugmon import EnhancedBug
+
+# Ranks a bug at the given time, higher scores are scheduled first
+PriorityFunction = Callable[[EnhancedBug, datetime], float]
+
+SEVERITY_WEIGHTS = {
+    "S1": 30.0,
+    "blocker": 30.0,
+    "critical": 30.0,
+    "S2": 20.0,
+    "major": 20.0,
+    "S3": 10.0,
+    "normal": 10.0,
+}
+
+SECURITY_WEIGHTS = {
+    "sec-critical": 50.0,
+    "sec-high": 45.0,
+    "sec-moderate": 35.0,
+    "sec-low": 25.0,
+}
+# Applied to bugs in a security group without a sec- rating
+SECURITY_WEIGHT = 40.0
+
+ACTION_WEIGHTS = {
+    "confirm": 15.0,
+    "verify": 10.0,
+    "bisect": 5.0,
+    "pernosco": 0.0,
+}
+
+# Bonus for new bugs, decaying linearly to nothing over MAX_AGE
+AGE_WEIGHT = 20.0
+MAX_AGE = timedelta(days=365)
+
+# Taskcluster priority assigned to bugs scoring at least the given threshold.
+# "high" is the level previously assigned to every task and is never exceeded.
+TASK_PRIORITIES: List[Tuple[float, str]] = [
+    (60.0, "high"),
+    (30.0, "medium"),
+    (10.0, "low"),
+]
+LOWEST_TASK_PRIORITY = "very-low"
+
+
+def required_action(bug: EnhancedBug) -> str:
+    """Estimate the action a bug needs from its triage fields
+
+    :param bug: Bug to inspect
+    """
+    if "bisect" in bug.commands and "bisected" not in bug.commands:
+        return "bisect"
+    if bug.status in ("RESOLVED", "VERIFIED"):
+        return "verify"
+    if "confirmed" not in bug.commands:
+        return "confirm"
+    return "pernosco"
+
+
+def bug_priority(bug: EnhancedBug, now: datetime) -> float:
+    """Rank a bug by severity, security rating, age and required action
+
+    :param bug: Bug to rank
+    :param now: Current time
+    """
+    score = SEVERITY_WEIGHTS.get(getattr(bug, "severity", ""), 0.0)
+
+    keywords = getattr(bug, "keywords", [])
+    ratings = [SECURITY_WEIGHTS[k] for k in keywords if k in SECURITY_WEIGHTS]
+    if ratings:
+        score += max(ratings)
+    elif getattr(bug, "groups", []):
+        score += SECURITY_WEIGHT
+
+    score += ACTION_WEIGHTS[required_action(bug)]
+
+    creation_time = getattr(bug, "creation_time", None)
+    if creation_time is not None:
+        created = datetime.fromisoformat(creation_time.rstrip("Z"))
+        remaining = max(timedelta(0), MAX_AGE - (now - created))
+        score += AGE_WEIGHT * (remaining / MAX_AGE)
+
+    return score
+
+
+def task_priority(score: float) -> str:
+    """Map a priority score onto a Taskcluster task priority
+
+    :param score: Score returned by a PriorityFunction
+    """
+    for threshold, priority in TASK_PRIORITIES:
+        if score >= threshold:
+            return priority
+    return LOWEST_TASK_PRIORITY
@@ -0,0 +1,184 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import heapq
+import json
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypedDict, cast
+
+from ..common import BugmonTaskError
+
+# Fields needed to triage a bug.  The full payload is only fetched for bugs
+# which are actionable.
+TRIAGE_FIELDS = [
+    "_custom",
+    "component",
+    "creation_time",
+    "flags",
+    "groups",
+    "id",
+    "keywords",
+    "last_change_time",
+    "op_sys",
+    "platform",
+    "product",
+    "resolution",
+    "severity",
+    "status",
+    "summary",
+    "version",
+    "whiteboard",
+]
+
+QUERY = {
+    "query_format": "advanced",
+    "keywords": "bugmon",
+    "keywords_type": "anywords",
+    "chfield": "[Bug creation]",
+    "chfieldfrom": "2020-03-01",
+    "include_fields": ",".join(TRIAGE_FIELDS),
+}
+
+
+class MonitorQuery(TypedDict):
+    """Interface representing a named bug search"""
+
+    name: str
+    params: Dict[str, Any]
+
+
+DEFAULT_QUERIES: List[MonitorQuery] = [{"name": "bugmon", "params": QUERY}]
+
+# Indexed custom search parameters (field, operator, value, negate and join)
+CUSTOM_FIELD = re.compile(r"^([fovnj])(\d+)$")
+
+# Relative search dates, such as -2w or -1y
+RELATIVE_DATE = re.compile(r"^-(\d+)([hdwmy])$", re.IGNORECASE)
+
+
+def load_queries(path: Path) -> List[MonitorQuery]:
+    """Load a query set from a JSON file
+
+    The file contains a list of objects with a unique "name" and the Bugzilla
+    search "params" for that query.  The triage fields are always requested.
+
+    :param path: Path to the query set
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise BugmonTaskError(f"Unable to read query set {path}: {e}") from e
+
+    if not isinstance(data, list) or not data:
+        raise BugmonTaskError("Query set must be a non-empty list")
+
+    queries: List[MonitorQuery] = []
+    for entry in data:
+        if (
+            not isinstance(entry, dict)
+            or not isinstance(entry.get("name"), str)
+            or not entry["name"]
+            or not isinstance(entry.get("params"), dict)
+        ):
+            raise BugmonTaskError(f"Invalid query: {entry!r}")
+        if any(query["name"] == entry["name"] for query in queries):
+            raise BugmonTaskError(f"Duplicate query name: {entry['name']!r}")
+
+        params = {"query_format": "advanced", **entry["params"]}
+        params["include_fields"] = QUERY["include_fields"]
+        queries.append({"name": entry["name"], "params": params})
+
+    return queries
+
+
+def date_windows(start: date, end: date, months: int) -> List[Tuple[str, str]]:
+    """Split the range from start until end into windows of the given length
+
+    The final window is left open ended so that it includes bugs created today.
+
+    :param start: Start of the first window
+    :param end: Date after which no further windows are started
+    :param months: Length of each window in months
+    :return: chfieldfrom and chfieldto values for each window
+    """
+    windows = []
+    current = start
+    while True:
+        month = current.month - 1 + months
+        following = date(current.year + month // 12, month % 12 + 1, 1)
+        if following > end:
+            windows.append((current.isoformat(), "Now"))
+            return windows
+        windows.append((current.isoformat(), following.isoformat()))
+        current = following
+
+
+def parse_search_date(value: str, today: date) -> Optional[date]:
+    """Resolve a chfieldfrom value to a date, rounded down to a whole day or month
+
+    :param value: ISO date or time, relative date (-1y, -2w, ...) or Now
+    :param today: Date relative values are resolved against
+    :return: The date, or None if the value is not understood
+    """
+    if value.lower() == "now":
+        return today
+
+    match = RELATIVE_DATE.match(value)
+    if match is not None:
+        count, unit = int(match[1]), match[2].lower()
+        if unit in "hdw":
+            days = {"h": count // 24 + 1, "d": count, "w": count * 7}[unit]
+            return today - timedelta(days=days)
+        month = today.year * 12 + today.month - 1 - count * (12 if unit == "y" else 1)
+        return date(month // 12, month % 12 + 1, 1)
+
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def after_bug(params: Dict[str, Any], bug_id: int) -> Dict[str, Any]:
+    """Restrict a search to bugs with an id greater than bug_id
+
+    Searches combining their conditions with anything but AND are grouped, so
+    that the restriction applies to the search as a whole.
+
+    :param params: Search parameters
+    :param bug_id: Last bug id seen
+    """
+    params = dict(params)
+    matches = [CUSTOM_FIELD.match(key) for key in params]
+    last = max((int(match[2]) for match in matches if match), default=0)
+
+    if params.get("j_top", "AND") != "AND":
+        grouped: Dict[str, Any] = {}
+        for key, value in params.items():
+            match = CUSTOM_FIELD.match(key)
+            grouped[f"{match[1]}{int(match[2]) + 1}" if match else key] = value
+        grouped.update({"f1": "OP", "j1": params["j_top"], f"f{last + 2}": "CP"})
+        grouped["j_top"] = "AND"
+        params = grouped
+        last += 2
+
+    index = last + 1
+    params.update(
+        {f"f{index}": "bug_id", f"o{index}": "greaterthan", f"v{index}": str(bug_id)}
+    )
+    return params
+
+
+def merge_bugs(*streams: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Merge streams of raw bugs sorted by id, dropping duplicates
+
+    When a bug appears in several streams, the copy from the first stream wins.
+
+    :param streams: Raw bug streams, each sorted by bug id
+    """
+    last_id = None
+    for raw in heapq.merge(*streams, key=lambda raw: cast(int, raw["id"])):
+        if raw["id"] != last_id:
+            yield raw
+        last_id = raw["id"]
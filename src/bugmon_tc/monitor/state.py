@@ -0,0 +1,370 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Final, List, Literal, Optional, Tuple, TypedDict, Union
+
+LOG = logging.getLogger(__name__)
+
+STATE_ARTIFACT = Path("monitor-state.json")
+VERDICTS_ARTIFACT = Path("monitor-verdicts.json")
+FAILURES_ARTIFACT = Path("monitor-failures.json")
+
+# Delay before a failing bug is analyzed again, doubled for every failure
+FAILURE_BACKOFF = timedelta(hours=1)
+FAILURE_BACKOFF_MAX = timedelta(days=7)
+
+# Overlap between consecutive incremental queries, covering clock skew and bugs
+# which changed while the previous run was paging through its results
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# Verdict of an unsupported bug, which is actionable as it must be closed out
+UNSUPPORTED: Final = "unsupported"
+
+# Whether a bug is actionable, or UNSUPPORTED
+Verdict = Union[bool, Literal["unsupported"]]
+
+try:
+    BUGMON_VERSION = metadata.version("bugmon")
+except metadata.PackageNotFoundError:  # pragma: no cover
+    BUGMON_VERSION = "unknown"
+
+
+class BugState(TypedDict):
+    """Interface representing the decision recorded for a single bug"""
+
+    last_change_time: str
+    actionable: Verdict
+
+
+class FailureState(TypedDict):
+    """Interface representing repeated analysis failures of a single bug"""
+
+    count: int
+    error: str
+    last_change_time: str
+    retry_after: str
+
+
+class ScheduledTask(TypedDict):
+    """Interface representing a processor task whose runtime is yet to be observed"""
+
+    taskId: str
+    action: str
+    system: str
+
+
+class MonitorState:
+    """Persisted monitor state used for incremental runs"""
+
+    def __init__(
+        self,
+        last_change_time: Optional[str] = None,
+        bugs: Optional[Dict[int, BugState]] = None,
+        failures: Optional[Dict[int, FailureState]] = None,
+        runtimes: Optional[Dict[str, float]] = None,
+        scheduled: Optional[Dict[int, ScheduledTask]] = None,
+        sources: Optional[Dict[int, List[str]]] = None,
+        force_confirm: bool = False,
+    ) -> None:
+        """Instantiate a new MonitorState instance.
+
+        :param last_change_time: Bugs changed since this time are queried (watermark)
+        :param bugs: Per-bug decision state
+        :param failures: Per-bug analysis failures
+        :param runtimes: Average processor runtime in seconds, by action/system
+        :param scheduled: Processor tasks submitted by earlier runs, by bug id
+        :param sources: Names of the queries which returned each bug
+        :param force_confirm: Whether the verdicts were produced with forced
+            confirmations
+        """
+        self.last_change_time = last_change_time
+        self.bugs: Dict[int, BugState] = bugs if bugs is not None else {}
+        self.failures: Dict[int, FailureState] = failures if failures else {}
+        self.runtimes: Dict[str, float] = runtimes if runtimes else {}
+        self.scheduled: Dict[int, ScheduledTask] = scheduled if scheduled else {}
+        self.sources: Dict[int, List[str]] = sources if sources else {}
+        self.force_confirm = force_confirm
+
+    @classmethod
+    def load(cls, path: Path) -> "MonitorState":
+        """Load state from disk, returning an empty state if none exists
+
+        :param path: Path to the state file
+        """
+        if not path.exists():
+            LOG.info(f"No monitor state found at {path} - performing a full scan")
+            return cls()
+
+        data = json.loads(path.read_text())
+        bugs = {int(bug_id): state for bug_id, state in data["bugs"].items()}
+        failures = {
+            int(bug_id): failure for bug_id, failure in data.get("failures", {}).items()
+        }
+        scheduled = {
+            int(bug_id): task for bug_id, task in data.get("scheduled", {}).items()
+        }
+        sources = {
+            int(bug_id): names for bug_id, names in data.get("sources", {}).items()
+        }
+        return cls(
+            data["last_change_time"],
+            bugs,
+            failures,
+            data.get("runtimes", {}),
+            scheduled,
+            sources,
+            data.get("force_confirm", False),
+        )
+
+    def save(self, path: Path) -> None:
+        """Write state to disk
+
+        :param path: Path to the state file
+        """
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+
+        data = {
+            "last_change_time": self.last_change_time,
+            "bugs": {str(bug_id): self.bugs[bug_id] for bug_id in sorted(self.bugs)},
+            "failures": {
+                str(bug_id): self.failures[bug_id] for bug_id in sorted(self.failures)
+            },
+            "runtimes": self.runtimes,
+            "scheduled": {
+                str(bug_id): self.scheduled[bug_id] for bug_id in sorted(self.scheduled)
+            },
+            "sources": {
+                str(bug_id): self.sources[bug_id] for bug_id in sorted(self.sources)
+            },
+            "force_confirm": self.force_confirm,
+        }
+        with path.open("w") as file:
+            json.dump(data, file, indent=2)
+
+    def actionable_bugs(self) -> List[int]:
+        """Bug ids which were actionable at the time they were last analyzed"""
+        return sorted(bug_id for bug_id, s in self.bugs.items() if s["actionable"])
+
+    def get_verdict(
+        self, bug_id: int, last_change_time: Optional[str]
+    ) -> Optional[Verdict]:
+        """Return the previous verdict if the bug is unchanged since it was recorded
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        """
+        state = self.bugs.get(bug_id)
+        if state is None or state["last_change_time"] != last_change_time:
+            return None
+        return state["actionable"]
+
+    def record(
+        self,
+        bug_id: int,
+        last_change_time: str,
+        actionable: Verdict,
+        sources: Optional[List[str]] = None,
+    ) -> None:
+        """Record the verdict for a bug
+
+        The sources of actionable bugs are kept, as they are absent from the
+        incremental query results until they change again.
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        :param actionable: Whether the bug was actionable, or UNSUPPORTED
+        :param sources: Names of the queries which returned the bug
+        """
+        self.bugs[bug_id] = {
+            "last_change_time": last_change_time,
+            "actionable": actionable,
+        }
+        self.failures.pop(bug_id, None)
+        if actionable and sources:
+            self.sources[bug_id] = sources
+        elif not actionable:
+            self.sources.pop(bug_id, None)
+
+    def record_failure(
+        self,
+        bug_id: int,
+        last_change_time: str,
+        error: str,
+        now: datetime,
+        sources: Optional[List[str]] = None,
+    ) -> None:
+        """Record an analysis failure and back off exponentially
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        :param error: Description of the failure
+        :param now: Current time
+        :param sources: Names of the queries which returned the bug
+        """
+        count = self.failures[bug_id]["count"] + 1 if bug_id in self.failures else 1
+        delay = min(FAILURE_BACKOFF * 2 ** (count - 1), FAILURE_BACKOFF_MAX)
+        self.failures[bug_id] = {
+            "count": count,
+            "error": error,
+            "last_change_time": last_change_time,
+            "retry_after": (now + delay).isoformat(),
+        }
+        self.bugs.pop(bug_id, None)
+        if sources:
+            self.sources[bug_id] = sources
+
+    def in_backoff(
+        self, bug_id: int, last_change_time: Optional[str], now: datetime
+    ) -> bool:
+        """Determine if analysis of an unchanged, failing bug should be skipped
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        :param now: Current time
+        """
+        failure = self.failures.get(bug_id)
+        if failure is None or failure["last_change_time"] != last_change_time:
+            return False
+        return now < datetime.fromisoformat(failure["retry_after"])
+
+    def retry_due(self, now: datetime) -> List[int]:
+        """Failing bug ids whose backoff period has elapsed
+
+        :param now: Current time
+        """
+        return sorted(
+            bug_id
+            for bug_id, failure in self.failures.items()
+            if now >= datetime.fromisoformat(failure["retry_after"])
+        )
+
+    def reset(self, force_confirm: bool) -> None:
+        """Discard every verdict and the watermark, so that all bugs are analyzed
+
+        :param force_confirm: Whether the verdicts recorded next are produced with
+            forced confirmations
+        """
+        self.last_change_time = None
+        self.bugs = {}
+        self.sources = {}
+        self.force_confirm = force_confirm
+
+    def forget(self, bug_id: int) -> None:
+        """Drop any state recorded for a bug
+
+        :param bug_id: Bug id
+        """
+        self.bugs.pop(bug_id, None)
+        self.failures.pop(bug_id, None)
+        self.sources.pop(bug_id, None)
+
+    def advance(self, started: datetime) -> None:
+        """Advance the watermark once a run has seen every matching bug
+
+        Bug timestamps aren't used, as results are paged without a snapshot and a
+        bug which changed while paging could otherwise be skipped for good.
+
+        :param started: Time the run started querying bugs
+        """
+        watermark = (started - WATERMARK_OVERLAP).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if self.last_change_time is None or watermark > self.last_change_time:
+            self.last_change_time = watermark
+
+
+class VerdictCache:
+    """Size-bounded LRU cache of analysis verdicts
+
+    Verdicts are keyed on the bug id and its last_change_time, and the whole
+    cache is discarded when the installed bugmon version changes. Verdicts
+    forced by --force-confirm are never cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 20000,
+        version: str = BUGMON_VERSION,
+    ) -> None:
+        """Instantiate a new VerdictCache instance.
+
+        :param max_entries: Maximum number of verdicts retained
+        :param version: bugmon version the verdicts were produced with
+        """
+        self.max_entries = max_entries
+        self.version = version
+        self._entries: OrderedDict[Tuple[int, str], Verdict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @classmethod
+    def load(cls, path: Path, max_entries: int = 20000) -> "VerdictCache":
+        """Load the cache from disk, returning an empty cache if none is usable
+
+        :param path: Path to the cache file
+        :param max_entries: Maximum number of verdicts retained
+        """
+        cache = cls(max_entries)
+        if not path.exists():
+            return cache
+
+        data = json.loads(path.read_text())
+        if data["version"] != cache.version:
+            LOG.info(f"Discarding verdicts produced by bugmon {data['version']}")
+            return cache
+
+        for bug_id, last_change_time, verdict in data["entries"]:
+            cache.put(bug_id, last_change_time, verdict)
+
+        return cache
+
+    def save(self, path: Path) -> None:
+        """Write the cache to disk, least recently used entries first
+
+        :param path: Path to the cache file
+        """
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+
+        with self._lock:
+            entries = [[*key, verdict] for key, verdict in self._entries.items()]
+
+        with path.open("w") as file:
+            json.dump({"version": self.version, "entries": entries}, file)
+
+    def get(self, bug_id: int, last_change_time: Optional[str]) -> Optional[Verdict]:
+        """Return the cached verdict for an unchanged bug
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        """
+        if last_change_time is None:
+            return None
+
+        key = (bug_id, last_change_time)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, bug_id: int, last_change_time: str, verdict: Verdict) -> None:
+        """Store a verdict, evicting the least recently used entries if needed
+
+        :param bug_id: Bug id
+        :param last_change_time: The bug's current last_change_time
+        :param verdict: Whether the bug was actionable, or UNSUPPORTED
+        """
+        with self._lock:
+            self._entries[(bug_id, last_change_time)] = verdict
+            self._entries.move_to_end((bug_id, last_change_time))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -2,28 +2,45 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 import abc
+import base64
+import hashlib
 import os
+import uuid
 
 from datetime import datetime, timedelta
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, cast
 
 from bugmon import EnhancedBug
 from taskcluster.utils import fromNow
-from taskcluster.utils import slugId
 from taskcluster.utils import stringDate
 
-from ..common import queue, in_taskcluster
+from ..common import queue, in_taskcluster, parse_tc_datetime
+from ..common.builds import BUILD_CACHE_NAME, BUILD_CACHE_PATH
 
 MAX_RUNTIME = 14400
 
+# Bugs handled by a batch processor, whose name lists every bug id and is
+# limited to 255 characters by Taskcluster
+MAX_BATCH_SIZE = 20
 
-def _parse_tc_datetime(value: str) -> datetime:
-    """Parse a Taskcluster ISO 8601 datetime string into a naive UTC datetime."""
-    if value.endswith("Z"):
-        value = value[:-1] + "+00:00"
-    return datetime.fromisoformat(value).replace(tzinfo=None)
+# Image used by every task unless a lighter one suffices
+DEFAULT_IMAGE = {
+    "type": "indexed-image",
+    "path": "public/bugmon.tar.zst",
+    "namespace": "project.fuzzing.orion.bugmon.master",
+}
+
+# Slim image for reporters which only update Bugzilla
+REPORTER_IMAGE = {
+    "type": "indexed-image",
+    "path": "public/bugmon-reporter.tar.zst",
+    "namespace": "project.fuzzing.orion.bugmon-reporter.master",
+}
+
+# Time allowed to report results once processors have reached their deadline
+REPORT_GRACE = timedelta(minutes=10)
 
 
 @lru_cache(maxsize=1)
@@ -35,6 +52,50 @@ def _get_monitor_task() -> Dict[str, Any]:
         raise RuntimeError(f"Failed to fetch monitor task definition: {e}") from e
 
 
+def _get_created() -> datetime:
+    """Resolve the child task creation time.
+
+    In Taskcluster, reuses the monitor task's creation time so that task
+    definitions are identical when a monitor run is retried.  Outside
+    Taskcluster, returns the current time.
+    """
+    if in_taskcluster():
+        return parse_tc_datetime(_get_monitor_task()["created"])
+    return datetime.utcnow()
+
+
+def derive_task_id(parent_id: str, bug_id: Union[int, str], kind: str) -> str:
+    """Derive a stable slugId from the parent task, bug and task kind.
+
+    Retried monitor runs produce the same ids, which makes task creation
+    idempotent.
+
+    :param parent_id: ID of parent task
+    :param bug_id: Bug ID, or the joined ids of the bugs a batch handles
+    :param kind: Task kind
+    """
+    digest = hashlib.sha256(f"{parent_id}/{bug_id}/{kind}".encode()).digest()
+    # Taskcluster requires v4 UUIDs; clearing the top bit matches slugid.nice()
+    # and ensures the id never starts with "-"
+    raw = bytearray(uuid.UUID(bytes=digest[:16], version=4).bytes)
+    raw[0] &= 0x7F
+    return base64.urlsafe_b64encode(bytes(raw)).decode()[:22]
+
+
+def derive_batch_id(parent_id: str, bugs: Iterable[EnhancedBug], kind: str) -> str:
+    """Derive a stable slugId for a task handling several bugs.
+
+    The id covers the whole set of bugs, so that a retried run admitting other
+    bugs creates a new task rather than conflicting with the existing one.
+
+    :param parent_id: ID of parent task
+    :param bugs: Bugs handled by the task
+    :param kind: Task kind
+    """
+    bug_ids = ",".join(str(bug_id) for bug_id in sorted(bug.id for bug in bugs))
+    return derive_task_id(parent_id, bug_ids, kind)
+
+
 def _get_deadline() -> datetime:
     """Resolve the child task deadline.
 
@@ -43,7 +104,7 @@ def _get_deadline() -> datetime:
     falls back to now + MAX_RUNTIME + 1 hour.
     """
     if in_taskcluster():
-        deadline = _parse_tc_datetime(_get_monitor_task()["deadline"])
+        deadline = parse_tc_datetime(_get_monitor_task()["deadline"])
         return deadline - timedelta(minutes=15)
     return datetime.utcnow() + timedelta(seconds=MAX_RUNTIME + 3600)
 
@@ -51,11 +112,18 @@ def _get_deadline() -> datetime:
 class BaseTask(abc.ABC):
     """Abstract class for defining tasks"""
 
-    def __init__(self, parent_id: str, bug: EnhancedBug) -> None:
-        self.id = slugId()
+    def __init__(
+        self, parent_id: str, bug: EnhancedBug, priority: str = "high"
+    ) -> None:
+        self.id = derive_task_id(parent_id, bug.id, type(self).__name__)
         self.parent_id = parent_id
         self.bug = bug
+        # Every bug handled by the task, batches handle several
+        self.bugs = [bug]
+        self.priority = priority
         self.dependency: Optional[str] = None
+        # Taskcluster's dependency relation, all-completed unless set
+        self.requires: Optional[str] = None
         self._task: Optional[Dict[str, Any]] = None
 
     @property
@@ -63,6 +131,21 @@ class BaseTask(abc.ABC):
         """Task capabilities"""
         return {}
 
+    @property
+    def cache(self) -> Dict[str, str]:
+        """Worker caches mounted by the task, by name"""
+        return {}
+
+    @property
+    def image(self) -> Dict[str, str]:
+        """Docker image the task runs in"""
+        return dict(DEFAULT_IMAGE)
+
+    @property
+    def name(self) -> str:
+        """Task name, identifying the task kind and bug"""
+        return f"{type(self).__name__} ({self.bug.id})"
+
     @property
     @abc.abstractmethod
     def env(self) -> Dict[str, str]:
@@ -76,20 +159,20 @@ class BaseTask(abc.ABC):
             if self.dependency is not None:
                 dependencies.append(self.dependency)
 
-            now = datetime.utcnow()
+            created = _get_created()
             deadline = _get_deadline()
-            max_run_time = int((deadline - now).total_seconds())
+            max_run_time = int((deadline - created).total_seconds())
 
             self._task = {
                 "taskGroupId": self.parent_id,
                 "dependencies": dependencies,
-                "created": stringDate(now),
+                "created": stringDate(created),
                 "deadline": stringDate(deadline),
-                "expires": stringDate(fromNow("1 week", now)),
+                "expires": stringDate(fromNow("1 week", created)),
                 "provisionerId": "proj-fuzzing",
                 "metadata": {
                     "description": "Bugmon worker",
-                    "name": f"{type(self).__name__} ({self.bug.id})",
+                    "name": self.name,
                     "owner": "jkratzer@mozilla.com",
                     "source": "https://github.com/MozillaSecurity/bugmon",
                 },
@@ -100,18 +183,14 @@ class BaseTask(abc.ABC):
                             "type": "directory",
                         }
                     },
-                    "cache": {},
+                    "cache": self.cache,
                     "capabilities": self.capabilities,
                     "env": self.env,
                     "features": {"taskclusterProxy": True},
-                    "image": {
-                        "type": "indexed-image",
-                        "path": "public/bugmon.tar.zst",
-                        "namespace": "project.fuzzing.orion.bugmon.master",
-                    },
+                    "image": self.image,
                     "maxRunTime": max_run_time,
                 },
-                "priority": "high",
+                "priority": self.priority,
                 "workerType": self.worker_type,
                 "retries": 5,
                 "routes": ["notify.email.jkratzer@mozilla.com.on-failed"],
@@ -119,6 +198,8 @@ class BaseTask(abc.ABC):
                 "scopes": self.scopes,
                 "tags": {},
             }
+            if self.requires is not None:
+                self._task["requires"] = self.requires
 
         return self._task
 
@@ -144,6 +225,8 @@ class ProcessorTask(BaseTask):
         use_pernosco: bool = False,
         force_confirm: bool = False,
         enable_debug: bool = False,
+        priority: str = "high",
+        build_cache: bool = False,
     ) -> None:
         """Instantiate new instance.
 
@@ -152,10 +235,12 @@ class ProcessorTask(BaseTask):
         :param monitor_path: Path to monitor artifact
         :param use_pernosco: Boolean indicating if we need to record a pernosco trace
         :param force_confirm: Boolean indicating if we should confirm regardless of status
+        :param priority: Taskcluster task priority
+        :param build_cache: Keep builds in a worker cache shared with later tasks
         """
-        super().__init__(parent_id, bug)
-        self.id = slugId()
+        super().__init__(parent_id, bug, priority)
         self.parent_id = parent_id
+        self.bugs = [bug]
         self.monitor_path = monitor_path
         self.dest = Path(f"processor-result-{bug.id}-{self.parent_id}.json")
 
@@ -165,8 +250,24 @@ class ProcessorTask(BaseTask):
 
         self.force_confirm = force_confirm
         self.enable_debug = enable_debug
+        self.build_cache = build_cache
         self._task = None
 
+    @property
+    def uses_build_cache(self) -> bool:
+        """Determine if builds are kept in the worker cache
+
+        Worker caches are only mounted by docker-worker.
+        """
+        return self.build_cache and self.bug.platform.system == "Linux"
+
+    @property
+    def cache(self) -> Dict[str, str]:
+        """Worker caches mounted by the task, by name"""
+        if self.uses_build_cache:
+            return {BUILD_CACHE_NAME: BUILD_CACHE_PATH}
+        return super().cache
+
     @property
     def capabilities(self) -> Dict[str, Any]:
         """Task capabilities"""
@@ -197,6 +298,10 @@ class ProcessorTask(BaseTask):
         if self.trace_dest:
             env_object["TRACE_ARTIFACT"] = str(self.trace_dest)
 
+        # autobisect keeps its build store under the user cache directory
+        if self.uses_build_cache:
+            env_object["XDG_CACHE_HOME"] = BUILD_CACHE_PATH
+
         if self.bug.platform.system == "Windows":
             env_object["MSYSTEM"] = "MINGW64"
 
@@ -219,6 +324,9 @@ class ProcessorTask(BaseTask):
                 ]
             )
 
+        if self.uses_build_cache:
+            scopes.append(f"docker-worker:cache:{BUILD_CACHE_NAME}")
+
         return sorted(scopes)
 
     @property
@@ -282,6 +390,49 @@ class ProcessorTask(BaseTask):
         return "bugmon-processor"
 
 
+class BatchProcessorTask(ProcessorTask):
+    """Helper class for generating processor tasks which handle several bugs"""
+
+    def __init__(
+        self,
+        parent_id: str,
+        bugs: List[EnhancedBug],
+        monitor_path: Path,
+        force_confirm: bool = False,
+        enable_debug: bool = False,
+        priority: str = "high",
+        build_cache: bool = False,
+    ) -> None:
+        """Instantiate new instance.
+
+        :param parent_id: ID of parent task
+        :param bugs: Bugs sharing the same platform and worker type
+        :param monitor_path: Path to the batch monitor artifact
+        :param force_confirm: Confirm bugs regardless of their status
+        :param priority: Taskcluster task priority
+        :param build_cache: Keep builds in a worker cache shared with later tasks
+        """
+        super().__init__(
+            parent_id,
+            bugs[0],
+            monitor_path,
+            force_confirm=force_confirm,
+            enable_debug=enable_debug,
+            priority=priority,
+            build_cache=build_cache,
+        )
+        self.bugs = bugs
+        self.id = derive_batch_id(parent_id, bugs, type(self).__name__)
+        # One result is written per bug, named after the bug id
+        self.dest = Path(f"processor-result-{{bug_id}}-{parent_id}.json")
+
+    @property
+    def name(self) -> str:
+        """Task name, identifying every bug in the batch"""
+        bug_ids = ", ".join(str(bug.id) for bug in self.bugs)
+        return f"ProcessorTask ({bug_ids})"
+
+
 class ReporterTask(BaseTask):
     """Helper class for generating reporter tasks"""
 
@@ -293,6 +444,8 @@ class ReporterTask(BaseTask):
         dep: str,
         trace_path: Optional[Path] = None,
         enable_debug: bool = False,
+        priority: str = "high",
+        lightweight: bool = False,
     ):
         """Instantiate a new ReporterTask instance.
 
@@ -301,24 +454,53 @@ class ReporterTask(BaseTask):
         :param process_path: Path to process artifact
         :param dep: Task dependency
         :param trace_path: Optional path to trace artifact.
+        :param priority: Taskcluster task priority
+        :param lightweight: Run without a trace on the slim reporter profile
         """
-        super().__init__(parent_id, bug)
+        super().__init__(parent_id, bug, priority)
         self.process_path = process_path
 
         self.dependency = dep
         self.trace_dest = trace_path
         self.enable_debug = enable_debug
+        self.use_lightweight = lightweight
+
+    @property
+    def dependency(self) -> Optional[str]:
+        """Processor task whose results are reported"""
+        return self._dependency
+
+    @dependency.setter
+    def dependency(self, task_id: Optional[str]) -> None:
+        # The id follows the processor, as a retried run may batch the bug
+        # into another processor
+        self._dependency = task_id
+        self.id = derive_task_id(
+            task_id or self.parent_id, self.bug.id, type(self).__name__
+        )
+
+    @property
+    def lightweight(self) -> bool:
+        """Reporters without a trace only update Bugzilla and need no privileges"""
+        return self.use_lightweight and self.trace_dest is None
 
     @property
     def capabilities(self) -> Dict[str, Any]:
         """Task capabilities"""
-        if self.bug.platform.system == "Linux":
+        if self.bug.platform.system == "Linux" and not self.lightweight:
             return {
                 "privileged": True,
             }
 
         return super().capabilities
 
+    @property
+    def image(self) -> Dict[str, str]:
+        """Docker image the task runs in"""
+        if self.lightweight:
+            return dict(REPORTER_IMAGE)
+        return super().image
+
     @property
     def env(self) -> Dict[str, str]:
         """Environment variables for the task"""
@@ -341,19 +523,25 @@ class ReporterTask(BaseTask):
         base = "project/fuzzing/bugmon"
         scopes = [
             "secrets:get:project/fuzzing/bz-api-key",
-            "secrets:get:project/fuzzing/pernosco-user",
-            "secrets:get:project/fuzzing/pernosco-group",
-            "secrets:get:project/fuzzing/pernosco-secret",
             f"queue:get-artifact:{base}/{self.process_path}",
             "queue:scheduler-id:fuzzing",
         ]
 
+        if not self.lightweight:
+            scopes.extend(
+                [
+                    "secrets:get:project/fuzzing/pernosco-user",
+                    "secrets:get:project/fuzzing/pernosco-group",
+                    "secrets:get:project/fuzzing/pernosco-secret",
+                ]
+            )
+
         if self.trace_dest:
             scopes.append(
                 f"queue:get-artifact:{base}/{self.trace_dest}",
             )
 
-        if self.bug.platform.system == "Linux":
+        if self.bug.platform.system == "Linux" and not self.lightweight:
             scopes.extend(
                 [
                     "docker-worker:capability:privileged",
@@ -365,4 +553,86 @@ class ReporterTask(BaseTask):
     @property
     def worker_type(self) -> str:
         """The worker type to use for this task"""
+        if self.lightweight:
+            # Fast-start pool for reporters which only update Bugzilla
+            return "bugmon-reporter"
         return "bugmon-monitor"
+
+
+class BatchReporterTask(ReporterTask):
+    """Helper class for generating a reporter task which reports every bug in a run"""
+
+    def __init__(
+        self,
+        parent_id: str,
+        reporters: List[ReporterTask],
+        manifest_path: Path,
+        enable_debug: bool = False,
+        lightweight: bool = False,
+    ) -> None:
+        """Instantiate a new BatchReporterTask instance.
+
+        :param parent_id: ID of parent task
+        :param reporters: Reporters replaced by this task
+        :param manifest_path: Path to the artifact listing each processor result
+        :param lightweight: Run on the slim reporter profile
+        """
+        super().__init__(
+            parent_id,
+            reporters[0].bug,
+            manifest_path,
+            reporters[0].dependency or parent_id,
+            enable_debug=enable_debug,
+            lightweight=lightweight,
+        )
+        self.bugs = [reporter.bug for reporter in reporters]
+        self.id = derive_batch_id(parent_id, self.bugs, type(self).__name__)
+        self.dependencies = sorted(
+            {r.dependency for r in reporters if r.dependency is not None}
+        )
+        # Processors which failed must not prevent the others being reported
+        self.requires = "all-resolved"
+
+    @property
+    def name(self) -> str:
+        """Task name, counting the bugs as task names are limited in length"""
+        return f"{type(self).__name__} ({len(self.bugs)} bugs)"
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Environment variables for the task"""
+        env_object = super().env
+        env_object["BATCH_REPORT"] = "1"
+        return env_object
+
+    @property
+    def task(self) -> Dict[str, Any]:
+        """Task definition"""
+        if self._task is None:
+            task = super().task
+            task["dependencies"] = [self.parent_id, *self.dependencies]
+            task["deadline"] = stringDate(_get_deadline() + REPORT_GRACE)
+        return cast(Dict[str, Any], self._task)
+
+    @property
+    def scopes(self) -> List[str]:
+        """Scopes applied to the task"""
+        base = "project/fuzzing/bugmon"
+        scopes = [
+            "secrets:get:project/fuzzing/bz-api-key",
+            f"queue:get-artifact:{base}/{self.process_path}",
+            f"queue:get-artifact:{base}/processor-result-*",
+            "queue:scheduler-id:fuzzing",
+        ]
+
+        if self.bug.platform.system == "Linux" and not self.lightweight:
+            scopes.append("docker-worker:capability:privileged")
+
+        return sorted(scopes)
+
+
+# The processor and reporter of a single bug
+TaskPair = Tuple[ProcessorTask, ReporterTask]
+
+# A processor and the reporters depending on it
+TaskUnit = Tuple[ProcessorTask, List[ReporterTask]]
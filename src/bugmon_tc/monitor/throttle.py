@@ -0,0 +1,129 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import logging
+import math
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from bugmon import EnhancedBug
+
+from ..common import queue
+
+LOG = logging.getLogger(__name__)
+
+# Processor tasks each worker pool completes per hour
+DEFAULT_POOL_THROUGHPUT = {
+    "bugmon-processor": 40.0,
+    "bugmon-pernosco": 4.0,
+    "bugmon-processor-windows": 6.0,
+}
+
+# Share of a scarce pool's budget held back for the highest priority bugs
+SCARCE_POOLS = ("bugmon-pernosco", "bugmon-processor-windows")
+POOL_RESERVE = 0.25
+
+# Task priority which may use the reserved share of scarce pools
+RESERVED_PRIORITY = "high"
+
+
+# Ways of grouping bugs for fair-share scheduling
+GROUPINGS = ("component", "platform")
+
+
+def group_key(bug: EnhancedBug, grouping: str) -> str:
+    """Fair-share group of a bug
+
+    :param bug: Bug to classify
+    :param grouping: Either "component" or "platform"
+    """
+    if grouping == "platform":
+        return str(bug.platform.system)
+    return f"{bug.product}::{bug.component}"
+
+
+def fetch_pending_counts(worker_types: Iterable[str]) -> Dict[str, int]:
+    """Fetch the number of pending tasks of each worker pool
+
+    :param worker_types: Worker types to query
+    """
+    counts = {}
+    for worker_type in worker_types:
+        response = queue.pendingTasks(f"proj-fuzzing/{worker_type}")
+        counts[worker_type] = int(response["pendingTasks"])
+        LOG.info(f"{worker_type} has {counts[worker_type]} pending task(s)")
+    return counts
+
+
+class PoolLimiter:
+    """Caps the tasks submitted to each worker pool to what it can absorb"""
+
+    def __init__(
+        self,
+        throughput: Dict[str, float],
+        pending: Dict[str, int],
+        deadline: datetime,
+        now: datetime,
+        group_share: Optional[float] = None,
+    ) -> None:
+        """Instantiate a new PoolLimiter instance.
+
+        :param throughput: Tasks completed per hour by each worker pool
+        :param pending: Number of tasks already pending in each worker pool
+        :param deadline: Deadline of the tasks being submitted
+        :param now: Current time
+        :param group_share: Share of each pool's budget available to a single
+            fair-share group (None disables quotas)
+        """
+        hours = max(0.0, (deadline - now).total_seconds() / 3600)
+        self.budgets: Dict[str, int] = {}
+        self.reserved: Dict[str, int] = {}
+        for worker_type, rate in throughput.items():
+            capacity = math.floor(rate * hours)
+            self.budgets[worker_type] = max(0, capacity - pending.get(worker_type, 0))
+            if worker_type in SCARCE_POOLS:
+                self.reserved[worker_type] = math.ceil(capacity * POOL_RESERVE)
+            LOG.info(f"{worker_type} can absorb {self.budgets[worker_type]} task(s)")
+
+        self.quotas: Dict[str, int] = {}
+        if group_share is not None:
+            self.quotas = {
+                worker_type: max(1, math.ceil(budget * group_share))
+                for worker_type, budget in self.budgets.items()
+            }
+        self.usage: Counter[Tuple[str, str]] = Counter()
+
+    def available(self, worker_type: str, priority: str) -> bool:
+        """Determine if a pool can absorb another task of the given priority
+
+        :param worker_type: Worker type the task runs on
+        :param priority: Taskcluster task priority
+        """
+        if worker_type not in self.budgets:
+            return True
+
+        floor = 0
+        if priority != RESERVED_PRIORITY:
+            floor = self.reserved.get(worker_type, 0)
+        return self.budgets[worker_type] > floor
+
+    def within_quota(self, worker_type: str, group: str) -> bool:
+        """Determine if a group has used less than its share of a pool
+
+        :param worker_type: Worker type the task runs on
+        :param group: Fair-share group of the bug
+        """
+        if worker_type not in self.quotas:
+            return True
+        return self.usage[(worker_type, group)] < self.quotas[worker_type]
+
+    def consume(self, worker_type: str, group: str = "") -> None:
+        """Account for a task submitted to a pool
+
+        :param worker_type: Worker type the task runs on
+        :param group: Fair-share group of the bug
+        """
+        if worker_type in self.budgets:
+            self.budgets[worker_type] -= 1
+            self.usage[(worker_type, group)] += 1
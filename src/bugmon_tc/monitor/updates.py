@@ -0,0 +1,80 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, TypedDict
+
+from bugmon import BugMonitor
+from bugmon.bug import EnhancedBug
+from bugsy import Bugsy, BugsyException
+from requests import RequestException
+
+LOG = logging.getLogger(__name__)
+
+# Artifact recording the updates applied directly by the monitor
+UPDATES_ARTIFACT = Path("monitor-updates.json")
+
+
+class BugUpdate(TypedDict):
+    """Interface representing changes applied to a bug without spawning tasks"""
+
+    bug_id: int
+    diff: Dict[str, Any]
+
+
+def compute_update(bugsy: Bugsy, bug: EnhancedBug, force_confirm: bool) -> BugUpdate:
+    """Compute the changes a processor task would make to an unsupported bug
+
+    Unsupported bugs are only closed out, which requires no builds.
+
+    :param bugsy: Bugzilla session
+    :param bug: Unsupported bug
+    :param force_confirm: Confirm bugs regardless of their status
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bugmon = BugMonitor(bugsy, bug, Path(temp_dir), dry_run=True)
+        bugmon.process(force_confirm)
+
+    return {"bug_id": bug.id, "diff": bug.diff()}
+
+
+def coalesce_updates(
+    updates: List[BugUpdate],
+) -> List[Tuple[Dict[str, Any], List[int]]]:
+    """Group bugs receiving identical changes
+
+    :param updates: Updates of each bug
+    :return: Each distinct change and the bugs it applies to
+    """
+    groups: Dict[str, Tuple[Dict[str, Any], List[int]]] = {}
+    for update in updates:
+        key = json.dumps(update["diff"], sort_keys=True)
+        groups.setdefault(key, (update["diff"], []))[1].append(update["bug_id"])
+    return list(groups.values())
+
+
+def apply_updates(bugsy: Bugsy, updates: List[BugUpdate]) -> List[int]:
+    """Apply updates, changing bugs with identical changes in a single request
+
+    :param bugsy: Bugzilla session
+    :param updates: Updates of each bug
+    :return: Ids of the bugs which could not be updated
+    """
+    failed: List[int] = []
+    for diff, bug_ids in coalesce_updates(updates):
+        if not diff:
+            continue
+
+        try:
+            bugsy.request(f"bug/{bug_ids[0]}", "PUT", json={**diff, "ids": bug_ids})
+        except (BugsyException, RequestException) as e:
+            LOG.error(f"Failed to update bug(s) {bug_ids}: {e}")
+            failed.extend(bug_ids)
+            continue
+
+        LOG.info(f"Committing ({', '.join(map(str, bug_ids))}): {json.dumps(diff)}")
+
+    return failed
@@ -8,9 +8,9 @@ import os
 import shutil
 import tempfile
 from pathlib import Path
-from typing import Any, Optional, Dict, List
+from typing import Any, Optional, Dict, List, Union
 
-from bugmon import BugMonitor
+from bugmon import BugMonitor, BugmonException
 from bugmon.bug import EnhancedBug
 from bugmon.utils import get_pernosco_trace
 
@@ -81,6 +81,36 @@ def process_bug(
         return None
 
 
+def process_batch(
+    bugs_data: List[Dict[str, Any]],
+    proc_dest: str,
+    force_confirm: bool = False,
+) -> None:
+    """Process several bugs, writing one result per bug.
+
+    A bug which fails to process is skipped so that the remainder of the batch is
+    still processed. Its result is missing, so only its own reporter fails, but
+    the batch is still reported as failed. Unexpected errors are not caught.
+
+    :param bugs_data: Raw data of each bug.
+    :param proc_dest: Destination for storing process results, with a {bug_id}
+        placeholder.
+    :param force_confirm: Optional boolean indicating if we should confirm bugs.
+    """
+    failed = []
+    for bug_data in bugs_data:
+        dest = Path(proc_dest.format(bug_id=bug_data["id"]))
+        try:
+            process_bug(bug_data, dest, force_confirm=force_confirm)
+        except (BugmonException, BugmonTaskError, OSError):
+            LOG.exception(f"Failed to process bug {bug_data['id']}")
+            failed.append(bug_data["id"])
+
+    LOG.info(f"Processed {len(bugs_data) - len(failed)}/{len(bugs_data)} bug(s)")
+    if failed:
+        raise BugmonTaskError(f"No results were written for bug(s) {failed}")
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse arguments"""
     parser = base_parser(prog="BugmonProcessor")
@@ -128,6 +158,7 @@ def main(argv: Optional[List[str]] = None) -> None:
     """Process bug"""
     args = parse_args(argv)
 
+    monitor_artifact: Union[Dict[str, Any], List[Dict[str, Any]]]
     if in_taskcluster():
         task = queue.task(os.getenv("TASK_ID"))
         task_id = task.get("taskGroupId")
@@ -135,6 +166,15 @@ def main(argv: Optional[List[str]] = None) -> None:
     else:
         monitor_artifact = json.loads(args.monitor_artifact.read_text())
 
+    # Batch monitor artifacts hold a list of bugs
+    if isinstance(monitor_artifact, list):
+        process_batch(
+            monitor_artifact,
+            str(args.processor_artifact),
+            force_confirm=args.force_confirm,
+        )
+        return
+
     process_bug(
         monitor_artifact,
         args.processor_artifact,
@@ -6,14 +6,10 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional, List
+from typing import TYPE_CHECKING, Any, Dict, Optional, List, cast
 
-from bugmon.utils import (
-    submit_pernosco,
-    is_pernosco_available,
-    PernoscoCreds,
-)
-from bugsy import Bugsy
+from bugsy import Bugsy, BugsyException
+from requests import RequestException
 
 from ..common import (
     fetch_trace_artifact,
@@ -27,16 +23,25 @@ from ..common import (
 )
 from ..common.cli import base_parser
 
+if TYPE_CHECKING:
+    from bugmon.utils import PernoscoCreds
+
 LOG = logging.getLogger(__name__)
 
 
-def update_bug(bug_data: Dict[str, Any], bz_creds: BugzillaCreds) -> None:
+def update_bug(
+    bug_data: Dict[str, Any],
+    bz_creds: BugzillaCreds,
+    bugsy: Optional[Bugsy] = None,
+) -> None:
     """Update bug.
 
     :param bug_data: Processed bug data
     :param bz_creds: Bugzilla credentials
+    :param bugsy: Existing Bugzilla session to reuse
     """
-    bugsy = Bugsy(api_key=bz_creds["KEY"], bugzilla_url=bz_creds["URL"])
+    if bugsy is None:
+        bugsy = Bugsy(api_key=bz_creds["KEY"], bugzilla_url=bz_creds["URL"])
     bugsy.request(f"bug/{bug_data['bug_number']}", "PUT", json=bug_data["diff"])
 
     # Log changes
@@ -51,7 +56,7 @@ def update_bug(bug_data: Dict[str, Any], bz_creds: BugzillaCreds) -> None:
 def submit_trace(
     bug_data: Dict[str, Any],
     trace_artifact: Path,
-    pernosco_creds: PernoscoCreds,
+    pernosco_creds: "PernoscoCreds",
 ) -> None:
     """Submit pernosco trace
 
@@ -59,6 +64,13 @@ def submit_trace(
     :param trace_artifact: Trace artifact path
     :param pernosco_creds: Pernosco credentials
     """
+    # Only imported when needed, reporters without a trace run from a slim image
+    # which doesn't include bugmon
+    from bugmon.utils import (  # pylint: disable=import-outside-toplevel
+        submit_pernosco,
+        is_pernosco_available,
+    )
+
     if not is_pernosco_available():
         raise BugmonTaskError("Cannot find working instance of pernosco-submit!")
 
@@ -74,6 +86,38 @@ def submit_trace(
         )
 
 
+def report_batch(manifest: List[Dict[str, Any]], bz_creds: BugzillaCreds) -> None:
+    """Apply the results of every processor listed in a report manifest
+
+    Processors which failed leave no result behind; the remaining bugs are still
+    updated, over a single Bugzilla session. Unexpected errors are not caught.
+
+    :param manifest: Processor task id and result path of each bug
+    :param bz_creds: Bugzilla credentials
+    """
+    bugsy = Bugsy(api_key=bz_creds["KEY"], bugzilla_url=bz_creds["URL"])
+    failed = []
+    for entry in manifest:
+        try:
+            if in_taskcluster():
+                bug_data = fetch_json_artifact(entry["taskId"], Path(entry["path"]))
+            else:
+                bug_data = json.loads(Path(entry["path"]).read_text(encoding="utf-8"))
+            update_bug(bug_data, bz_creds, bugsy)
+        except (
+            BugmonTaskError,
+            BugsyException,
+            RequestException,
+            json.JSONDecodeError,
+            OSError,
+        ):
+            LOG.exception(f"Failed to report bug {entry['bug_id']}")
+            failed.append(entry["bug_id"])
+
+    if failed:
+        raise BugmonTaskError(f"Failed to report {len(failed)} bug(s): {failed}")
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse arguments"""
     parser = base_parser(prog="BugmonReporter")
@@ -83,6 +127,12 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         type=Path,
         help="Path to store the rr trace archive.",
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Treat the artifact as a manifest of processor results to report",
+        default=os.environ.get("BATCH_REPORT", False),
+    )
 
     args = parser.parse_args(args=argv)
 
@@ -107,6 +157,17 @@ def main(argv: Optional[List[str]] = None) -> None:
     """Report processed results"""
     args = parse_args(argv)
 
+    if args.batch:
+        if in_taskcluster():
+            task = queue.task(os.getenv("TASK_ID"))
+            manifest = fetch_json_artifact(
+                task.get("taskGroupId"), args.processor_artifact
+            )
+        else:
+            manifest = json.loads(args.processor_artifact.read_text())
+        report_batch(cast(List[Dict[str, Any]], manifest), get_bugzilla_auth())
+        return
+
     if in_taskcluster():
         task = queue.task(os.getenv("TASK_ID"))
         dependencies = task.get("dependencies")
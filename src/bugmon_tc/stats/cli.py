@@ -0,0 +1,106 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, cast
+
+from .history import RunHistory, SummaryRow
+from ..common.cli import base_parser
+
+LOG = logging.getLogger(__name__)
+
+COLUMNS = [
+    "kind",
+    "action",
+    "platform",
+    "tasks",
+    "completed",
+    "failed",
+    "runs",
+    "mean_duration",
+    "max_duration",
+]
+
+
+def format_summary(rows: List[SummaryRow]) -> str:
+    """Render summary rows as a plain text table
+
+    :param rows: Summary rows
+    """
+    table = [COLUMNS]
+    for row in rows:
+        cells = []
+        for column in COLUMNS:
+            value = cast(Dict[str, Any], row)[column]
+            if value is None:
+                cells.append("-")
+            elif column.endswith("_duration"):
+                cells.append(str(timedelta(seconds=round(value))))
+            else:
+                cells.append(str(value))
+        table.append(cells)
+
+    widths = [max(len(line[i]) for line in table) for i in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in table
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse arguments"""
+    parser = base_parser(prog="BugmonStats")
+    parser.add_argument("history", type=Path, help="Path to the run history database")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "collect", help="Record durations and outcomes of resolved tasks"
+    )
+    summary = commands.add_parser(
+        "summary", help="Summarize outcomes and durations of scheduled tasks"
+    )
+    summary.add_argument(
+        "--days",
+        type=int,
+        help="Only include tasks scheduled during the last N days",
+    )
+    summary.add_argument(
+        "--json", action="store_true", help="Output the summary as JSON"
+    )
+
+    args = parser.parse_args(args=argv)
+
+    if args.command == "summary" and args.days is not None and args.days < 1:
+        parser.error("--days must be a positive integer")
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Collect and query bugmon run history"""
+    args = parse_args(argv)
+
+    history = RunHistory(args.history)
+    try:
+        if args.command == "collect":
+            history.collect()
+        else:
+            since = None
+            if args.days is not None:
+                since = datetime.utcnow() - timedelta(days=args.days)
+            rows = history.summary(since)
+            if args.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                print(format_summary(rows))
+    finally:
+        history.close()
@@ -0,0 +1,242 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, TypedDict, Union, cast
+
+from taskcluster.exceptions import TaskclusterFailure, TaskclusterRestFailure
+
+from ..common import parse_tc_datetime, queue
+
+LOG = logging.getLogger(__name__)
+
+HISTORY_ARTIFACT = Path("monitor-history.sqlite")
+
+# Task states after which no further runs are scheduled
+FINAL_STATES = ("completed", "failed", "exception")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    task_group_id TEXT NOT NULL,
+    bug_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    action TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    worker_type TEXT NOT NULL,
+    scheduled TEXT NOT NULL,
+    outcome TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    task_id TEXT NOT NULL REFERENCES tasks (task_id),
+    run_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    reason_resolved TEXT,
+    started TEXT,
+    resolved TEXT,
+    duration REAL,
+    PRIMARY KEY (task_id, run_id)
+);
+CREATE TABLE IF NOT EXISTS task_bugs (
+    task_id TEXT NOT NULL REFERENCES tasks (task_id),
+    bug_id INTEGER NOT NULL,
+    PRIMARY KEY (task_id, bug_id)
+);
+"""
+
+SUMMARY_QUERY = """
+SELECT
+    tasks.kind,
+    tasks.action,
+    tasks.platform,
+    COUNT(DISTINCT tasks.task_id) AS tasks,
+    COUNT(DISTINCT CASE WHEN tasks.outcome = 'completed' THEN tasks.task_id END)
+        AS completed,
+    COUNT(DISTINCT CASE WHEN tasks.outcome IN ('failed', 'exception')
+        THEN tasks.task_id END) AS failed,
+    COUNT(runs.run_id) AS runs,
+    AVG(runs.duration) AS mean_duration,
+    MAX(runs.duration) AS max_duration
+FROM tasks LEFT JOIN runs ON runs.task_id = tasks.task_id
+WHERE tasks.scheduled >= ?
+GROUP BY tasks.kind, tasks.action, tasks.platform
+ORDER BY tasks.kind, tasks.action, tasks.platform
+"""
+
+
+class SummaryRow(TypedDict):
+    """Interface representing aggregated statistics of one kind of task"""
+
+    kind: str
+    action: str
+    platform: str
+    tasks: int
+    completed: int
+    failed: int
+    runs: int
+    mean_duration: Optional[float]
+    max_duration: Optional[float]
+
+
+class RunHistory:
+    """SQLite store of scheduled bugmon tasks and their runs"""
+
+    def __init__(self, path: Union[Path, str] = ":memory:") -> None:
+        """Open (and create if needed) a history database.
+
+        :param path: Path to the database file
+        """
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database"""
+        self.connection.close()
+
+    def save(self, path: Path) -> None:
+        """Write a consistent copy of the database, e.g. as an artifact
+
+        :param path: Destination path
+        """
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+
+        destination = sqlite3.connect(str(path))
+        try:
+            with destination:
+                self.connection.backup(destination)
+        finally:
+            destination.close()
+
+    def record_task(
+        self,
+        task_id: str,
+        task_group_id: str,
+        bug_id: int,
+        kind: str,
+        action: str,
+        platform: str,
+        worker_type: str,
+        scheduled: datetime,
+        bug_ids: Optional[List[int]] = None,
+    ) -> None:
+        """Record a scheduled task
+
+        :param task_id: Task id
+        :param task_group_id: Task group (monitor task) id
+        :param bug_id: Bug id (the first bug of a batch)
+        :param kind: Task kind (ProcessorTask or ReporterTask)
+        :param action: Action the bug is expected to need
+        :param platform: Platform the bug is processed on
+        :param worker_type: Worker type the task runs on
+        :param scheduled: Time the task was scheduled
+        :param bug_ids: Every bug handled by the task, if it handles several
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                (
+                    task_id,
+                    task_group_id,
+                    bug_id,
+                    kind,
+                    action,
+                    platform,
+                    worker_type,
+                    scheduled.isoformat(),
+                ),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO task_bugs VALUES (?, ?)",
+                [(task_id, bug) for bug in (bug_ids or [bug_id])],
+            )
+
+    def task_bugs(self, task_id: str) -> List[int]:
+        """Ids of the bugs handled by a task
+
+        :param task_id: Task id
+        """
+        cursor = self.connection.execute(
+            "SELECT bug_id FROM task_bugs WHERE task_id = ? ORDER BY bug_id",
+            (task_id,),
+        )
+        return [bug_id for (bug_id,) in cursor]
+
+    def unresolved_tasks(self) -> List[str]:
+        """Ids of tasks whose outcome hasn't been collected yet"""
+        cursor = self.connection.execute(
+            "SELECT task_id FROM tasks WHERE outcome IS NULL ORDER BY scheduled"
+        )
+        return [task_id for (task_id,) in cursor]
+
+    def collect(self) -> int:
+        """Record the runs and outcome of every resolved task
+
+        :return: Number of tasks which resolved since the last collection
+        """
+        collected = 0
+        for task_id in self.unresolved_tasks():
+            try:
+                status = queue.status(task_id)["status"]
+            except TaskclusterRestFailure as e:
+                if e.status_code == 404:
+                    # The task expired before its outcome was collected
+                    self._resolve(task_id, "expired")
+                    continue
+                LOG.warning(f"Unable to fetch status of task {task_id}: {e}")
+                continue
+            except TaskclusterFailure as e:
+                LOG.warning(f"Unable to fetch status of task {task_id}: {e}")
+                continue
+
+            if status["state"] not in FINAL_STATES:
+                continue
+
+            with self.connection:
+                for run in status["runs"]:
+                    duration = None
+                    if run.get("started") and run.get("resolved"):
+                        started = parse_tc_datetime(run["started"])
+                        resolved = parse_tc_datetime(run["resolved"])
+                        duration = (resolved - started).total_seconds()
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            task_id,
+                            run["runId"],
+                            run["state"],
+                            run.get("reasonResolved"),
+                            run.get("started"),
+                            run.get("resolved"),
+                            duration,
+                        ),
+                    )
+            self._resolve(task_id, status["state"])
+            collected += 1
+
+        LOG.info(f"Collected the outcome of {collected} task(s)")
+        return collected
+
+    def summary(self, since: Optional[datetime] = None) -> List[SummaryRow]:
+        """Aggregate outcomes and run durations by task kind, action and platform
+
+        :param since: Only include tasks scheduled after this time
+        """
+        start = since.isoformat() if since is not None else ""
+        cursor = self.connection.execute(SUMMARY_QUERY, (start,))
+        columns = [column[0] for column in cursor.description]
+        return [cast(SummaryRow, dict(zip(columns, row))) for row in cursor]
+
+    def _resolve(self, task_id: str, outcome: str) -> None:
+        """Record the final outcome of a task
+
+        :param task_id: Task id
+        :param outcome: Final task state
+        """
+        with self.connection:
+            self.connection.execute(
+                "UPDATE tasks SET outcome = ? WHERE task_id = ?", (outcome, task_id)
+            )
@@ -0,0 +1,24 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from bugmon.bug import EnhancedBug
+
+from bugmon_tc.common.builds import build_key
+
+
+def test_build_key(bug_data, mocker):
+    """Test that bugs on different platforms have different build identities"""
+    bug = EnhancedBug(None, **bug_data)
+    other = EnhancedBug(None, **dict(bug_data, id=1))
+    assert build_key(bug) == build_key(other)
+
+    mocker.patch("bugmon.bug.platform.system", return_value="Windows")
+    windows = EnhancedBug(None, **dict(bug_data, op_sys="Windows"))
+    assert build_key(bug) != build_key(windows)
+
+
+def test_build_key_unknown(bug_data, mocker):
+    """Test that bugs with an unknown branch have no build identity"""
+    mocker.patch.object(EnhancedBug, "branch", new=None)
+    bug = EnhancedBug(None, **bug_data)
+    assert build_key(bug) is None
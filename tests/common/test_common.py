@@ -2,6 +2,7 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 import os
+from datetime import datetime
 from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch
 
@@ -19,6 +20,7 @@ from bugmon_tc.common import (
     get_bugzilla_auth,
     get_pernosco_auth,
     fetch_trace_artifact,
+    parse_tc_datetime,
 )
 
 
@@ -36,6 +38,14 @@ def test_monitor_in_taskcluster(monkeypatch, is_enabled):
     assert common.in_taskcluster() is is_enabled
 
 
+@pytest.mark.parametrize(
+    "value", ["2024-01-01T12:00:00.000Z", "2024-01-01T13:00:00.000+01:00"]
+)
+def test_parse_tc_datetime(value):
+    """Test that Taskcluster datetimes are converted to naive UTC datetimes"""
+    assert parse_tc_datetime(value) == datetime(2024, 1, 1, 12)
+
+
 def test_get_url_success(mocker):
     """Test that get_url succeeds"""
     # Mock the requests.get method to return a successful response
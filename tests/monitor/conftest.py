@@ -0,0 +1,43 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+
+from bugmon_tc.monitor.tasks import _get_monitor_task
+
+
+@pytest.fixture(autouse=True)
+def _clear_monitor_task_cache():
+    """Clear _get_monitor_task cache between tests."""
+    _get_monitor_task.cache_clear()
+    yield
+    _get_monitor_task.cache_clear()
+
+
+@pytest.fixture
+def bz_request(mocker):
+    """Bugzilla requests, answering every search with no bugs"""
+    return mocker.patch("bugsy.Bugsy.request", return_value={"bugs": []})
+
+
+@pytest.fixture
+def cache_bug(mocker):
+    """Bug hydration, returning bugs as they were fetched"""
+    return mocker.patch("bugmon.bug.EnhancedBug.cache_bug", side_effect=lambda bug: bug)
+
+
+@pytest.fixture
+def local_run(mocker):
+    """Monitor run outside of Taskcluster, with "parent" as the monitor task id"""
+    mocker.patch("bugmon_tc.monitor.monitor.in_taskcluster", return_value=False)
+    mocker.patch("bugmon_tc.monitor.monitor.slugId", return_value="parent")
+    mocker.patch("bugmon_tc.monitor.tasks.in_taskcluster", return_value=False)
+
+
+@pytest.fixture
+def tc_run(mocker, monkeypatch):
+    """Monitor run in Taskcluster as task "parent", returning task submissions"""
+    monkeypatch.setenv("TASK_ID", "parent")
+    mocker.patch("bugmon_tc.monitor.monitor.in_taskcluster", return_value=True)
+    mocker.patch("bugmon_tc.monitor.tasks.in_taskcluster", return_value=False)
+    return mocker.patch("bugmon_tc.common.queue.createTask")
@@ -0,0 +1,115 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime, timedelta
+
+from taskcluster.exceptions import TaskclusterFailure
+
+from bugmon_tc.monitor.admission import (
+    RUNTIME_MARGIN,
+    collect_runtimes,
+    estimate_runtime,
+    observe_runtime,
+)
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.monitor import BugMonitorTask
+
+
+def test_estimate_runtime_defaults():
+    """Test that unobserved runtimes fall back to per-action defaults"""
+    linux = estimate_runtime("bisect", "Linux", {})
+    windows = estimate_runtime("bisect", "Windows", {})
+    assert linux == timedelta(hours=3) * RUNTIME_MARGIN
+    assert windows == linux * 1.5
+
+
+def test_estimate_runtime_observed():
+    """Test that observed runtimes take precedence over the defaults"""
+    runtimes = {}
+    observe_runtime(runtimes, "confirm/Linux", 600)
+    observe_runtime(runtimes, "confirm/Linux", 1600)
+    assert runtimes["confirm/Linux"] == 900
+    assert estimate_runtime("confirm", "Linux", runtimes) == timedelta(
+        seconds=900 * RUNTIME_MARGIN
+    )
+
+
+def test_collect_runtimes(mocker):
+    """Test that completed tasks are observed and unresolved ones kept"""
+    statuses = {
+        "done": {
+            "state": "completed",
+            "runs": [
+                {
+                    "state": "completed",
+                    "started": "2024-01-01T00:00:00.000Z",
+                    "resolved": "2024-01-01T01:00:00.000Z",
+                }
+            ],
+        },
+        "busy": {"state": "running", "runs": [{"state": "running"}]},
+    }
+
+    def status(task_id):
+        if task_id not in statuses:
+            raise TaskclusterFailure("Not found")
+        return {"status": statuses[task_id]}
+
+    mocker.patch("bugmon_tc.common.queue.status", side_effect=status)
+
+    scheduled = {
+        1: {"taskId": "done", "action": "bisect", "system": "Linux"},
+        2: {"taskId": "busy", "action": "bisect", "system": "Linux"},
+        3: {"taskId": "gone", "action": "bisect", "system": "Linux"},
+    }
+    runtimes = {}
+    assert collect_runtimes(scheduled, runtimes) == {2: scheduled[2]}
+    assert runtimes == {"bisect/Linux": 3600}
+
+
+def test_monitor_create_tasks_admission(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that bugs which cannot finish before the deadline are deferred"""
+    bugs = [
+        dict(bug_data, id=1, whiteboard="[bugmon:bisect]"),
+        dict(bug_data, id=2, whiteboard="[bugmon:confirmed]"),
+    ]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch(
+        "bugmon_tc.monitor.admission._get_deadline",
+        return_value=datetime.utcnow() + timedelta(hours=2),
+    )
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(admission=True))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    assert sorted(path.name for path in tmp_path.glob("processor-task-*")) == [
+        "processor-task-2-parent.json"
+    ]
+    assert monitor.deferred == [1]
+
+
+def test_monitor_create_tasks_batched_admission(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that batched bugs are admitted for the runtime of a whole batch"""
+    bugs = [dict(bug_data, id=1, whiteboard="[bugmon:bisected]")]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch(
+        "bugmon_tc.monitor.admission.estimate_runtime",
+        return_value=timedelta(minutes=30),
+    )
+    mocker.patch(
+        "bugmon_tc.monitor.admission._get_deadline",
+        return_value=datetime.utcnow() + timedelta(hours=1),
+    )
+
+    config = MonitorConfig(admission=True, batch_size=4)
+    monitor = BugMonitorTask("key", "root", config)
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    assert not list(tmp_path.glob("processor-task-*"))
+    assert monitor.deferred == [1]
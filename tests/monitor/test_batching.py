@@ -0,0 +1,180 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+
+import pytest
+from taskcluster.exceptions import TaskclusterFailure
+
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.monitor import BugMonitorTask, MonitorError
+from bugmon_tc.monitor.tasks import derive_task_id
+from bugmon_tc.stats.history import RunHistory
+
+
+def _batch_id(bug_ids):
+    return derive_task_id("parent", ",".join(map(str, bug_ids)), "BatchProcessorTask")
+
+
+def test_monitor_create_tasks_batched(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that bugs sharing a worker type are processed in batches"""
+    bug_data["whiteboard"] = "[bugmon:bisected]"
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+    bugs.append(dict(bug_data, id=4, whiteboard="[bugmon:confirmed,pernosco]"))
+    bz_request.return_value = {"bugs": bugs}
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(batch_size=2))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    batch = json.loads((tmp_path / "processor-task-1-parent.json").read_text())
+    assert batch["metadata"]["name"] == "ProcessorTask (1, 2)"
+    env = batch["payload"]["env"]
+    batch_id = _batch_id([1, 2])
+    assert env["MONITOR_ARTIFACT"] == f"monitor-batch-{batch_id}.json"
+    assert env["PROCESSOR_ARTIFACT"] == "processor-result-{bug_id}-parent.json"
+    artifact = json.loads((tmp_path / env["MONITOR_ARTIFACT"]).read_text())
+    assert [bug["id"] for bug in artifact] == [1, 2]
+
+    for bug_id in [1, 2]:
+        path = tmp_path / f"reporter-task-{bug_id}-parent.json"
+        reporter = json.loads(path.read_text())
+        assert reporter["dependencies"] == ["parent", batch_id]
+        assert reporter["requires"] == "all-resolved"
+
+    # The remaining bug and the pernosco bug are processed on their own
+    for bug_id in [3, 4]:
+        path = tmp_path / f"processor-task-{bug_id}-parent.json"
+        assert json.loads(path.read_text())["metadata"]["name"] == (
+            f"ProcessorTask ({bug_id})"
+        )
+
+
+def test_monitor_create_tasks_batched_by_build(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that only bugs fetching the same builds are batched together"""
+    bug_data["whiteboard"] = "[bugmon:bisected]"
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch(
+        "bugmon_tc.monitor.batching.build_key",
+        side_effect=lambda bug: "beta" if bug.id == 2 else "central",
+    )
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(batch_size=2))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    path = tmp_path / f"monitor-batch-{_batch_id([1, 3])}.json"
+    assert [bug["id"] for bug in json.loads(path.read_text())] == [1, 3]
+    path = tmp_path / "processor-task-2-parent.json"
+    assert json.loads(path.read_text())["metadata"]["name"] == "ProcessorTask (2)"
+
+
+def test_monitor_create_tasks_batched_unknown_build(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that bugs with an unknown build identity are never batched"""
+    bug_data["whiteboard"] = "[bugmon:bisected]"
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2]]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon_tc.monitor.batching.build_key", return_value=None)
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(batch_size=2))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    assert not list(tmp_path.glob("monitor-batch-*.json"))
+    for bug_id in [1, 2]:
+        assert (tmp_path / f"processor-task-{bug_id}-parent.json").exists()
+
+
+def test_monitor_create_tasks_batched_short_actions(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that only confirmations and verifications are batched"""
+    bugs = [
+        dict(bug_data, id=1, whiteboard="[bugmon:bisected]"),
+        dict(bug_data, id=2, whiteboard="[bugmon:bisect]"),
+        dict(bug_data, id=3, whiteboard="[bugmon:bisected]"),
+    ]
+    bz_request.return_value = {"bugs": bugs}
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(batch_size=2))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    path = tmp_path / f"monitor-batch-{_batch_id([1, 3])}.json"
+    assert [bug["id"] for bug in json.loads(path.read_text())] == [1, 3]
+    path = tmp_path / "processor-task-2-parent.json"
+    assert json.loads(path.read_text())["metadata"]["name"] == "ProcessorTask (2)"
+
+
+def test_monitor_create_tasks_history_batch(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that every bug of a batch is recorded in the run history"""
+    bug_data["whiteboard"] = "[bugmon:bisected]"
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2]]
+    bz_request.return_value = {"bugs": bugs}
+
+    history = RunHistory()
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(batch_size=2), history=history
+    )
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    assert history.task_bugs(_batch_id([1, 2])) == [1, 2]
+    reporter_id = derive_task_id(_batch_id([1, 2]), 2, "ReporterTask")
+    assert history.task_bugs(reporter_id) == [2]
+
+
+def test_monitor_create_tasks_fan_in_report(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that a single reporter reports every bug whose processor was submitted"""
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+    bugs.append(dict(bug_data, id=4, whiteboard="[bugmon:confirmed,pernosco]"))
+    bz_request.return_value = {"bugs": bugs}
+
+    def create_task(_task_id, definition):
+        if definition["metadata"]["name"] == "ProcessorTask (2)":
+            raise TaskclusterFailure("Error!")
+
+    tc_run.side_effect = create_task
+    monitor = BugMonitorTask("key", "root", MonitorConfig(fan_in_report=True))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    with pytest.raises(MonitorError, match="1 bug"):
+        monitor.create_tasks(tmp_path)
+
+    tasks = {
+        call.args[1]["metadata"]["name"]: call.args[1] for call in tc_run.call_args_list
+    }
+    # Pernosco traces are still uploaded by their own reporter
+    assert sorted(name for name in tasks if name.startswith("ReporterTask")) == [
+        "ReporterTask (4)"
+    ]
+    batch = tasks["BatchReporterTask (2 bugs)"]
+    assert batch["requires"] == "all-resolved"
+    assert batch["dependencies"] == [
+        "parent",
+        *sorted(derive_task_id("parent", i, "ProcessorTask") for i in [1, 3]),
+    ]
+    assert batch["payload"]["env"]["BATCH_REPORT"] == "1"
+
+    # The reporter and its manifest are named after the bugs being reported
+    reporter_id = derive_task_id("parent", "1,3", "BatchReporterTask")
+    assert [call.args[0] for call in tc_run.call_args_list][-1] == (reporter_id)
+    manifest_path = batch["payload"]["env"]["PROCESSOR_ARTIFACT"]
+    assert manifest_path == f"report-manifest-{reporter_id}.json"
+    manifest = json.loads((tmp_path / manifest_path).read_text())
+    assert [entry["bug_id"] for entry in manifest] == [1, 3]
+    assert manifest[0] == {
+        "bug_id": 1,
+        "taskId": derive_task_id("parent", 1, "ProcessorTask"),
+        "path": "processor-result-1-parent.json",
+    }
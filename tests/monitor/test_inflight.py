@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from taskcluster.exceptions import TaskclusterFailure
+
+from bugmon_tc.monitor.inflight import cancel_pending_tasks, fetch_inflight_tasks
+from bugmon_tc.monitor.tasks import derive_task_id
+
+
+def _entry(task_id, name, group="group"):
+    return {
+        "taskId": task_id,
+        "task": {"taskGroupId": group, "metadata": {"name": name}},
+    }
+
+
+def test_fetch_inflight_tasks(mocker):
+    """Test that pending and running bugmon tasks are indexed by bug id"""
+    pending_pages = {
+        None: {
+            "tasks": [_entry("a", "ProcessorTask (1)")],
+            "continuationToken": "next",
+        },
+        "next": {"tasks": [_entry("b", "ReporterTask (2)")]},
+    }
+
+    def list_pending(task_queue, query):
+        if task_queue != "proj-fuzzing/bugmon-processor":
+            return {"tasks": []}
+        return pending_pages[query.get("continuationToken")]
+
+    def list_claimed(task_queue, query):
+        if task_queue != "proj-fuzzing/bugmon-pernosco":
+            return {"tasks": []}
+        return {
+            "tasks": [
+                _entry("c", "ProcessorTask (3)"),
+                _entry("d", "ProcessorTask (4)", group="current"),
+                _entry("e", "Bugmon monitor"),
+            ]
+        }
+
+    mocker.patch("bugmon_tc.common.queue.listPendingTasks", side_effect=list_pending)
+    mocker.patch("bugmon_tc.common.queue.listClaimedTasks", side_effect=list_claimed)
+
+    index = fetch_inflight_tasks(exclude_group="current")
+    assert index == {
+        1: [
+            {
+                "taskId": "a",
+                "taskGroupId": "group",
+                "kind": "ProcessorTask",
+                "state": "pending",
+                "bug_ids": [1],
+            }
+        ],
+        2: [
+            {
+                "taskId": "b",
+                "taskGroupId": "group",
+                "kind": "ReporterTask",
+                "state": "pending",
+                "bug_ids": [2],
+            }
+        ],
+        3: [
+            {
+                "taskId": "c",
+                "taskGroupId": "group",
+                "kind": "ProcessorTask",
+                "state": "running",
+                "bug_ids": [3],
+            }
+        ],
+    }
+
+
+def test_cancel_pending_tasks(mocker):
+    """Test that pending tasks and the reporters of pending processors are cancelled"""
+    mock_cancel = mocker.patch("bugmon_tc.common.queue.cancelTask")
+    tasks = [
+        {
+            "taskId": "a",
+            "taskGroupId": "group",
+            "kind": "ProcessorTask",
+            "state": "pending",
+            "bug_ids": [1],
+        },
+        {
+            "taskId": "b",
+            "taskGroupId": "group",
+            "kind": "ReporterTask",
+            "state": "running",
+            "bug_ids": [1],
+        },
+    ]
+
+    assert not cancel_pending_tasks(1, tasks)
+
+    cancelled = [call.args[0] for call in mock_cancel.call_args_list]
+    assert cancelled == ["a", derive_task_id("a", 1, "ReporterTask")]
+
+
+def test_cancel_pending_tasks_failure(mocker):
+    """Test that failing to cancel a task is not fatal"""
+    mock_cancel = mocker.patch(
+        "bugmon_tc.common.queue.cancelTask", side_effect=TaskclusterFailure("Error!")
+    )
+    tasks = [
+        {
+            "taskId": "a",
+            "taskGroupId": "group",
+            "kind": "ReporterTask",
+            "state": "pending",
+            "bug_ids": [1],
+        },
+    ]
+
+    cancel_pending_tasks(1, tasks)
+    mock_cancel.assert_called_once_with("a")
+
+
+def test_fetch_inflight_tasks_batch(mocker):
+    """Test that batched processors are indexed under each of their bugs"""
+
+    def list_pending(task_queue, query):
+        if task_queue != "proj-fuzzing/bugmon-processor":
+            return {"tasks": []}
+        return {"tasks": [_entry("a", "ProcessorTask (1, 2)")]}
+
+    mocker.patch("bugmon_tc.common.queue.listPendingTasks", side_effect=list_pending)
+    mocker.patch("bugmon_tc.common.queue.listClaimedTasks", return_value={"tasks": []})
+
+    index = fetch_inflight_tasks()
+    assert sorted(index) == [1, 2]
+    assert index[1][0]["taskId"] == index[2][0]["taskId"] == "a"
+    assert index[1][0]["bug_ids"] == [1, 2]
+
+
+def test_cancel_pending_tasks_batch(mocker):
+    """Test that pending batches also processing other bugs are left alone"""
+    mock_cancel = mocker.patch("bugmon_tc.common.queue.cancelTask")
+    batch = {
+        "taskId": "a",
+        "taskGroupId": "group",
+        "kind": "ProcessorTask",
+        "state": "pending",
+        "bug_ids": [1, 2],
+    }
+
+    assert cancel_pending_tasks(1, [batch]) == [batch]
+    mock_cancel.assert_not_called()
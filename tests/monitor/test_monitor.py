@@ -2,22 +2,29 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 import json
+import time
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock
 
 import pytest
 from bugmon import BugmonException
 from bugmon.bug import EnhancedBug
-
-from bugmon_tc.monitor.monitor import BugMonitorTask, needs_force_confirmed
-from bugmon_tc.monitor.tasks import _get_monitor_task
-
-
-@pytest.fixture(autouse=True)
-def _clear_monitor_task_cache():
-    """Clear _get_monitor_task cache between tests."""
-    _get_monitor_task.cache_clear()
-    yield
-    _get_monitor_task.cache_clear()
+from taskcluster.exceptions import TaskclusterFailure, TaskclusterRestFailure
+
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.monitor import (
+    BugMonitorTask,
+    MonitorError,
+    batched,
+    imap_ordered,
+    in_shard,
+    needs_force_confirmed,
+    prefilter,
+    submit_task,
+)
+from bugmon_tc.monitor.queries import QUERY, TRIAGE_FIELDS, parse_search_date
+from bugmon_tc.monitor.state import MonitorState, VerdictCache
+from bugmon_tc.stats.history import RunHistory
 
 
 @pytest.mark.parametrize("status", ["ASSIGNED", "NEW", "UNCONFIRMED", "REOPENED"])
@@ -35,21 +42,482 @@ def test_needs_force_confirm_false(bug_data):
     assert needs_force_confirmed(True, bug) is False
 
 
-def test_monitor_fetch_bug(mocker, tmp_path, bug_data):
+def test_monitor_fetch_bug(mocker, bz_request, cache_bug, tmp_path, bug_data):
     """Test bug retrieval and iteration"""
-    bug_response = {"bugs": [bug_data]}
-    mocker.patch("bugsy.Bugsy.request", return_value=bug_response)
+    bz_request.return_value = {"bugs": [bug_data]}
     mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
 
-    cached_bug = EnhancedBug(None, **bug_data)
-    mocker.patch("bugmon.bug.EnhancedBug.cache_bug", return_value=cached_bug)
-
     monitor = BugMonitorTask("key", "root")
     result = list(monitor.fetch_bugs())
     assert len(result) == 1
     assert isinstance(result[0], EnhancedBug)
 
 
+def test_monitor_fetch_bugs_parallel(mocker, bz_request, cache_bug, bug_data):
+    """Test that concurrent analysis still yields bugs in bug id order"""
+    bugs = []
+    for bug_id in [1, 2, 3]:
+        data = dict(bug_data)
+        data["id"] = bug_id
+        bugs.append(data)
+
+    bz_request.return_value = {"bugs": bugs}
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(jobs=3))
+    mocker.patch.object(monitor, "is_actionable", side_effect=lambda bug: bug.id != 2)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 3]
+
+
+def test_monitor_fetch_bugs_paginated(mocker, bz_request, cache_bug, bug_data):
+    """Test that the bug query is fetched page by page in bug id order"""
+    mocker.patch("bugmon_tc.monitor.monitor.PAGE_SIZE", 2)
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3, 4, 5]]
+
+    def request(_path, params):
+        if "id" in params:
+            return {"bugs": bugs}
+        assert params["order"] == "bug_id"
+        assert params["limit"] == 2
+        assert params["f1"] == "bug_id" and params["o1"] == "greaterthan"
+        return {"bugs": [bug for bug in bugs if bug["id"] > int(params["v1"])][:2]}
+
+    bz_request.side_effect = request
+
+    monitor = BugMonitorTask("key", "root")
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 2, 3, 4, 5]
+    # Three pages followed by a single hydration request
+    assert bz_request.call_count == 4
+
+
+def test_imap_ordered():
+    """Test that results are produced in input order"""
+    result = list(imap_ordered(lambda x: x * 2, iter(range(10)), 3))
+    assert result == [(x, x * 2) for x in range(10)]
+
+
+def test_monitor_fetch_bugs_two_phase(mocker, bz_request, cache_bug, bug_data):
+    """Test that the full payload is only fetched for actionable bugs"""
+    triage_data = {k: v for k, v in bug_data.items() if k in TRIAGE_FIELDS}
+    slim = [dict(triage_data, id=1), dict(triage_data, id=2)]
+    full = dict(bug_data, id=2)
+
+    def request(_path, params):
+        if "id" in params:
+            assert params == {"id": "2", "include_fields": "_default"}
+            return {"bugs": [full]}
+        assert "_default" not in params["include_fields"]
+        return {"bugs": slim}
+
+    bz_request.side_effect = request
+
+    monitor = BugMonitorTask("key", "root")
+    mocker.patch.object(monitor, "is_actionable", side_effect=lambda bug: bug.id == 2)
+    result = list(monitor.fetch_bugs())
+    assert len(result) == 1
+    assert json.loads(result[0].to_json()) == full
+
+
+def test_monitor_fetch_bugs_concurrent_hydration(mocker, bz_request, bug_data):
+    """Test that bugs are cached concurrently but yielded in order"""
+    bugs = [dict(bug_data, id=bug_id) for bug_id in range(1, 9)]
+    bz_request.return_value = {"bugs": bugs}
+
+    def cache_bug(bug):
+        # Finish later bugs first
+        time.sleep((10 - bug.id) / 1000)
+        return bug
+
+    mock_cache_bug = mocker.patch(
+        "bugmon.bug.EnhancedBug.cache_bug", side_effect=cache_bug
+    )
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(jobs=4))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == list(range(1, 9))
+    assert mock_cache_bug.call_count == 8
+
+
+def test_in_shard():
+    """Test that every bug belongs to exactly one shard"""
+    for bug_id in range(100):
+        shards = [k for k in range(1, 5) if in_shard(bug_id, (k, 4))]
+        assert len(shards) == 1
+
+
+def test_monitor_fetch_bugs_shard(mocker, bz_request, cache_bug, bug_data):
+    """Test that only bugs in the requested shard are analyzed"""
+    bugs = [dict(bug_data, id=bug_id) for bug_id in range(1, 7)]
+    bz_request.return_value = {"bugs": bugs}
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(shard=(2, 3)))
+    is_actionable = mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 4]
+    assert is_actionable.call_count == 2
+
+
+def test_monitor_fetch_bugs_windows_unparsed(mocker, bz_request, cache_bug, bug_data):
+    """Test that searches from dates which cannot be parsed are not windowed"""
+    bz_request.return_value = {"bugs": [dict(bug_data, id=1)]}
+    windows = mocker.patch("bugmon_tc.monitor.monitor.date_windows")
+
+    query = {"name": "recent", "params": {"chfieldfrom": "yesterday"}}
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(window_months=3, queries=[query])
+    )
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1]
+    windows.assert_not_called()
+    assert bz_request.call_args_list[0].kwargs["params"]["chfieldfrom"] == "yesterday"
+
+
+def test_monitor_fetch_bugs_windows_relative(mocker, bz_request):
+    """Test that the first window of a relative search keeps the original start"""
+    bz_request.return_value = {"bugs": []}
+    windows = mocker.patch(
+        "bugmon_tc.monitor.monitor.date_windows",
+        return_value=[("2020-01-01", "2020-04-01"), ("2020-04-01", "Now")],
+    )
+
+    query = {"name": "recent", "params": {"chfieldfrom": "-1y"}}
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(window_months=3, queries=[query])
+    )
+    assert not list(monitor.fetch_bugs())
+    assert windows.call_args.args[0] == parse_search_date(
+        "-1y", datetime.utcnow().date()
+    )
+    starts = [
+        call.kwargs["params"]["chfieldfrom"] for call in bz_request.call_args_list
+    ]
+    assert sorted(starts) == ["-1y", "2020-04-01"]
+
+
+def test_monitor_fetch_bugs_windows(mocker, bz_request, cache_bug, bug_data):
+    """Test that window queries are merged into one de-duplicated ordered stream"""
+    windows = {
+        "2020-03-01": [dict(bug_data, id=1), dict(bug_data, id=3)],
+        "2020-06-01": [dict(bug_data, id=3), dict(bug_data, id=4)],
+        "2020-09-01": [dict(bug_data, id=2)],
+    }
+
+    def request(_path, params):
+        if "id" in params:
+            return {"bugs": [bug for bugs in windows.values() for bug in bugs]}
+        return {"bugs": windows[params["chfieldfrom"]]}
+
+    bz_request.side_effect = request
+    mocker.patch(
+        "bugmon_tc.monitor.monitor.date_windows",
+        return_value=[
+            ("2020-03-01", "2020-06-01"),
+            ("2020-06-01", "2020-09-01"),
+            ("2020-09-01", "Now"),
+        ],
+    )
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(window_months=3))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 2, 3, 4]
+
+
+def test_monitor_create_tasks_query_set(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
+    """Test that multiple queries are merged and their sources recorded"""
+    results = {
+        "a": [dict(bug_data, id=1), dict(bug_data, id=2)],
+        "b": [dict(bug_data, id=2), dict(bug_data, id=3)],
+    }
+
+    def request(_path, params):
+        if "id" in params:
+            return {"bugs": results["a"] + results["b"]}
+        return {"bugs": results[params["keywords"]]}
+
+    bz_request.side_effect = request
+
+    queries = [
+        {"name": "query-a", "params": {"keywords": "a"}},
+        {"name": "query-b", "params": {"keywords": "b"}},
+    ]
+    monitor = BugMonitorTask("key", "root", MonitorConfig(queries=queries))
+    mocker.patch.object(monitor, "is_actionable", side_effect=lambda bug: bug.id < 3)
+    monitor.create_tasks(tmp_path)
+
+    sources = json.loads((tmp_path / "monitor-queries.json").read_text())
+    assert sources == {"1": ["query-a"], "2": ["query-a", "query-b"]}
+
+
+def test_monitor_fetch_bugs_verdict_cache(mocker, bz_request, cache_bug, bug_data):
+    """Test that cached verdicts skip analysis and failures are not cached"""
+    bugs = [
+        dict(bug_data, id=1, last_change_time="t1"),
+        dict(bug_data, id=2, last_change_time="t2"),
+        dict(bug_data, id=3, last_change_time="t3"),
+    ]
+    bz_request.return_value = {"bugs": bugs}
+
+    cache = VerdictCache()
+    cache.put(1, "t1", False)
+    monitor = BugMonitorTask("key", "root", verdict_cache=cache)
+
+    def is_actionable(bug):
+        if bug.id == 3:
+            monitor.errors[bug.id] = "Error!"
+            return False
+        return True
+
+    mocker.patch.object(monitor, "is_actionable", side_effect=is_actionable)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [2]
+    assert monitor.stage_hits == {"cache": 1, "analysis": 2}
+    assert cache.get(2, "t2") is True
+    assert cache.get(3, "t3") is None
+
+
+def test_monitor_fetch_bugs_verdict_cache_force_confirm(
+    mocker, bz_request, cache_bug, bug_data
+):
+    """Test that forced confirmations neither use nor fill the verdict cache"""
+    bug_data["last_change_time"] = "t1"
+    bz_request.return_value = {"bugs": [bug_data]}
+
+    cache = VerdictCache()
+    cache.put(bug_data["id"], "t1", False)
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(force_confirm=True), verdict_cache=cache
+    )
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+
+    assert [bug.id for bug in monitor.fetch_bugs()] == [bug_data["id"]]
+    assert monitor.stage_hits == {"analysis": 1}
+    assert cache.get(bug_data["id"], "t1") is False
+
+
+def test_monitor_fetch_bugs_verdict_cache_unsupported(
+    mocker, bz_request, cache_bug, bug_data
+):
+    """Test that unsupported bugs are still closed out from cached verdicts"""
+    bugs = [
+        dict(bug_data, id=1, last_change_time="t1"),
+        dict(bug_data, id=2, last_change_time="t2"),
+    ]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+
+    cache = VerdictCache()
+    cache.put(1, "t1", "unsupported")
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(direct_updates=True), verdict_cache=cache
+    )
+
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 2]
+    assert monitor.stage_hits == {"cache": 1, "analysis": 1}
+    assert monitor.unsupported == {1, 2}
+    assert cache.get(2, "t2") == "unsupported"
+
+
+def test_batched():
+    """Test that items are split into bounded batches"""
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_monitor_fetch_bugs_incremental(mocker, bz_request, cache_bug, bug_data):
+    """Test that incremental runs query by watermark and reuse prior verdicts"""
+    changed = dict(bug_data, id=1, last_change_time="2024-02-01T00:00:00Z")
+    unchanged = dict(bug_data, id=2, last_change_time="2024-01-01T00:00:00Z")
+
+    state = MonitorState("2024-01-01T00:00:00Z")
+    state.record(2, "2024-01-01T00:00:00Z", True, ["default"])
+    state.record(3, "2024-01-01T00:00:00Z", True)
+
+    def request(_path, params):
+        if params.get("include_fields") == "_default":
+            assert params["id"] == "2"
+            return {"bugs": [unchanged]}
+        if "id" in params:
+            assert params["id"] == "2,3"
+            return {"bugs": [unchanged]}
+        assert params["last_change_time"] == "2024-01-01T00:00:00Z"
+        return {"bugs": [changed]}
+
+    bz_request.side_effect = request
+
+    monitor = BugMonitorTask("key", "root", state=state)
+    is_actionable = mocker.patch.object(monitor, "is_actionable", return_value=False)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [2]
+
+    # Only the changed bug is analyzed, and bug 3 is no longer visible
+    assert [call.args[0].id for call in is_actionable.call_args_list] == [1]
+    watermark = monitor.started - timedelta(minutes=10)
+    assert state.last_change_time == watermark.strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert state.get_verdict(1, "2024-02-01T00:00:00Z") is False
+    assert 3 not in state.bugs
+
+    # The unchanged bug keeps the sources recorded when it was first returned
+    assert monitor.bug_sources == {2: {"default"}}
+    assert state.sources == {2: ["default"]}
+
+
+def test_monitor_fetch_bugs_state_force_confirm(
+    mocker, bz_request, cache_bug, bug_data
+):
+    """Test that verdicts recorded without forced confirmations are discarded"""
+    bug_data["last_change_time"] = "t1"
+    state = MonitorState("2024-01-01T00:00:00Z")
+    state.record(bug_data["id"], "t1", False)
+    bz_request.return_value = {"bugs": [bug_data]}
+
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(force_confirm=True), state=state
+    )
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [bug_data["id"]]
+
+    # Every bug is queried again, as the watermark was discarded too
+    assert "last_change_time" not in bz_request.call_args_list[0].kwargs["params"]
+    assert monitor.stage_hits == {"analysis": 1}
+    assert state.force_confirm is True
+
+
+def test_monitor_fetch_bugs_state_unsupported(mocker, bz_request, cache_bug, bug_data):
+    """Test that unchanged unsupported bugs are still closed out"""
+    bug_data["last_change_time"] = "t1"
+    bz_request.return_value = {"bugs": [bug_data]}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+
+    state = MonitorState()
+    monitor = BugMonitorTask("key", "root", state=state)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [bug_data["id"]]
+    assert state.get_verdict(bug_data["id"], "t1") == "unsupported"
+
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(direct_updates=True), state=state
+    )
+    assert [bug.id for bug in monitor.fetch_bugs()] == [bug_data["id"]]
+    assert monitor.stage_hits == {"state": 1}
+    assert monitor.unsupported == {bug_data["id"]}
+
+
+def test_monitor_fetch_unchanged_batched(mocker, bz_request, cache_bug, bug_data):
+    """Test that unchanged bugs are fetched in bounded batches"""
+    mocker.patch("bugmon_tc.monitor.monitor.HYDRATE_BATCH", 2)
+    state = MonitorState("2024-01-01T00:00:00Z")
+    for bug_id in [1, 2, 3]:
+        state.record(bug_id, "2024-01-01T00:00:00Z", True)
+
+    def request(_path, params):
+        if "id" not in params:
+            return {"bugs": []}
+        return {
+            "bugs": [
+                dict(bug_data, id=int(bug_id), last_change_time="2024-01-01T00:00:00Z")
+                for bug_id in params["id"].split(",")
+            ]
+        }
+
+    bz_request.side_effect = request
+    monitor = BugMonitorTask("key", "root", state=state)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1, 2, 3]
+
+    lookups = [
+        call.kwargs["params"]["id"]
+        for call in bz_request.call_args_list
+        if call.kwargs["params"].get("include_fields") == QUERY["include_fields"]
+        and "id" in call.kwargs["params"]
+    ]
+    assert lookups == ["1,2", "3"]
+
+
+def test_monitor_fetch_bugs_failure_backoff(
+    mocker, bz_request, cache_bug, bug_data, tmp_path
+):
+    """Test that failing bugs are recorded and skipped while backing off"""
+    failing = dict(bug_data, id=1, last_change_time="2024-01-01T00:00:00Z")
+    retried = dict(bug_data, id=2, last_change_time="2024-01-01T00:00:00Z")
+
+    state = MonitorState()
+    state.record_failure(1, "2024-01-01T00:00:00Z", "Error!", datetime.utcnow())
+    state.record_failure(2, "2024-01-01T00:00:00Z", "Error!", datetime(2024, 1, 1))
+
+    def request(_path, params):
+        if "id" in params:
+            assert params["id"] == "2"
+            return {"bugs": [retried]}
+        return {"bugs": [failing]}
+
+    bz_request.side_effect = request
+
+    monitor = BugMonitorTask("key", "root", state=state)
+
+    def is_actionable(bug):
+        monitor.errors[bug.id] = "Error again!"
+        return False
+
+    analyzed = mocker.patch.object(monitor, "is_actionable", side_effect=is_actionable)
+    monitor.create_tasks(tmp_path)
+
+    # Bug 1 is still backing off, bug 2 was retried and failed again
+    assert [call.args[0].id for call in analyzed.call_args_list] == [2]
+    assert monitor.stage_hits == {"backoff": 1, "analysis": 1}
+    # Skipped bugs keep their failure, so that they are retried once it expires
+    assert state.failures[1]["count"] == 1
+    assert 1 not in state.bugs
+    assert state.failures[2]["count"] == 2
+    assert state.in_backoff(2, "2024-01-01T00:00:00Z", monitor.started)
+
+    summary = json.loads((tmp_path / "monitor-failures.json").read_text())
+    assert summary["2"]["error"] == "Error again!"
+    assert sorted(summary) == ["1", "2"]
+
+
+@pytest.mark.parametrize(
+    "keywords, whiteboard, status, resolution, expected",
+    [
+        (["bugmon"], "[bugmon:bisect]", "NEW", "", None),
+        (["testcase"], "", "NEW", "", None),
+        (["pernosco-wanted"], "", "NEW", "", None),
+        # Unsupported bugs with the bugmon keyword are closed out
+        (["bugmon"], "[bugmon:verified]", "RESOLVED", "FIXED", None),
+        (["bugmon"], "[bugmon:confirmed]", "RESOLVED", "WONTFIX", None),
+        (["testcase"], "[bugmon:confirmed]", "RESOLVED", "FIXED", None),
+        (["testcase"], "[bugmon:verified]", "RESOLVED", "FIXED", False),
+        (["testcase"], "[bugmon:confirmed]", "RESOLVED", "WONTFIX", False),
+        (["testcase"], "[bugmon:bisect]", "RESOLVED", "WONTFIX", None),
+        (["pernosco-wanted"], "[bugmon:verified]", "VERIFIED", "FIXED", None),
+    ],
+)
+def test_prefilter(bug_data, keywords, whiteboard, status, resolution, expected):
+    """Test that the prefilter only rules out bugs BugMonitor would leave alone"""
+    bug_data["keywords"] = keywords
+    bug_data["whiteboard"] = whiteboard
+    bug_data["status"] = status
+    bug_data["resolution"] = resolution
+    bug = EnhancedBug(None, **bug_data)
+    assert prefilter(bug) is expected
+
+
+def test_monitor_fetch_bugs_stage_hits(mocker, bz_request, cache_bug, bug_data):
+    """Test that bugs ruled out by the prefilter skip the full analysis"""
+    bugs = [
+        dict(bug_data, id=1, whiteboard="[bugmon:bisect]"),
+        dict(
+            bug_data,
+            id=2,
+            keywords=["testcase"],
+            status="RESOLVED",
+            resolution="WONTFIX",
+        ),
+    ]
+    bz_request.return_value = {"bugs": bugs}
+
+    monitor = BugMonitorTask("key", "root")
+    is_actionable = mocker.patch.object(monitor, "is_actionable", return_value=True)
+    assert [bug.id for bug in monitor.fetch_bugs()] == [1]
+    assert [call.args[0].id for call in is_actionable.call_args_list] == [1]
+    assert monitor.stage_hits == {"prefilter": 1, "analysis": 1}
+
+
 @pytest.mark.parametrize(
     "action",
     [
@@ -72,7 +540,7 @@ def test_is_actionable_needs_analysis(mocker, action):
         mock_monitor.needs_verify.return_value = True
 
     bug = MagicMock(spec=EnhancedBug, id=12345, status="NEW")
-    monitor = BugMonitorTask("", "", force_confirm=False)
+    monitor = BugMonitorTask("", "", MonitorConfig(force_confirm=False))
     assert monitor.is_actionable(bug) is True
 
 
@@ -85,7 +553,7 @@ def test_is_actionable_no_valid_actions(mocker):
     mocker.patch("bugmon.BugMonitor.needs_verify", return_value=False)
 
     bug = MagicMock(spec=EnhancedBug, id=12345, status="RESOLVED")
-    monitor = BugMonitorTask("", "", force_confirm=False)
+    monitor = BugMonitorTask("", "", MonitorConfig(force_confirm=False))
     assert monitor.is_actionable(bug) is False
 
 
@@ -95,46 +563,238 @@ def test_is_actionable_throws(mocker):
         "bugmon_tc.monitor.monitor.BugMonitor", side_effect=BugmonException("Error!")
     )
     bug = MagicMock(spec=EnhancedBug, id=12345, status="NEW")
-    monitor = BugMonitorTask("", "", force_confirm=False)
+    monitor = BugMonitorTask("", "", MonitorConfig(force_confirm=False))
     assert monitor.is_actionable(bug) is False
 
 
-def test_monitor_create_tasks_local(mocker, tmp_path, bug_data):
+def test_monitor_create_tasks_local(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data
+):
     """Test task creation"""
-    bug_response = {"bugs": [bug_data]}
-    mocker.patch("bugsy.Bugsy.request", return_value=bug_response)
+    bz_request.return_value = {"bugs": [bug_data]}
     mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
-    mocker.patch("bugmon_tc.monitor.monitor.slugId", return_value="1")
-    mocker.patch("bugmon_tc.monitor.monitor.in_taskcluster", return_value=False)
-
-    cached_bug = EnhancedBug(None, **bug_data)
-    mocker.patch("bugmon.bug.EnhancedBug.cache_bug", return_value=cached_bug)
 
     monitor = BugMonitorTask("key", "root")
     artifact_dir = tmp_path / "artifact_dir"
     monitor.create_tasks(artifact_dir)
-    monitor_artifact = artifact_dir / f"monitor-{bug_data['id']}-1.json"
+    monitor_artifact = artifact_dir / f"monitor-{bug_data['id']}-parent.json"
 
     with monitor_artifact.open() as f:
         assert json.load(f) == bug_data
 
 
-def test_monitor_create_tasks_taskcluster(mocker, tmp_path, bug_data):
+def test_monitor_create_tasks_taskcluster(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
     """Test task creation in simulated TC environment"""
-    bug_response = {"bugs": [bug_data]}
-    mocker.patch("bugsy.Bugsy.request", return_value=bug_response)
+    bz_request.return_value = {"bugs": [bug_data]}
     mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
-    mocker.patch("bugmon_tc.monitor.monitor.in_taskcluster", return_value=True)
-    mocker.patch("bugmon_tc.monitor.tasks.in_taskcluster", return_value=False)
 
-    cached_bug = EnhancedBug(None, **bug_data)
-    mocker.patch("bugmon.bug.EnhancedBug.cache_bug", return_value=cached_bug)
+    monitor = BugMonitorTask("key", "root")
+
+    monitor.create_tasks(tmp_path)
+    assert tc_run.call_count == 2
+
+
+def test_monitor_create_tasks_history(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that submitted tasks are recorded in the run history"""
+    bz_request.return_value = {"bugs": [bug_data]}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+
+    history = RunHistory()
+    monitor = BugMonitorTask("key", "root", history=history)
+    monitor.create_tasks(tmp_path)
+
+    rows = history.connection.execute(
+        "SELECT bug_id, kind, worker_type, task_group_id FROM tasks ORDER BY kind"
+    ).fetchall()
+    assert rows == [
+        (bug_data["id"], "ProcessorTask", "bugmon-processor", "parent"),
+        (bug_data["id"], "ReporterTask", "bugmon-monitor", "parent"),
+    ]
+    assert len(RunHistory(tmp_path / "monitor-history.sqlite").unresolved_tasks()) == 2
+
+
+def test_submit_task_not_retried(mocker):
+    """Test that failures left over by the client's own retries are raised"""
+    mock_create_task = mocker.patch(
+        "bugmon_tc.common.queue.createTask",
+        side_effect=TaskclusterRestFailure("Forbidden", None, status_code=403),
+    )
+    with pytest.raises(TaskclusterRestFailure):
+        submit_task("task-id", {})
+    assert mock_create_task.call_count == 1
 
+
+def test_submit_task_already_exists(mocker):
+    """Test that an identical existing task is treated as submitted"""
+    definition = {"created": "now", "workerType": "bugmon-processor"}
+    mocker.patch(
+        "bugmon_tc.common.queue.createTask",
+        side_effect=TaskclusterRestFailure("Conflict", None, status_code=409),
+    )
+    mocker.patch(
+        "bugmon_tc.common.queue.task",
+        return_value={"created": "earlier", "workerType": "bugmon-processor"},
+    )
+    submit_task("task-id", definition)
+
+
+def test_submit_task_conflict(mocker):
+    """Test that an existing task with a different definition is an error"""
+    mocker.patch(
+        "bugmon_tc.common.queue.createTask",
+        side_effect=TaskclusterRestFailure("Conflict", None, status_code=409),
+    )
+    mocker.patch(
+        "bugmon_tc.common.queue.task",
+        return_value={"workerType": "bugmon-pernosco"},
+    )
+    with pytest.raises(TaskclusterRestFailure):
+        submit_task("task-id", {"workerType": "bugmon-processor"})
+
+
+def test_monitor_create_tasks_submit_failure(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that submission failures are reported after all bugs are attempted"""
+    bugs = [dict(bug_data, id=1), dict(bug_data, id=2)]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+
+    def create_task(_task_id, definition):
+        if definition["metadata"]["name"] == "ProcessorTask (1)":
+            raise TaskclusterFailure("Error!")
+
+    tc_run.side_effect = create_task
     monitor = BugMonitorTask("key", "root")
+    with pytest.raises(MonitorError, match="1 bug"):
+        monitor.create_tasks(tmp_path)
+
+    # Bug 1's reporter is skipped; bug 2 is unaffected
+    names = [call.args[1]["metadata"]["name"] for call in tc_run.call_args_list]
+    assert names.count("ProcessorTask (1)") == 1
+    assert "ReporterTask (1)" not in names
+    assert "ProcessorTask (2)" in names
+    assert "ReporterTask (2)" in names
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_monitor_create_tasks_direct_updates(
+    mocker, bz_request, cache_bug, local_run, tmp_path, bug_data, dry_run
+):
+    """Test that unsupported bugs are closed out without scheduling tasks"""
+    diff = {"keywords": {"remove": ["bugmon"]}}
+    put_requests = []
+
+    def request(path, method="GET", **kwargs):
+        if method == "PUT":
+            put_requests.append((path, kwargs["json"]))
+            return None
+        return {"bugs": [dict(bug_data, id=1), dict(bug_data, id=2)]}
+
+    bz_request.side_effect = request
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+    mocker.patch("bugmon.BugMonitor.process")
+    mocker.patch("bugmon.bug.EnhancedBug.diff", return_value=diff)
+
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(direct_updates=True, dry_run=dry_run)
+    )
+    monitor.create_tasks(tmp_path)
+
+    assert not list(tmp_path.glob("processor-task-*"))
+    updates = json.loads((tmp_path / "monitor-updates.json").read_text())
+    assert updates == [{"bug_id": 1, "diff": diff}, {"bug_id": 2, "diff": diff}]
+    if dry_run:
+        assert not put_requests
+    else:
+        assert put_requests == [("bug/1", {**diff, "ids": [1, 2]})]
+
+
+def test_monitor_create_tasks_skip_inflight(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that bugs with in-flight tasks are not scheduled again"""
+    bugs = [dict(bug_data, id=1), dict(bug_data, id=2)]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+    mock_inflight = mocker.patch(
+        "bugmon_tc.monitor.monitor.fetch_inflight_tasks",
+        return_value={1: [{"taskId": "a", "kind": "ProcessorTask"}]},
+    )
 
-    mocked_create_task = mocker.patch("bugmon_tc.common.queue.createTask")
+    monitor = BugMonitorTask("key", "root", MonitorConfig(skip_inflight=True))
     monitor.create_tasks(tmp_path)
-    assert mocked_create_task.call_count == 2
+
+    mock_inflight.assert_called_once()
+    names = [call.args[1]["metadata"]["name"] for call in tc_run.call_args_list]
+    assert names == ["ProcessorTask (2)", "ReporterTask (2)"]
+
+    # Bugs in flight are skipped before their full payload is fetched
+    hydrated = [call.kwargs["params"].get("id") for call in bz_request.call_args_list]
+    assert hydrated == [None, "2"]
+
+
+def test_monitor_create_tasks_cancel_superseded(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that pending tasks are cancelled and running tasks are left alone"""
+    bugs = [dict(bug_data, id=1), dict(bug_data, id=2)]
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+    pending = [
+        {"taskId": "a", "kind": "ProcessorTask", "state": "pending", "bug_ids": [1]}
+    ]
+    running = [
+        {"taskId": "b", "kind": "ProcessorTask", "state": "running", "bug_ids": [2]}
+    ]
+    mocker.patch(
+        "bugmon_tc.monitor.monitor.fetch_inflight_tasks",
+        return_value={1: pending, 2: running},
+    )
+    mock_cancel = mocker.patch(
+        "bugmon_tc.monitor.admission.cancel_pending_tasks", return_value=[]
+    )
+
+    monitor = BugMonitorTask(
+        "key", "root", MonitorConfig(skip_inflight=True, cancel_superseded=True)
+    )
+    monitor.create_tasks(tmp_path)
+
+    mock_cancel.assert_called_once_with(1, pending)
+    names = [call.args[1]["metadata"]["name"] for call in tc_run.call_args_list]
+    assert names == ["ProcessorTask (1)", "ReporterTask (1)"]
+
+
+def test_monitor_create_tasks_pending_batch(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that bugs left in a pending batch are not scheduled again"""
+    bz_request.return_value = {"bugs": [bug_data]}
+    mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
+    batch = {
+        "taskId": "a",
+        "taskGroupId": "group",
+        "kind": "ProcessorTask",
+        "state": "pending",
+        "bug_ids": [bug_data["id"], 2],
+    }
+    mocker.patch(
+        "bugmon_tc.monitor.monitor.fetch_inflight_tasks",
+        return_value={bug_data["id"]: [batch]},
+    )
+    mock_cancel = mocker.patch("bugmon_tc.common.queue.cancelTask")
+    mock_hydrate = mocker.patch.object(BugMonitorTask, "_hydrate", return_value=[])
+
+    monitor = BugMonitorTask("key", "root", MonitorConfig(cancel_superseded=True))
+    monitor.create_tasks(tmp_path)
+
+    mock_cancel.assert_not_called()
+    tc_run.assert_not_called()
+    assert not list(mock_hydrate.call_args.args[0])
 
 
 @pytest.mark.parametrize(
@@ -145,11 +805,7 @@ def test_monitor_create_tasks_taskcluster(mocker, tmp_path, bug_data):
     ],
 )
 def test_monitor_create_tasks_pernosco_not_supported(
-    mocker,
-    tmp_path,
-    bug_data,
-    op_sys,
-    whiteboard,
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data, op_sys, whiteboard
 ):
     """Test conditions where creating a pernosco session is not supported"""
     bug_data["op_sys"] = op_sys
@@ -157,16 +813,10 @@ def test_monitor_create_tasks_pernosco_not_supported(
     if whiteboard is not None:
         bug_data["whiteboard"] = whiteboard
 
-    bug_response = {"bugs": [bug_data]}
-    mocker.patch("bugsy.Bugsy.request", return_value=bug_response)
+    bz_request.return_value = {"bugs": [bug_data]}
     mocker.patch("bugmon.BugMonitor.is_supported", return_value=False)
-    mocker.patch("bugmon_tc.monitor.monitor.in_taskcluster", return_value=True)
-    mocker.patch("bugmon_tc.monitor.tasks.in_taskcluster", return_value=False)
 
-    cached_bug = EnhancedBug(None, **bug_data)
-    mocker.patch("bugmon.bug.EnhancedBug.cache_bug", return_value=cached_bug)
     mock_processor = mocker.patch("bugmon_tc.monitor.monitor.ProcessorTask")
-    mocker.patch("bugmon_tc.common.queue.createTask")
     monitor = BugMonitorTask("key", "root")
     monitor.create_tasks(tmp_path)
     assert mock_processor.call_args.kwargs.get("use_pernosco") is False
@@ -2,7 +2,12 @@
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
 from pathlib import Path
+
+import pytest
+
 from bugmon_tc.monitor.cli import parse_args, main
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.state import MonitorState
 
 
 def test_parse_args():
@@ -10,9 +15,35 @@ def test_parse_args():
     args = parse_args(["--force-confirm", "output_path"])
 
     assert args.force_confirm is True
+    assert args.jobs == 1
     assert args.output == Path("output_path")
 
 
+def test_parse_args_jobs():
+    """Test that the number of analysis jobs is parsed"""
+    args = parse_args(["--jobs", "4", "output_path"])
+    assert args.jobs == 4
+
+
+def test_parse_args_jobs_invalid():
+    """Test that a non-positive number of jobs is rejected"""
+    with pytest.raises(SystemExit):
+        parse_args(["--jobs", "0", "output_path"])
+
+
+def test_parse_args_shard():
+    """Test that shard specifications are parsed"""
+    args = parse_args(["--shard", "2/4", "output_path"])
+    assert args.shard == (2, 4)
+
+
+@pytest.mark.parametrize("shard", ["0/4", "5/4", "1", "a/b", "1/2/3"])
+def test_parse_args_shard_invalid(shard):
+    """Test that invalid shard specifications are rejected"""
+    with pytest.raises(SystemExit):
+        parse_args(["--shard", shard, "output_path"])
+
+
 def test_main(mocker, tmp_path):
     """Test that BugMonitorTask is called with the expected arguments"""
     mocker.patch("bugmon_tc.monitor.cli.get_bugzilla_auth").return_value = {
@@ -26,6 +57,67 @@ def test_main(mocker, tmp_path):
     main(["--force-confirm", str(tmp_path)])
 
     mock_bug_monitor_task.assert_called_once_with(
-        "key", "url", force_confirm=True, enable_debug=False
+        "key",
+        "url",
+        MonitorConfig(force_confirm=True),
+        state=None,
+        verdict_cache=None,
+        history=None,
     )
     mock_bug_monitor_task.return_value.create_tasks.assert_called_once_with(tmp_path)
+
+
+def test_main_rate_limit(mocker, tmp_path):
+    """Test that pool throughput overrides are merged with the defaults"""
+    mocker.patch("bugmon_tc.monitor.cli.get_bugzilla_auth").return_value = {
+        "KEY": "key",
+        "URL": "url",
+    }
+    mock_bug_monitor_task = mocker.patch(
+        "bugmon_tc.monitor.cli.BugMonitorTask", autospec=True
+    )
+
+    main(["--pool-throughput", "bugmon-pernosco=2", str(tmp_path)])
+
+    throughput = mock_bug_monitor_task.call_args.args[2].pool_throughput
+    assert throughput["bugmon-pernosco"] == 2.0
+    assert throughput["bugmon-processor"] == 40.0
+
+
+@pytest.mark.parametrize("throughput", ["bugmon-pernosco", "=2", "x=-1", "x=y"])
+def test_parse_args_pool_throughput_invalid(throughput):
+    """Test that invalid pool throughputs are rejected"""
+    with pytest.raises(SystemExit):
+        parse_args(["--pool-throughput", throughput, "output_path"])
+
+
+@pytest.mark.parametrize("batch_size", ["0", "21"])
+def test_parse_args_batch_size_invalid(batch_size):
+    """Test that batches whose task name would be too long are rejected"""
+    with pytest.raises(SystemExit):
+        parse_args(["--batch-size", batch_size, "output_path"])
+
+
+@pytest.mark.parametrize("quota", ["0", "1.5"])
+def test_parse_args_fair_share_quota_invalid(quota):
+    """Test that fair-share quotas outside of (0, 1] are rejected"""
+    with pytest.raises(SystemExit):
+        parse_args(["--fair-share", "component", "--fair-share-quota", quota, "out"])
+
+
+def test_main_incremental(mocker, tmp_path):
+    """Test that monitor state is loaded and persisted when requested"""
+    mocker.patch("bugmon_tc.monitor.cli.get_bugzilla_auth").return_value = {
+        "KEY": "key",
+        "URL": "url",
+    }
+    mock_bug_monitor_task = mocker.patch(
+        "bugmon_tc.monitor.cli.BugMonitorTask", autospec=True
+    )
+    state_path = tmp_path / "state.json"
+
+    main(["--state", str(state_path), str(tmp_path / "output")])
+
+    state = mock_bug_monitor_task.call_args.kwargs["state"]
+    assert isinstance(state, MonitorState)
+    assert state_path.exists()
@@ -0,0 +1,90 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime
+
+import pytest
+from bugmon.bug import EnhancedBug
+
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.monitor import BugMonitorTask
+from bugmon_tc.monitor.priority import bug_priority, required_action, task_priority
+
+NOW = datetime(2020, 7, 8)
+
+
+@pytest.mark.parametrize(
+    "whiteboard, status, expected",
+    [
+        ("[bugmon:bisect]", "NEW", "bisect"),
+        ("[bugmon:confirmed]", "RESOLVED", "verify"),
+        ("", "NEW", "confirm"),
+        ("[bugmon:confirmed]", "NEW", "pernosco"),
+    ],
+)
+def test_required_action(bug_data, whiteboard, status, expected):
+    """Test that the required action is estimated from the triage fields"""
+    bug = EnhancedBug(None, **dict(bug_data, whiteboard=whiteboard, status=status))
+    assert required_action(bug) == expected
+
+
+def test_bug_priority_security_before_age(bug_data):
+    """Test that a fresh security bug outranks an old, low severity bug"""
+    fresh = EnhancedBug(None, **bug_data)
+    old = EnhancedBug(
+        None,
+        **dict(
+            bug_data,
+            groups=[],
+            severity="S4",
+            creation_time="2015-01-01T00:00:00Z",
+        ),
+    )
+    assert bug_priority(fresh, NOW) > bug_priority(old, NOW)
+    assert task_priority(bug_priority(fresh, NOW)) == "high"
+    assert task_priority(bug_priority(old, NOW)) == "very-low"
+
+
+def test_bug_priority_age_decays(bug_data):
+    """Test that newer bugs are ranked ahead of otherwise identical older ones"""
+    newer = EnhancedBug(None, **dict(bug_data, creation_time="2020-07-01T00:00:00Z"))
+    older = EnhancedBug(None, **dict(bug_data, creation_time="2020-01-01T00:00:00Z"))
+    assert bug_priority(newer, NOW) > bug_priority(older, NOW)
+
+
+def test_monitor_create_tasks_priority(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that bugs are scheduled by descending priority"""
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+    bz_request.return_value = {"bugs": bugs}
+
+    scores = {1: 0.0, 2: 100.0, 3: 40.0}
+    config = MonitorConfig(priority=lambda bug, _now: scores[bug.id], submit_jobs=1)
+    monitor = BugMonitorTask("key", "root", config)
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    tasks = [call.args[1] for call in tc_run.call_args_list]
+    assert [task["metadata"]["name"] for task in tasks[::2]] == [
+        "ProcessorTask (2)",
+        "ProcessorTask (3)",
+        "ProcessorTask (1)",
+    ]
+    assert [task["priority"] for task in tasks[::2]] == ["high", "medium", "very-low"]
+    assert tasks[1]["priority"] == "high"
+
+
+def test_monitor_rank_uses_task_creation_time(mocker, bz_request, cache_bug, bug_data):
+    """Test that retried runs rank bugs as of the reused creation time"""
+    created = datetime(2024, 1, 1)
+    mocker.patch("bugmon_tc.monitor.monitor._get_created", return_value=created)
+    bz_request.return_value = {"bugs": [bug_data]}
+    priority = mocker.Mock(return_value=0.0)
+    monitor = BugMonitorTask("key", "root", MonitorConfig(priority=priority))
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+
+    assert [bug.id for bug in monitor.fetch_bugs()] == [bug_data["id"]]
+    bug, when = priority.call_args.args
+    assert bug.id == bug_data["id"]
+    assert when == created
@@ -0,0 +1,138 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+from datetime import date
+
+import pytest
+
+from bugmon_tc.common import BugmonTaskError
+from bugmon_tc.monitor.queries import (
+    QUERY,
+    after_bug,
+    date_windows,
+    load_queries,
+    merge_bugs,
+    parse_search_date,
+)
+
+
+def test_load_queries(tmp_path):
+    """Test that query sets are loaded with the triage fields enforced"""
+    path = tmp_path / "queries.json"
+    path.write_text(
+        json.dumps(
+            [
+                {
+                    "name": "gfx",
+                    "params": {"product": "Core", "include_fields": "_all"},
+                },
+            ]
+        )
+    )
+
+    assert load_queries(path) == [
+        {
+            "name": "gfx",
+            "params": {
+                "query_format": "advanced",
+                "product": "Core",
+                "include_fields": QUERY["include_fields"],
+            },
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"name": "a", "params": {}},
+        [{"name": "a"}],
+        [{"params": {}}],
+        [{"name": 1, "params": {}}],
+        [{"name": "", "params": {}}],
+        [{"name": "a", "params": {}}, {"name": "a", "params": {}}],
+    ],
+)
+def test_load_queries_invalid(tmp_path, data):
+    """Test that malformed query sets are rejected"""
+    path = tmp_path / "queries.json"
+    path.write_text(json.dumps(data))
+
+    with pytest.raises(BugmonTaskError):
+        load_queries(path)
+
+
+def test_load_queries_missing(tmp_path):
+    """Test that a missing query set is reported"""
+    with pytest.raises(BugmonTaskError):
+        load_queries(tmp_path / "missing.json")
+
+
+def test_after_bug():
+    """Test that searches are restricted to bugs after the last one seen"""
+    assert after_bug({"keywords": "bugmon"}, 5) == {
+        "keywords": "bugmon",
+        "f1": "bug_id",
+        "o1": "greaterthan",
+        "v1": "5",
+    }
+    assert after_bug({"f1": "status", "o1": "equals", "v1": "NEW"}, 5)["f2"] == (
+        "bug_id"
+    )
+
+    # Disjunctions are grouped so that the restriction applies to all of them
+    params = {"j_top": "OR", "f1": "status", "o1": "equals", "v1": "NEW"}
+    assert after_bug(params, 5) == {
+        "j_top": "AND",
+        "f1": "OP",
+        "j1": "OR",
+        "f2": "status",
+        "o2": "equals",
+        "v2": "NEW",
+        "f3": "CP",
+        "f4": "bug_id",
+        "o4": "greaterthan",
+        "v4": "5",
+    }
+
+
+def test_date_windows():
+    """Test that the creation date range is split into consecutive windows"""
+    assert date_windows(date(2020, 3, 1), date(2021, 1, 15), 3) == [
+        ("2020-03-01", "2020-06-01"),
+        ("2020-06-01", "2020-09-01"),
+        ("2020-09-01", "2020-12-01"),
+        ("2020-12-01", "Now"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2020-03-01", date(2020, 3, 1)),
+        ("2020-03-01T12:00:00Z", date(2020, 3, 1)),
+        ("Now", date(2021, 1, 15)),
+        ("-36h", date(2021, 1, 13)),
+        ("-2d", date(2021, 1, 13)),
+        ("-1w", date(2021, 1, 8)),
+        ("-2m", date(2020, 11, 1)),
+        ("-1y", date(2020, 1, 1)),
+        ("yesterday", None),
+    ],
+)
+def test_parse_search_date(value, expected):
+    """Test that absolute and relative search dates are resolved"""
+    assert parse_search_date(value, date(2021, 1, 15)) == expected
+
+
+def test_merge_bugs():
+    """Test that bug streams are merged by id and de-duplicated"""
+    first = [{"id": 1, "src": "a"}, {"id": 3, "src": "a"}]
+    second = [{"id": 2, "src": "b"}, {"id": 3, "src": "b"}]
+    assert list(merge_bugs(first, second)) == [
+        {"id": 1, "src": "a"},
+        {"id": 2, "src": "b"},
+        {"id": 3, "src": "a"},
+    ]
@@ -0,0 +1,151 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime, timedelta
+
+from bugmon_tc.monitor.state import MonitorState, VerdictCache
+
+
+def test_state_load_missing(tmp_path):
+    """Test that a missing state file results in an empty state"""
+    state = MonitorState.load(tmp_path / "missing.json")
+    assert state.last_change_time is None
+    assert state.bugs == {}
+
+
+def test_state_round_trip(tmp_path):
+    """Test that state survives being saved and loaded"""
+    state = MonitorState()
+    state.record(1, "2024-01-01T00:00:00Z", True, ["default"])
+    state.record(2, "2024-02-01T00:00:00Z", False, ["default"])
+    state.record(3, "2024-02-01T00:00:00Z", "unsupported")
+    state.advance(datetime(2024, 2, 1, 1))
+    state.force_confirm = True
+    state.save(tmp_path / "state.json")
+
+    loaded = MonitorState.load(tmp_path / "state.json")
+    assert loaded.last_change_time == "2024-02-01T00:50:00Z"
+    assert loaded.bugs == state.bugs
+    assert loaded.actionable_bugs() == [1, 3]
+    assert loaded.sources == {1: ["default"]}
+    assert loaded.force_confirm is True
+
+
+def test_state_reset():
+    """Test that resetting the state discards verdicts but keeps failures"""
+    state = MonitorState("2024-01-01T00:00:00Z")
+    state.record(1, "t1", True, ["default"])
+    state.record_failure(2, "t1", "Error!", datetime(2024, 1, 1))
+    state.reset(force_confirm=True)
+
+    assert state.last_change_time is None
+    assert state.bugs == {}
+    assert state.sources == {}
+    assert list(state.failures) == [2]
+    assert state.force_confirm is True
+
+
+def test_state_sources_dropped():
+    """Test that sources are only kept while a bug is actionable"""
+    state = MonitorState()
+    state.record(1, "t1", True, ["a", "b"])
+    state.record(1, "t2", True)
+    assert state.sources == {1: ["a", "b"]}
+
+    state.record(1, "t3", False)
+    assert not state.sources
+
+    state.record(2, "t1", True, ["a"])
+    state.forget(2)
+    assert not state.sources
+
+
+def test_state_watermark_only_advances():
+    """Test that the watermark trails the run start and never moves backwards"""
+    state = MonitorState()
+    state.advance(datetime(2024, 2, 1))
+    assert state.last_change_time == "2024-01-31T23:50:00Z"
+
+    # Recording bugs doesn't move the watermark, nor does an older run
+    state.record(1, "2024-03-01T00:00:00Z", True)
+    state.advance(datetime(2024, 1, 1))
+    assert state.last_change_time == "2024-01-31T23:50:00Z"
+
+
+def test_state_get_verdict():
+    """Test that verdicts are only reused for unchanged bugs"""
+    state = MonitorState()
+    state.record(1, "2024-01-01T00:00:00Z", True)
+    assert state.get_verdict(1, "2024-01-01T00:00:00Z") is True
+    assert state.get_verdict(1, "2024-01-02T00:00:00Z") is None
+    assert state.get_verdict(2, "2024-01-01T00:00:00Z") is None
+
+    state.forget(1)
+    assert state.get_verdict(1, "2024-01-01T00:00:00Z") is None
+
+
+def test_state_failure_backoff(tmp_path):
+    """Test that repeated failures back off exponentially until the bug changes"""
+    now = datetime(2024, 1, 1)
+    state = MonitorState()
+    state.record_failure(1, "t1", "Error!", now)
+    state.record_failure(1, "t1", "Error!", now)
+    assert state.failures[1]["count"] == 2
+    assert state.in_backoff(1, "t1", now + timedelta(hours=1))
+    assert not state.in_backoff(1, "t1", now + timedelta(hours=2))
+    assert not state.in_backoff(1, "t2", now)
+    assert state.retry_due(now + timedelta(hours=2)) == [1]
+
+    state.save(tmp_path / "state.json")
+    assert MonitorState.load(tmp_path / "state.json").failures == state.failures
+
+    state.record(1, "t2", False)
+    assert state.failures == {}
+
+
+def test_verdict_cache_round_trip(tmp_path):
+    """Test that cached verdicts survive being saved and loaded"""
+    cache = VerdictCache()
+    cache.put(1, "2024-01-01T00:00:00Z", True)
+    cache.put(2, "2024-01-01T00:00:00Z", "unsupported")
+    cache.save(tmp_path / "verdicts.json")
+
+    loaded = VerdictCache.load(tmp_path / "verdicts.json")
+    assert loaded.get(1, "2024-01-01T00:00:00Z") is True
+    assert loaded.get(2, "2024-01-01T00:00:00Z") == "unsupported"
+    assert loaded.get(1, "2024-01-02T00:00:00Z") is None
+    assert loaded.get(1, None) is None
+
+
+def test_verdict_cache_version_mismatch(tmp_path):
+    """Test that verdicts produced by another bugmon version are discarded"""
+    cache = VerdictCache(version="1.0.0")
+    cache.put(1, "2024-01-01T00:00:00Z", True)
+    cache.save(tmp_path / "verdicts.json")
+
+    assert len(VerdictCache.load(tmp_path / "verdicts.json")) == 0
+
+
+def test_verdict_cache_eviction():
+    """Test that the least recently used verdicts are evicted"""
+    cache = VerdictCache(max_entries=2)
+    cache.put(1, "t", True)
+    cache.put(2, "t", False)
+    assert cache.get(1, "t") is True
+    cache.put(3, "t", True)
+
+    assert len(cache) == 2
+    assert cache.get(2, "t") is None
+    assert cache.get(1, "t") is True
+    assert cache.get(3, "t") is True
+
+
+def test_state_load_legacy(tmp_path):
+    """Test that state files written before failures and runtimes still load"""
+    path = tmp_path / "state.json"
+    path.write_text('{"last_change_time": "t1", "bugs": {}}')
+    state = MonitorState.load(path)
+    assert state.failures == {}
+    assert state.runtimes == {}
+    assert state.scheduled == {}
+    assert state.force_confirm is False
@@ -1,6 +1,7 @@
 # This Source Code Form is subject to the terms of the Mozilla Public License,
 # v. 2.0. If a copy of the MPL was not distributed with this file, You can
 # obtain one at http://mozilla.org/MPL/2.0/.
+import re
 from datetime import datetime, timedelta
 
 import pytest
@@ -11,10 +12,13 @@ from freezegun import freeze_time
 from taskcluster import stringDate, fromNow
 
 from bugmon_tc.monitor.tasks import (
+    BatchReporterTask,
     ProcessorTask,
     ReporterTask,
     MAX_RUNTIME,
-    _get_monitor_task,
+    REPORTER_IMAGE,
+    derive_batch_id,
+    derive_task_id,
 )
 
 PARENT_ID = "UkGN9k6QSNi0-s62I5vvdg"
@@ -24,12 +28,68 @@ TRACE_ARTIFACT_PATH = Path("path/to/trace_artifact")
 
 
 @pytest.fixture(autouse=True)
-def _clear_monitor_task_cache(mocker):
-    """Clear _get_monitor_task cache between tests and mock non-TC environment."""
-    _get_monitor_task.cache_clear()
+def _local_environment(mocker):
+    """Mock non-TC environment."""
     mocker.patch("bugmon_tc.monitor.tasks.in_taskcluster", return_value=False)
-    yield
-    _get_monitor_task.cache_clear()
+
+
+def test_derive_task_id():
+    """Test that derived task ids are stable, distinct and valid slugIds"""
+    slug_pattern = re.compile(
+        r"^[A-Za-z0-9_-]{8}[Q-T][A-Za-z0-9_-][CGKOSWaeimquy26-][A-Za-z0-9_-]{10}[AQgw]$"
+    )
+    task_id = derive_task_id(PARENT_ID, 1, "ProcessorTask")
+
+    assert task_id == derive_task_id(PARENT_ID, 1, "ProcessorTask")
+    assert task_id != derive_task_id(PARENT_ID, 1, "ReporterTask")
+    assert task_id != derive_task_id(PARENT_ID, 2, "ProcessorTask")
+    assert task_id != derive_task_id("other", 1, "ProcessorTask")
+    for bug_id in range(100):
+        assert slug_pattern.match(derive_task_id(PARENT_ID, bug_id, "ReporterTask"))
+
+
+def test_batch_reporter_id_covers_bugs(bug_data):
+    """Test that batch reporter ids depend on the whole set of bugs"""
+
+    def batch(bug_ids):
+        reporters = [
+            ReporterTask(
+                PARENT_ID,
+                EnhancedBug(None, **dict(bug_data, id=bug_id)),
+                PROCESSOR_ARTIFACT_PATH,
+                dep="processor",
+            )
+            for bug_id in bug_ids
+        ]
+        return BatchReporterTask(PARENT_ID, reporters, Path("manifest.json"))
+
+    assert batch([1, 2]).id == batch([2, 1]).id
+    assert batch([1, 2]).id != batch([1, 3]).id
+    bugs = [EnhancedBug(None, **dict(bug_data, id=bug_id)) for bug_id in [2, 1]]
+    assert batch([1, 2]).id == derive_batch_id(PARENT_ID, bugs, "BatchReporterTask")
+
+
+def test_task_ids_deterministic(bug_data):
+    """Test that processor ids are derived from the parent, reporters' from it"""
+    bug = EnhancedBug(None, **bug_data)
+    processor = ProcessorTask(PARENT_ID, bug, MONITOR_ARTIFACT_PATH)
+    reporter = ReporterTask(PARENT_ID, bug, processor.dest, dep=processor.id)
+
+    assert processor.id == derive_task_id(PARENT_ID, bug.id, "ProcessorTask")
+    assert reporter.id == derive_task_id(processor.id, bug.id, "ReporterTask")
+    assert processor.id == ProcessorTask(PARENT_ID, bug, MONITOR_ARTIFACT_PATH).id
+
+
+def test_reporter_id_follows_dependency(bug_data):
+    """Test that reporters depending on another processor get another id"""
+    bug = EnhancedBug(None, **bug_data)
+    reporter = ReporterTask(PARENT_ID, bug, PROCESSOR_ARTIFACT_PATH, dep="processor")
+    single = reporter.id
+
+    reporter.dependency = "batch"
+    assert reporter.id != single
+    assert reporter.id == derive_task_id("batch", bug.id, "ReporterTask")
+    assert reporter.task["dependencies"] == [PARENT_ID, "batch"]
 
 
 def test_processor_task_init(bug_data):
@@ -367,3 +427,65 @@ def test_reporter_task_worker_type(bug_data):
     )
 
     assert reporter_task.worker_type == "bugmon-monitor"
+
+
+def test_reporter_task_lightweight(bug_data):
+    """Test that reporters without a trace use the slim unprivileged profile"""
+    bug = EnhancedBug(None, **bug_data)
+    dependency = "BaQj_QARRh-PH0w6anyyxg"
+
+    reporter_task = ReporterTask(
+        PARENT_ID,
+        bug,
+        PROCESSOR_ARTIFACT_PATH,
+        dep=dependency,
+        lightweight=True,
+    )
+
+    assert reporter_task.worker_type == "bugmon-reporter"
+    assert reporter_task.task["payload"]["capabilities"] == {}
+    assert reporter_task.task["payload"]["image"] == REPORTER_IMAGE
+    assert reporter_task.scopes == [
+        f"queue:get-artifact:project/fuzzing/bugmon/{PROCESSOR_ARTIFACT_PATH}",
+        "queue:scheduler-id:fuzzing",
+        "secrets:get:project/fuzzing/bz-api-key",
+    ]
+
+
+def test_reporter_task_lightweight_opt_in(bug_data):
+    """Test that reporters keep the full profile unless the slim one is requested"""
+    bug = EnhancedBug(None, **bug_data)
+    dependency = "BaQj_QARRh-PH0w6anyyxg"
+
+    reporter_task = ReporterTask(
+        PARENT_ID, bug, PROCESSOR_ARTIFACT_PATH, dep=dependency
+    )
+    assert reporter_task.worker_type == "bugmon-monitor"
+    assert reporter_task.task["payload"]["capabilities"] == {"privileged": True}
+    assert "docker-worker:capability:privileged" in reporter_task.scopes
+
+    # Reporters uploading a trace need privileges regardless
+    reporter_task = ReporterTask(
+        PARENT_ID,
+        bug,
+        PROCESSOR_ARTIFACT_PATH,
+        dep=dependency,
+        trace_path=TRACE_ARTIFACT_PATH,
+        lightweight=True,
+    )
+    assert reporter_task.worker_type == "bugmon-monitor"
+    assert reporter_task.task["payload"]["image"] != REPORTER_IMAGE
+
+
+def test_processor_task_build_cache(bug_data):
+    """Test that processors mount the build cache when enabled"""
+    bug = EnhancedBug(None, **bug_data)
+    task = ProcessorTask(PARENT_ID, bug, MONITOR_ARTIFACT_PATH, build_cache=True)
+
+    assert task.task["payload"]["cache"] == {"bugmon-builds": "/builds"}
+    assert task.env["XDG_CACHE_HOME"] == "/builds"
+    assert "docker-worker:cache:bugmon-builds" in task.scopes
+
+    task = ProcessorTask(PARENT_ID, bug, MONITOR_ARTIFACT_PATH)
+    assert task.task["payload"]["cache"] == {}
+    assert "XDG_CACHE_HOME" not in task.env
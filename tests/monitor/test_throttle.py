@@ -0,0 +1,144 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime, timedelta
+
+from bugmon.bug import EnhancedBug
+
+from bugmon_tc.monitor.config import MonitorConfig
+from bugmon_tc.monitor.monitor import BugMonitorTask
+from bugmon_tc.monitor.throttle import PoolLimiter, fetch_pending_counts, group_key
+
+NOW = datetime(2024, 1, 1)
+
+
+def test_fetch_pending_counts(mocker):
+    """Test that pending tasks are counted per worker pool"""
+    pending = mocker.patch(
+        "bugmon_tc.common.queue.pendingTasks", return_value={"pendingTasks": 3}
+    )
+    assert fetch_pending_counts(["bugmon-processor"]) == {"bugmon-processor": 3}
+    pending.assert_called_once_with("proj-fuzzing/bugmon-processor")
+
+
+def test_pool_limiter_budget():
+    """Test that pools only absorb what they can complete before the deadline"""
+    limiter = PoolLimiter(
+        {"bugmon-processor": 10.0},
+        {"bugmon-processor": 18},
+        NOW + timedelta(hours=2),
+        NOW,
+    )
+    assert limiter.available("bugmon-processor", "low")
+    limiter.consume("bugmon-processor")
+    assert limiter.available("bugmon-processor", "low")
+    limiter.consume("bugmon-processor")
+    assert not limiter.available("bugmon-processor", "high")
+
+    # Pools without a configured throughput are not limited
+    assert limiter.available("bugmon-monitor", "low")
+
+
+def test_pool_limiter_reserve():
+    """Test that part of scarce pools is reserved for high priority bugs"""
+    limiter = PoolLimiter({"bugmon-pernosco": 4.0}, {}, NOW + timedelta(hours=1), NOW)
+    for _ in range(3):
+        assert limiter.available("bugmon-pernosco", "medium")
+        limiter.consume("bugmon-pernosco")
+
+    assert not limiter.available("bugmon-pernosco", "medium")
+    assert limiter.available("bugmon-pernosco", "high")
+
+
+def test_group_key(bug_data):
+    """Test that bugs are grouped by component or by platform"""
+    bug = EnhancedBug(None, **bug_data)
+    assert group_key(bug, "component") == "Core::JavaScript Engine"
+    assert group_key(bug, "platform") == "Linux"
+
+
+def test_pool_limiter_quota():
+    """Test that groups are limited to their share of each pool"""
+    limiter = PoolLimiter(
+        {"bugmon-processor": 4.0}, {}, NOW + timedelta(hours=1), NOW, 0.5
+    )
+    for _ in range(2):
+        assert limiter.within_quota("bugmon-processor", "a")
+        limiter.consume("bugmon-processor", "a")
+
+    assert not limiter.within_quota("bugmon-processor", "a")
+    assert limiter.within_quota("bugmon-processor", "b")
+    assert limiter.available("bugmon-processor", "low")
+
+
+def _submitted(create_task):
+    return [call.args[1]["metadata"]["name"] for call in create_task.call_args_list]
+
+
+def _limit_pools(mocker, bz_request, bugs):
+    """Answer the bug search and cap submissions by pool throughput"""
+    bz_request.return_value = {"bugs": bugs}
+    mocker.patch("bugmon_tc.monitor.monitor.fetch_pending_counts", return_value={})
+    mocker.patch(
+        "bugmon_tc.monitor.monitor._get_deadline",
+        return_value=datetime.utcnow() + timedelta(hours=1, minutes=1),
+    )
+
+
+def test_monitor_create_tasks_rate_limit(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that bugs beyond a worker pool's budget are held back"""
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2]]
+    _limit_pools(mocker, bz_request, bugs)
+
+    config = MonitorConfig(pool_throughput={"bugmon-processor": 1.0})
+    monitor = BugMonitorTask("key", "root", config)
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    assert _submitted(tc_run) == ["ProcessorTask (1)", "ReporterTask (1)"]
+    assert monitor.deferred == [2]
+    assert not (tmp_path / "monitor-2-parent.json").exists()
+
+
+def test_monitor_create_tasks_fair_share(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data, caplog
+):
+    """Test that a single component cannot use all of a pool's capacity"""
+    bugs = [dict(bug_data, id=bug_id, component="A") for bug_id in [1, 2, 3]]
+    bugs.append(dict(bug_data, id=4, component="B"))
+    _limit_pools(mocker, bz_request, bugs)
+
+    config = MonitorConfig(
+        pool_throughput={"bugmon-processor": 3.0},
+        fair_share="component",
+        fair_share_quota=0.5,
+    )
+    monitor = BugMonitorTask("key", "root", config)
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    with caplog.at_level("INFO"):
+        monitor.create_tasks(tmp_path)
+
+    processors = [name for name in _submitted(tc_run) if "Processor" in name]
+    assert processors == ["ProcessorTask (1)", "ProcessorTask (2)", "ProcessorTask (4)"]
+    assert monitor.deferred == [3]
+    assert "Deferred 1 bug(s) of Core::A" in caplog.messages
+
+
+def test_monitor_create_tasks_batched_rate_limit(
+    mocker, bz_request, cache_bug, tc_run, tmp_path, bug_data
+):
+    """Test that the pool budget counts batches rather than bugs"""
+    bug_data["whiteboard"] = "[bugmon:bisected]"
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+    _limit_pools(mocker, bz_request, bugs)
+
+    config = MonitorConfig(pool_throughput={"bugmon-processor": 1.0}, batch_size=2)
+    monitor = BugMonitorTask("key", "root", config)
+    mocker.patch.object(monitor, "is_actionable", return_value=True)
+    monitor.create_tasks(tmp_path)
+
+    processors = [name for name in _submitted(tc_run) if "Processor" in name]
+    assert processors == ["ProcessorTask (1, 2)"]
+    assert monitor.deferred == [3]
@@ -0,0 +1,39 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from bugsy import BugsyException
+
+from bugmon_tc.monitor.updates import apply_updates, coalesce_updates
+
+REMOVAL = {"keywords": {"remove": ["bugmon"]}, "comment": {"body": "Unsupported"}}
+
+
+def test_coalesce_updates():
+    """Test that bugs receiving identical changes are grouped"""
+    updates = [
+        {"bug_id": 1, "diff": REMOVAL},
+        {"bug_id": 2, "diff": {"whiteboard": "[fuzzblocker]"}},
+        {"bug_id": 3, "diff": dict(reversed(list(REMOVAL.items())))},
+    ]
+    assert coalesce_updates(updates) == [
+        (REMOVAL, [1, 3]),
+        ({"whiteboard": "[fuzzblocker]"}, [2]),
+    ]
+
+
+def test_apply_updates(mocker):
+    """Test that grouped updates are applied in one request per change"""
+    bugsy = mocker.Mock()
+    bugsy.request.side_effect = [None, BugsyException("Error!")]
+    updates = [
+        {"bug_id": 1, "diff": REMOVAL},
+        {"bug_id": 2, "diff": REMOVAL},
+        {"bug_id": 3, "diff": {"whiteboard": ""}},
+        {"bug_id": 4, "diff": {}},
+    ]
+
+    assert apply_updates(bugsy, updates) == [3]
+    assert bugsy.request.call_args_list == [
+        mocker.call("bug/1", "PUT", json={**REMOVAL, "ids": [1, 2]}),
+        mocker.call("bug/3", "PUT", json={"whiteboard": "", "ids": [3]}),
+    ]
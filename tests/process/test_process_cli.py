@@ -10,7 +10,7 @@ import pytest
 
 from bugmon import BugMonitor
 from bugmon_tc.common import BugmonTaskError
-from bugmon_tc.process.cli import process_bug, parse_args, main
+from bugmon_tc.process.cli import process_batch, process_bug, parse_args, main
 
 
 @pytest.fixture
@@ -153,6 +153,49 @@ def test_process_bug_raises_no_trace(mocker, tmp_path, bug_data):
     assert str(e_info.value) == "Unable to identify a pernosco trace!"
 
 
+def test_process_batch(mocker, tmp_path, bug_data):
+    """Test that every bug in a batch gets its own result"""
+
+    def process(self, force_confirm=False):
+        if self.bug.id == 2:
+            raise BugmonTaskError("Error!")
+
+    mocker.patch.object(BugMonitor, "process", process)
+    bugs = [dict(bug_data, id=bug_id) for bug_id in [1, 2, 3]]
+
+    with pytest.raises(BugmonTaskError, match=r"bug\(s\) \[2\]"):
+        process_batch(bugs, str(tmp_path / "result-{bug_id}.json"))
+
+    # A failing bug does not prevent the remaining bugs from being processed
+    assert json.loads((tmp_path / "result-1.json").read_text())["bug_number"] == 1
+    assert not (tmp_path / "result-2.json").exists()
+    assert json.loads((tmp_path / "result-3.json").read_text())["bug_number"] == 3
+
+
+def test_process_batch_unexpected(mocker, tmp_path, bug_data):
+    """Test that unexpected errors are not hidden by a batch"""
+    mocker.patch.object(BugMonitor, "process", side_effect=KeyError("whiteboard"))
+
+    with pytest.raises(KeyError):
+        process_batch([bug_data], str(tmp_path / "result-{bug_id}.json"))
+
+
+def test_main_batch(mocker, tmp_path):
+    """Test that batch monitor artifacts are processed bug by bug"""
+    mocker.patch("bugmon_tc.process.cli.in_taskcluster", return_value=False)
+    monitor_artifact_path = tmp_path / "monitor.json"
+    monitor_artifact_path.write_text(json.dumps([{"id": 1}, {"id": 2}]))
+    mock_process_batch = mocker.patch("bugmon_tc.process.cli.process_batch")
+
+    main([str(monitor_artifact_path), "result-{bug_id}.json"])
+
+    mock_process_batch.assert_called_once_with(
+        [{"id": 1}, {"id": 2}],
+        "result-{bug_id}.json",
+        force_confirm=False,
+    )
+
+
 def test_main_in_taskcluster(mocker, tmp_path):
     """Test that process_bug is called with the correct args when in taskcluster"""
     mocker.patch("bugmon_tc.process.cli.in_taskcluster", return_value=True)
@@ -8,7 +8,13 @@ from pathlib import Path
 import pytest
 
 from bugmon_tc.common import BugmonTaskError
-from bugmon_tc.report.cli import update_bug, submit_trace, parse_args, main
+from bugmon_tc.report.cli import (
+    update_bug,
+    submit_trace,
+    parse_args,
+    main,
+    report_batch,
+)
 
 
 @pytest.fixture
@@ -16,7 +22,9 @@ def mock_args(tmp_path):
     processor_artifact_path = tmp_path / "processor_artifact.json"
     trace_artifact_path = tmp_path / "trace_artifact.json"
     return Namespace(
-        processor_artifact=processor_artifact_path, trace_artifact=trace_artifact_path
+        processor_artifact=processor_artifact_path,
+        trace_artifact=trace_artifact_path,
+        batch=False,
     )
 
 
@@ -48,6 +56,44 @@ def test_update_bug(bug_data_processed, caplog, mocker):
     )
 
 
+def test_report_batch(mocker, tmp_path, mock_bz_creds):
+    """Test that every result in a manifest is reported over one session"""
+    manifest = []
+    for bug_id in (1, 2, 3):
+        path = tmp_path / f"processor-result-{bug_id}.json"
+        if bug_id != 2:
+            # The processor of bug 2 failed and left no result
+            path.write_text(json.dumps({"bug_number": bug_id, "diff": {}}))
+        manifest.append({"bug_id": bug_id, "taskId": f"task-{bug_id}", "path": path})
+
+    mocker.patch("bugmon_tc.report.cli.in_taskcluster", return_value=False)
+    mock_bugsy = mocker.patch("bugmon_tc.report.cli.Bugsy")
+    mock_update_bug = mocker.patch("bugmon_tc.report.cli.update_bug")
+
+    with pytest.raises(BugmonTaskError, match=r"Failed to report 1 bug\(s\): \[2\]"):
+        report_batch(manifest, mock_bz_creds)
+
+    mock_bugsy.assert_called_once_with(api_key="fake_key", bugzilla_url="fake_url")
+    assert mock_update_bug.call_args_list == [
+        mocker.call({"bug_number": 1, "diff": {}}, mock_bz_creds, mock_bugsy()),
+        mocker.call({"bug_number": 3, "diff": {}}, mock_bz_creds, mock_bugsy()),
+    ]
+
+
+def test_report_batch_unexpected(mocker, tmp_path, mock_bz_creds):
+    """Test that unexpected errors are not hidden by a batch"""
+    path = tmp_path / "processor-result-1.json"
+    path.write_text(json.dumps({"bug_number": 1, "diff": {}}))
+    manifest = [{"bug_id": 1, "taskId": "task-1", "path": path}]
+
+    mocker.patch("bugmon_tc.report.cli.in_taskcluster", return_value=False)
+    mocker.patch("bugmon_tc.report.cli.Bugsy")
+    mocker.patch("bugmon_tc.report.cli.update_bug", side_effect=KeyError("diff"))
+
+    with pytest.raises(KeyError):
+        report_batch(manifest, mock_bz_creds)
+
+
 def test_submit_trace(bug_data_processed, build_info, mocker, monkeypatch, tmp_path):
     """Test submitting a pernosco trace"""
     trace_artifact = tmp_path / "trace_artifact.tar.gz"
@@ -57,13 +103,13 @@ def test_submit_trace(bug_data_processed, build_info, mocker, monkeypatch, tmp_p
     fetch_artifact_mock = mocker.patch("bugmon_tc.report.cli.fetch_trace_artifact")
     fetch_artifact_mock.return_value.__enter__.return_value = trace_dir
 
-    submit_pernosco_mock = mocker.patch("bugmon_tc.report.cli.submit_pernosco")
+    submit_pernosco_mock = mocker.patch("bugmon.utils.submit_pernosco")
     pernosco_creds = {
         "PERNOSCO_USER": "user",
         "PERNOSCO_GROUP": "group",
         "PERNOSCO_USER_SECRET_KEY": "key",
     }
-    mocker.patch("bugmon_tc.report.cli.is_pernosco_available", return_value=True)
+    mocker.patch("bugmon.utils.is_pernosco_available", return_value=True)
     submit_trace(bug_data_processed, trace_artifact, pernosco_creds)
 
     assert fetch_artifact_mock.call_args == mocker.call(trace_artifact)
@@ -78,7 +124,7 @@ def test_submit_trace_without_pernosco(
     bug_data_processed, build_info, mocker, monkeypatch, tmp_path
 ):
     """Test that submitting a trace fails when pernosco is not available"""
-    mocker.patch("bugmon_tc.report.cli.is_pernosco_available", return_value=False)
+    mocker.patch("bugmon.utils.is_pernosco_available", return_value=False)
 
     trace_artifact = tmp_path / "trace_artifact.tar.gz"
     trace_dir = tmp_path / "trace_dir"
@@ -146,6 +192,7 @@ def test_main_skips_trace_when_unavailable(mocker, tmp_path, mock_bz_creds):
         processor_artifact=processor_artifact,
         trace_artifact=trace_artifact,
         debug=False,
+        batch=False,
     )
     mocker.patch("bugmon_tc.report.cli.parse_args", return_value=args)
     mocker.patch("bugmon_tc.report.cli.in_taskcluster", return_value=False)
@@ -210,3 +257,26 @@ def test_main_local(mocker, tmp_path, mock_args, mock_pernosco_token, mock_task_
         mock_pernosco_token,
     )
     mock_update_bug.assert_called_once_with(mock_task_data, mock_bz_creds)
+
+
+def test_main_batch_in_taskcluster(mocker, mock_args, mock_bz_creds):
+    """Test that batch reports fetch the manifest from the monitor task"""
+    mock_args.batch = True
+    manifest = [{"bug_id": 1, "taskId": "processor", "path": "result.json"}]
+    mocker.patch("bugmon_tc.report.cli.parse_args", return_value=mock_args)
+    mocker.patch("bugmon_tc.report.cli.get_bugzilla_auth", return_value=mock_bz_creds)
+    mocker.patch("bugmon_tc.report.cli.in_taskcluster", return_value=True)
+    mocker.patch(
+        "bugmon_tc.report.cli.queue.task", return_value={"taskGroupId": "monitor"}
+    )
+    mock_fetch = mocker.patch(
+        "bugmon_tc.report.cli.fetch_json_artifact", return_value=manifest
+    )
+    mock_report_batch = mocker.patch("bugmon_tc.report.cli.report_batch")
+    mock_update_bug = mocker.patch("bugmon_tc.report.cli.update_bug")
+
+    main(mock_args)
+
+    mock_fetch.assert_called_once_with("monitor", mock_args.processor_artifact)
+    mock_report_batch.assert_called_once_with(manifest, mock_bz_creds)
+    mock_update_bug.assert_not_called()
@@ -0,0 +1,99 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime
+
+from taskcluster.exceptions import TaskclusterRestFailure
+
+from bugmon_tc.stats.history import RunHistory
+
+
+def _record(history, task_id, kind="ProcessorTask", scheduled=datetime(2024, 1, 1)):
+    history.record_task(
+        task_id, "group", 1, kind, "bisect", "Linux", "bugmon-processor", scheduled
+    )
+
+
+def test_history_collect(mocker):
+    """Test that resolved tasks have their runs and outcome recorded"""
+    statuses = {
+        "done": {
+            "state": "completed",
+            "runs": [
+                {
+                    "runId": 0,
+                    "state": "exception",
+                    "reasonResolved": "worker-shutdown",
+                    "started": "2024-01-01T00:00:00.000Z",
+                    "resolved": "2024-01-01T00:10:00.000Z",
+                },
+                {
+                    "runId": 1,
+                    "state": "completed",
+                    "reasonResolved": "completed",
+                    "started": "2024-01-01T00:10:00.000Z",
+                    "resolved": "2024-01-01T01:10:00.000Z",
+                },
+            ],
+        },
+        "busy": {"state": "running", "runs": [{"runId": 0, "state": "running"}]},
+    }
+
+    def status(task_id):
+        if task_id not in statuses:
+            raise TaskclusterRestFailure("Not found", None, status_code=404)
+        return {"status": statuses[task_id]}
+
+    mocker.patch("bugmon_tc.common.queue.status", side_effect=status)
+
+    history = RunHistory()
+    for task_id in ["done", "busy", "gone"]:
+        _record(history, task_id)
+
+    assert history.collect() == 1
+    assert history.unresolved_tasks() == ["busy"]
+
+    [row] = history.summary()
+    assert row["tasks"] == 3
+    assert row["completed"] == 1
+    assert row["runs"] == 2
+    assert row["mean_duration"] == 2100
+    assert row["max_duration"] == 3600
+
+
+def test_history_save(tmp_path):
+    """Test that a copy of the database can be written as an artifact"""
+    history = RunHistory()
+    _record(history, "a")
+    history.save(tmp_path / "artifacts" / "history.sqlite")
+    saved = RunHistory(tmp_path / "artifacts" / "history.sqlite")
+    assert saved.unresolved_tasks() == ["a"]
+
+
+def test_history_summary_since():
+    """Test that the summary can be limited to recently scheduled tasks"""
+    history = RunHistory()
+    _record(history, "old", scheduled=datetime(2023, 1, 1))
+    _record(history, "new", kind="ReporterTask")
+    rows = history.summary(since=datetime(2023, 6, 1))
+    assert [(row["kind"], row["tasks"]) for row in rows] == [("ReporterTask", 1)]
+
+
+def test_history_task_bugs():
+    """Test that every bug handled by a task is recorded"""
+    history = RunHistory()
+    _record(history, "single")
+    history.record_task(
+        "batch",
+        "group",
+        1,
+        "BatchProcessorTask",
+        "confirm",
+        "Linux",
+        "bugmon-processor",
+        datetime(2024, 1, 1),
+        [1, 2],
+    )
+
+    assert history.task_bugs("single") == [1]
+    assert history.task_bugs("batch") == [1, 2]
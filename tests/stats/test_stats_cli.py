@@ -0,0 +1,69 @@
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+import json
+from datetime import datetime
+
+import pytest
+
+from bugmon_tc.stats.cli import main, parse_args
+from bugmon_tc.stats.history import RunHistory
+
+
+def test_parse_args_requires_command(tmp_path):
+    """Test that a command must be given"""
+    with pytest.raises(SystemExit):
+        parse_args([str(tmp_path / "history.sqlite")])
+
+
+def test_main_collect(mocker, tmp_path):
+    """Test that the collect command collects outcomes"""
+    mock_collect = mocker.patch("bugmon_tc.stats.cli.RunHistory.collect")
+    main([str(tmp_path / "history.sqlite"), "collect"])
+    mock_collect.assert_called_once_with()
+
+
+def test_main_summary(capsys, tmp_path):
+    """Test that the summary is printed as a table or as JSON"""
+    path = tmp_path / "history.sqlite"
+    history = RunHistory(path)
+    history.record_task(
+        "a",
+        "group",
+        1,
+        "ProcessorTask",
+        "bisect",
+        "Linux",
+        "bugmon-processor",
+        datetime.utcnow(),
+    )
+    history.close()
+
+    main([str(path), "summary"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == [
+        "kind",
+        "action",
+        "platform",
+        "tasks",
+        "completed",
+        "failed",
+        "runs",
+        "mean_duration",
+        "max_duration",
+    ]
+    assert lines[1].split() == [
+        "ProcessorTask",
+        "bisect",
+        "Linux",
+        "1",
+        "0",
+        "0",
+        "0",
+        "-",
+        "-",
+    ]
+
+    main([str(path), "summary", "--days", "1", "--json"])
+    [row] = json.loads(capsys.readouterr().out)
+    assert row["tasks"] == 1